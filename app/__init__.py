@@ -1,32 +1,63 @@
+import os
+
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from config import Config
 from flask_login import LoginManager
-from flask_mail import Mail # type: ignore
+from app.services.db_routing import RoutingSession
 
-db = SQLAlchemy()
-migrate = Migrate()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()  
 login_manager.login_view = 'main.login'
-mail = Mail()
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    # Compiled templates are kept on disk, so a new worker skips Jinja's compile step
+    if app.config.get('JINJA_BYTECODE_CACHE', True):
+        from jinja2 import FileSystemBytecodeCache
+        bytecode_dir = app.config.get('JINJA_BYTECODE_CACHE_DIR') or os.path.join(app.instance_path, 'jinja_cache')
+        os.makedirs(bytecode_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(bytecode_dir)
+
     # Initialize extensions
     db.init_app(app)
-    migrate.init_app(app, db)
     login_manager.init_app(app)
-    mail.init_app(app)
+    # Flask-Migrate pulls in Alembic (~90 ms of imports) and only the
+    # `flask db` commands use it; Flask-Mail is set up by the mail worker
+    # on first send (app.services.mailer.get_mail).
+    if os.environ.get('FLASK_RUN_FROM_CLI'):
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    from app.services import db_routing
+    db_routing.init_app(app)
+
+    from app.services import search
+    search.init_app(app)
+
+    from app.services import http_cache
+    http_cache.init_app(app)
+
+    from app.services import query_stats, metrics
+    query_stats.init_app(app)
+    metrics.init_app(app)
+
+    from app.services import sessions, bag
+    sessions.init_app(app)
+    bag.init_app(app)
     
     # Import and register the blueprint
     from app.routes import main_bp
     app.register_blueprint(main_bp)
 
+    # Register CLI commands (scheduled jobs)
+    from app.cli import register_commands
+    register_commands(app)
+
     # Import models for Flask-Migrate
     with app.app_context():
-        from app.models import student, publication, physical_book, ebook, audiobook, loan, fine, subscription, otp
+        from app.models import student, publication, physical_book, ebook, audiobook, loan, fine, subscription, otp, outbox_email, audiobook_segment_index, web_session, bag_item, payment_verification
 
     return app
\ No newline at end of file
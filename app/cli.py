@@ -0,0 +1,270 @@
+# In app/cli.py
+#
+# Flask CLI commands for scheduled/background jobs, e.g.
+#   flask subscriptions expire
+#   flask fines accrue
+#   flask mail worker
+#   flask mail purge
+#   flask payments reconcile
+#   flask otp purge
+#   flask sessions purge
+#   flask catalog import books.csv
+#   flask audiobooks index
+#   flask ebooks clear-page-cache
+#   flask admin grant librarian@example.com
+# Run them from cron (or any scheduler) with FLASK_APP=main.py.
+
+import os
+
+import click
+from flask.cli import AppGroup
+
+subscriptions_cli = AppGroup('subscriptions', help='Subscription maintenance jobs.')
+
+
+@subscriptions_cli.command('expire')
+def expire_subscriptions_command():
+    """Deactivate lapsed subscriptions and reset students to the Free tier."""
+    from app.services.entitlements import expire_subscriptions
+    expired, downgraded = expire_subscriptions()
+    click.echo(f"✅ Expired {expired} subscription(s); {downgraded} student(s) moved to Free.")
+
+
+search_cli = AppGroup('search', help='Catalog full-text search index.')
+
+
+@search_cli.command('rebuild')
+def rebuild_search_command():
+    """Rebuild the search index from the publication tables."""
+    from app.services import search
+    count = search.rebuild()
+    click.echo(f"✅ Indexed {count} publication(s) with the '{search.get_backend().name}' backend.")
+
+
+fines_cli = AppGroup('fines', help='Overdue fine jobs.')
+
+
+@fines_cli.command('accrue')
+@click.option('--batch-size', type=int, default=None, help='Loans per transaction.')
+def accrue_fines_command(batch_size):
+    """Create and update overdue fines for all loans (safe to re-run)."""
+    from app.services.fines import accrue_fines
+    result = accrue_fines(batch_size=batch_size)
+    click.echo(
+        f"✅ Fines accrued in {result.batches} batch(es): {result.created} created, "
+        f"{result.updated} updated, {result.settled} settled, {result.overdue_loans} loan(s) marked overdue."
+    )
+
+
+mail_cli = AppGroup('mail', help='Outbound email outbox.')
+
+
+@mail_cli.command('worker')
+@click.option('--poll-interval', type=float, default=None, help='Seconds to sleep when the outbox is empty.')
+@click.option('--batch-size', type=int, default=None, help='Emails claimed per batch.')
+def mail_worker_command(poll_interval, batch_size):
+    """Deliver queued email continuously until interrupted."""
+    from app.services.mailer import run_worker
+    click.echo("📨 Mail worker started (Ctrl+C to stop).")
+    try:
+        run_worker(poll_interval=poll_interval, batch_size=batch_size)
+    except KeyboardInterrupt:
+        click.echo("Mail worker stopped.")
+
+
+@mail_cli.command('flush')
+@click.option('--batch-size', type=int, default=None, help='Emails claimed per batch.')
+def mail_flush_command(batch_size):
+    """Deliver every email that is currently due, then exit."""
+    from app.services.mailer import deliver_pending
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = deliver_pending(batch_size=batch_size)
+        if not sent and not failed:
+            break
+        total_sent += sent
+        total_failed += failed
+    click.echo(f"✅ Sent {total_sent} email(s); {total_failed} failed and will be retried.")
+
+
+@mail_cli.command('purge')
+@click.option('--batch-size', type=int, default=None, help='Rows deleted per transaction.')
+@click.option('--older-than-days', type=int, default=None,
+              help='Keep emails newer than this (default MAIL_OUTBOX_RETENTION_DAYS).')
+def purge_mail_command(batch_size, older_than_days):
+    """Delete sent and failed emails past the retention period."""
+    from app.services.mailer import purge
+    purged = purge(batch_size=batch_size, older_than_days=older_than_days)
+    click.echo(f"✅ Purged {purged} sent or failed email(s) from the outbox.")
+
+
+payments_cli = AppGroup('payments', help='Razorpay payment verification.')
+
+
+@payments_cli.command('reconcile')
+@click.option('--batch-size', type=int, default=None, help='Verifications claimed per batch.')
+def reconcile_payments_command(batch_size):
+    """Settle pending payment verifications that are due with the gateway, then exit."""
+    from app.services import payments
+    result = payments.reconcile(batch_size=batch_size)
+    click.echo(f"✅ {result.completed} payment(s) confirmed, {result.failed} failed, "
+               f"{result.pending} still pending.")
+
+
+otp_cli = AppGroup('otp', help='Registration OTP maintenance.')
+
+
+@otp_cli.command('purge')
+@click.option('--batch-size', type=int, default=None, help='Rows deleted per transaction.')
+def purge_otps_command(batch_size):
+    """Delete used and expired OTPs."""
+    from app.services import otp_store
+    purged = otp_store.purge(batch_size=batch_size)
+    click.echo(f"✅ Purged {purged} OTP(s) from the '{otp_store.get_store().name}' store.")
+
+
+plans_cli = AppGroup('query-plans', help='Query-plan regression checks.')
+
+
+@plans_cli.command('check')
+@click.option('--verbose', is_flag=True, help='Print the full plan of every query.')
+def check_query_plans_command(verbose):
+    """Fail if a hot query falls back to a full table scan (SQLite)."""
+    from app.services.query_plans import check_plans
+    try:
+        reports = check_plans()
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    regressions = 0
+    for report in reports:
+        ok = not report.full_scans
+        regressions += not ok
+        click.echo(f"{'✅' if ok else '❌'} {report.query.name} ({report.query.used_by})")
+        for line in (report.plan if verbose else report.full_scans):
+            click.echo(f"      {line}")
+    if regressions:
+        raise click.ClickException(f"{regressions} hot query(ies) use a full scan.")
+
+
+catalog_cli = AppGroup('catalog', help='Catalog maintenance.')
+
+
+def _clip(value, width=60):
+    text = repr(value)
+    return text if len(text) <= width else text[:width - 3] + '...'
+
+
+@catalog_cli.command('import')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--dry-run', is_flag=True, help='Show what would change without writing.')
+@click.option('--chunk-size', type=int, default=None, help='Rows per transaction.')
+@click.option('--format', 'default_format', type=click.Choice(['physical_book', 'ebook', 'audiobook']),
+              default='physical_book', help='Format of rows without a Format column.')
+def import_catalog_command(csv_path, dry_run, chunk_size, default_format):
+    """Insert or update publications from a CSV file."""
+    from app.services.importer import import_catalog
+
+    def progress(report):
+        click.echo(f"  ... {report.rows} row(s) read, {report.inserted} added, "
+                   f"{report.updated} updated, {len(report.errors)} error(s)")
+
+    report = import_catalog(csv_path, chunk_size=chunk_size, dry_run=dry_run,
+                            default_format=default_format, progress=progress)
+    for change in report.changes:
+        click.echo(f"{change.action:>6} line {change.line}: {change.kind} {' / '.join(map(str, change.key))}")
+        for field, (old, new) in change.changes.items():
+            click.echo(f"         {field}: {_clip(old)} -> {_clip(new)}")
+    for error in report.errors:
+        click.echo(f"❌ Line {error.line}: {error.message}")
+    verb = "Would add" if dry_run else "Added"
+    click.echo(f"✅ {verb} {report.inserted}, updated {report.updated}, "
+               f"left {report.unchanged} unchanged ({len(report.errors)} error(s)).")
+
+
+audiobooks_cli = AppGroup('audiobooks', help='Audiobook file maintenance.')
+
+
+@audiobooks_cli.command('index')
+@click.option('--all', 'rebuild_all', is_flag=True, help='Rebuild every index, not just missing or stale ones.')
+def index_audiobooks_command(rebuild_all):
+    """Build segment (seek/chapter) indexes for audiobook files."""
+    from app.models.audiobook import Audiobook
+    from app.services import audio_index, media
+
+    def needs_index(audiobook):
+        if rebuild_all or audiobook.segment_index is None:
+            return True
+        path = media.resolve(audiobook.file_path)
+        return path is not None and os.path.isfile(path) and audio_index.is_stale(audiobook.segment_index, path)
+
+    todo = [a for a in Audiobook.query.order_by(Audiobook.id) if needs_index(a)]
+    indexed, failed = audio_index.index_audiobooks(todo)
+    click.echo(f"✅ Indexed {indexed} audiobook(s); {failed} could not be indexed (see log).")
+
+
+sessions_cli = AppGroup('sessions', help='Server-side session maintenance.')
+
+
+@sessions_cli.command('purge')
+@click.option('--batch-size', type=int, default=None, help='Rows deleted per transaction.')
+def purge_sessions_command(batch_size):
+    """Delete expired sessions."""
+    from app.services import sessions
+    purged = sessions.purge(batch_size=batch_size)
+    click.echo(f"✅ Purged {purged} expired session(s) from the '{sessions.get_store().name}' store.")
+
+
+ebooks_cli = AppGroup('ebooks', help='Ebook reader maintenance.')
+
+
+@ebooks_cli.command('clear-page-cache')
+def clear_page_cache_command():
+    """Delete all cached ebook pages."""
+    from app.services import ebook_pages
+    ebook_pages.clear_cache()
+    click.echo("✅ Ebook page cache cleared.")
+
+
+admin_cli = AppGroup('admin', help='Library staff accounts.')
+
+
+def _set_admin(email, is_admin):
+    from app import db
+    from app.models.student import Student
+    student = Student.query.filter_by(email=email).first()
+    if student is None:
+        raise click.ClickException(f"No account with email {email}.")
+    student.is_admin = is_admin
+    db.session.commit()
+
+
+@admin_cli.command('grant')
+@click.argument('email')
+def grant_admin_command(email):
+    """Let an account use the /admin pages."""
+    _set_admin(email, True)
+    click.echo(f"✅ {email} is now an admin.")
+
+
+@admin_cli.command('revoke')
+@click.argument('email')
+def revoke_admin_command(email):
+    """Take away an account's access to the /admin pages."""
+    _set_admin(email, False)
+    click.echo(f"✅ {email} is no longer an admin.")
+
+
+def register_commands(app):
+    """Attach all LibraNet CLI groups to the app."""
+    app.cli.add_command(subscriptions_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(fines_cli)
+    app.cli.add_command(mail_cli)
+    app.cli.add_command(payments_cli)
+    app.cli.add_command(otp_cli)
+    app.cli.add_command(plans_cli)
+    app.cli.add_command(catalog_cli)
+    app.cli.add_command(audiobooks_cli)
+    app.cli.add_command(sessions_cli)
+    app.cli.add_command(ebooks_cli)
+    app.cli.add_command(admin_cli)
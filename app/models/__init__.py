@@ -24,4 +24,27 @@ class SubscriptionTierEnum(Enum):
     FREE = "free"
     BASIC = "basic"
     PRO = "pro"
-    MAX = "max"
\ No newline at end of file
+    MAX = "max"
+
+class EmailStatusEnum(Enum):
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+
+class LoaderProfiles:
+    """
+    Named eager-loading option sets for models whose pages walk
+    relationships row by row. A model lists them in __loader_profiles__
+    (name -> function returning loader options) and routes apply one with
+        Loan.query.options(*Loan.profile('list'))
+    so a page's query count does not grow with the rows it shows.
+    """
+    __loader_profiles__ = {}
+
+    @classmethod
+    def profile(cls, name):
+        try:
+            options = cls.__loader_profiles__[name]
+        except KeyError:
+            raise ValueError(f"{cls.__name__} has no loader profile '{name}'")
+        return options()
@@ -0,0 +1,50 @@
+# In app/models/audiobook_segment_index.py
+
+import json
+from app import db
+from . import datetime
+
+class AudiobookSegmentIndex(db.Model):
+    """
+    Time -> byte offset table and chapter list for one audiobook file,
+    built by app.services.audio_index when the file is ingested.
+    """
+    __tablename__ = "audiobook_segment_index"
+
+    audiobook_id = db.Column(db.Integer, db.ForeignKey('audiobook.id', ondelete='CASCADE'), primary_key=True)
+    container = db.Column(db.String(10), nullable=False)  # 'mp3' or 'mp4'
+    # File identity at indexing time; a mismatch means the index is stale
+    file_size = db.Column(db.BigInteger, nullable=False)
+    file_mtime = db.Column(db.Float, nullable=False)
+    duration_ms = db.Column(db.BigInteger, nullable=False)
+    # Audio data lies in [data_start, data_end)
+    data_start = db.Column(db.BigInteger, nullable=False)
+    data_end = db.Column(db.BigInteger, nullable=False)
+    points_json = db.Column(db.Text, nullable=False, default='[]')    # [[time_ms, byte_offset], ...]
+    chapters_json = db.Column(db.Text, nullable=False, default='[]')  # [{"title", "start_ms", "end_ms"}, ...]
+    indexed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    audiobook = db.relationship(
+        'Audiobook',
+        backref=db.backref('segment_index', uselist=False, cascade="all, delete-orphan")
+    )
+
+    @property
+    def points(self):
+        """Seek points in time order: [[time_ms, byte_offset], ...]."""
+        return json.loads(self.points_json or '[]')
+
+    @points.setter
+    def points(self, value):
+        self.points_json = json.dumps(value, separators=(',', ':'))
+
+    @property
+    def chapters(self):
+        return json.loads(self.chapters_json or '[]')
+
+    @chapters.setter
+    def chapters(self, value):
+        self.chapters_json = json.dumps(value)
+
+    def __repr__(self):
+        return f"<AudiobookSegmentIndex audiobook_id={self.audiobook_id} points={len(self.points)}>"
@@ -0,0 +1,22 @@
+# In app/models/bag_item.py
+
+from app import db
+from . import datetime
+
+class BagItem(db.Model):
+    """
+    A physical book waiting in a student's borrowing bag. Kept per student
+    rather than in the session, so the bag follows them across devices.
+    """
+    __tablename__ = "bag_item"
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'book_id', name='uq_bag_item_student_id_book_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id', ondelete='CASCADE'), nullable=False)
+    book_id = db.Column(db.Integer, db.ForeignKey('physical_book.id', ondelete='CASCADE'), nullable=False)
+    added_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<BagItem student_id={self.student_id} book_id={self.book_id}>"
@@ -1,9 +1,18 @@
 # In app/models/fine.py
 
+from sqlalchemy.orm import joinedload
 from app import db
-from . import FineStatusEnum, datetime
+from . import FineStatusEnum, LoaderProfiles, datetime
 
-class Fine(db.Model):
+
+def _loan_book_title():
+    """Options for a fine's loan: its book, title only."""
+    from .loan import Loan
+    from .physical_book import PhysicalBook
+    return (joinedload(Loan.book).load_only(PhysicalBook.title),)
+
+
+class Fine(LoaderProfiles, db.Model):
     """Model for fines associated with a loan."""
     __tablename__ = "fine"
 
@@ -20,6 +29,11 @@ class Fine(db.Model):
     # --- Relationship (The Python shortcut) ---
     loan = db.relationship('Loan', back_populates='fine')
 
+    __loader_profiles__ = {
+        # dues: each row shows the title of the book the fine is for
+        'list': lambda: (joinedload(Fine.loan).options(*_loan_book_title()),),
+    }
+
     @property
     def balance(self):
         """
@@ -30,4 +44,4 @@ class Fine(db.Model):
 
     def __repr__(self):
         """Provides a developer-friendly representation of the fine object."""
-        return f"<Fine id={self.id} loan_id={self.loan_id} amount={self.amount}>"
\ No newline at end of file
+        return f"<Fine id={self.id} loan_id={self.loan_id} amount={self.amount}>"
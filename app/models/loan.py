@@ -1,11 +1,25 @@
 # In app/models/loan.py
 
+from sqlalchemy.orm import joinedload
 from app import db
-from . import LoanStatusEnum, datetime, timedelta
+from . import LoanStatusEnum, LoaderProfiles, datetime, timedelta
 
-class Loan(db.Model):
+
+def _book_list_columns():
+    """Book columns a loan row shows (title and author, not the summary)."""
+    from .physical_book import PhysicalBook
+    return joinedload(Loan.book).load_only(PhysicalBook.title, PhysicalBook.author)
+
+
+class Loan(LoaderProfiles, db.Model):
     """Model for tracking a book loan (a transaction)."""
     __tablename__ = "loan"
+    __table_args__ = (
+        # A student's open loans (my_bag, borrow, book_detail); with book_id
+        # last it also answers "has this student got this book?" and covers
+        # the loan count without touching the table.
+        db.Index('ix_loan_student_id_returned_date_book_id', 'student_id', 'returned_date', 'book_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     borrowed_date = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -25,6 +39,11 @@ class Loan(db.Model):
     # A loan can result in one fine. We will build this out later.
     fine = db.relationship('Fine', back_populates='loan', lazy=True, uselist=False, cascade="all, delete-orphan")
 
+    __loader_profiles__ = {
+        # my_loans and the admin loan history: each row shows its book
+        'list': lambda: (_book_list_columns(),),
+    }
+
     def __repr__(self):
         """Provides a developer-friendly representation of the loan object."""
         return f"<Loan id={self.id} student_id={self.student_id} book_id={self.book_id}>"
\ No newline at end of file
@@ -6,9 +6,13 @@ import string
 class OTP(db.Model):
     """Model for storing OTPs for email verification."""
     __tablename__ = "otp"
+    __table_args__ = (
+        # verify: latest unused code for an email
+        db.Index('ix_otp_email_is_used_created_at', 'email', 'is_used', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(150), nullable=False, index=True)
+    email = db.Column(db.String(150), nullable=False)
     otp_code = db.Column(db.String(6), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     expires_at = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,40 @@
+# In app/models/outbox_email.py
+
+import json
+from app import db
+from . import EmailStatusEnum, datetime
+
+class OutboxEmail(db.Model):
+    """
+    An outbound email waiting to be delivered by the mail worker.
+    Requests only insert rows here; `flask mail worker` sends them.
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # The worker's "what is due?" query
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(150), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    template = db.Column(db.String(100), nullable=False)  # e.g. 'email/otp.html'
+    context_json = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.Enum(EmailStatusEnum), default=EmailStatusEnum.PENDING, nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    @property
+    def context(self):
+        """Template variables for rendering the email body."""
+        return json.loads(self.context_json or '{}')
+
+    @context.setter
+    def context(self, value):
+        self.context_json = json.dumps(value)
+
+    def __repr__(self):
+        return f"<OutboxEmail id={self.id} to={self.recipient} status={self.status.value}>"
@@ -0,0 +1,36 @@
+# In app/models/payment_verification.py
+
+from app import db
+from . import PaymentStatusEnum, SubscriptionTierEnum, datetime
+
+class PaymentVerification(db.Model):
+    """
+    A Razorpay payment a student has made for a plan, and whether the
+    gateway has confirmed it yet. Rows the request could not settle (gateway
+    slow or down) stay PENDING until `flask payments reconcile` resolves them.
+    """
+    __tablename__ = "payment_verification"
+    __table_args__ = (
+        # The reconciler's "what is due?" query
+        db.Index('ix_payment_verification_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    payment_id = db.Column(db.String(64), unique=True, nullable=False)  # Razorpay's pay_...
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), nullable=False, index=True)
+    tier = db.Column(db.Enum(SubscriptionTierEnum), nullable=False)
+    amount = db.Column(db.Numeric(10, 2), nullable=False)  # expected price, in rupees
+    duration_days = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.Enum(PaymentStatusEnum), default=PaymentStatusEnum.PENDING, nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    resolved_at = db.Column(db.DateTime, nullable=True)
+    subscription_id = db.Column(db.Integer, db.ForeignKey('subscription.id'), nullable=True)
+
+    student = db.relationship('Student')
+    subscription = db.relationship('Subscription')
+
+    def __repr__(self):
+        return f"<PaymentVerification id={self.id} payment={self.payment_id} status={self.status.value}>"
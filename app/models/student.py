@@ -1,10 +1,16 @@
+from collections import namedtuple
 from datetime import datetime
+from decimal import Decimal
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db, login_manager
 from flask_login import UserMixin
-from . import SubscriptionTierEnum
+from . import FineStatusEnum, LoaderProfiles, SubscriptionTierEnum
 
-class Student(UserMixin, db.Model):
+# What a logged-in page needs to know about the student beyond their row:
+# current subscription (or None), open loans, and unpaid fines with their balance.
+AccountSummary = namedtuple('AccountSummary', 'subscription active_loans pending_fines fines_due')
+
+class Student(LoaderProfiles, UserMixin, db.Model):
     """Model ONLY for student users."""
     __tablename__ = "student"
 
@@ -16,11 +22,26 @@ class Student(UserMixin, db.Model):
     password_hash = db.Column(db.String(256), nullable=False)
     joined_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     is_active = db.Column(db.Boolean, default=True, nullable=False)
+    # Library staff: may use the /admin pages, including the bulk exports.
+    # Granted with `flask admin grant <email>`.
+    is_admin = db.Column(db.Boolean, default=False, server_default=db.false(), nullable=False)
+
+    # Denormalised effective subscription, so that entitlement checks are a
+    # plain read of the already-loaded student row.
+    # Kept current by app.services.entitlements and the expiry sweep.
+    active_tier = db.Column(db.Enum(SubscriptionTierEnum), default=SubscriptionTierEnum.FREE,
+                            server_default=SubscriptionTierEnum.FREE.name, nullable=False)
+    active_tier_expires_at = db.Column(db.DateTime, nullable=True)
 
     # Relationships
     loans = db.relationship('Loan', back_populates='student', lazy=True, cascade="all, delete-orphan")
     subscriptions = db.relationship('Subscription', back_populates='student', lazy=True, cascade="all, delete-orphan")
 
+    __loader_profiles__ = {
+        # admin student_detail: the student with their loan history and each loan's book
+        'detail': lambda: (_loans_with_books(),),
+    }
+
     # Password helpers
     def set_password(self, password: str) -> None:
         self.password_hash = generate_password_hash(password)
@@ -28,28 +49,40 @@ class Student(UserMixin, db.Model):
     def check_password(self, password: str) -> bool:
         return check_password_hash(self.password_hash, password)
     
+    @property
+    def account_summary(self):
+        """
+        AccountSummary snapshot. The user loader fills it in the same query
+        that loads the student, so for current_user this costs nothing; for
+        any other student it is fetched on first use. Cleared by
+        refresh_account_summary() after writes that change it.
+        """
+        summary = getattr(self, '_account_summary', None)
+        if summary is None:
+            row = db.session.execute(account_summary_statement(self.id)).first()
+            summary = self._account_summary = _summary_from_row(row)
+        return summary
+
+    def refresh_account_summary(self):
+        self._account_summary = None
+
     @property
     def current_subscription(self):
-        """Get the current active subscription."""
-        active_sub = [s for s in self.subscriptions if s.is_active and not s.is_expired]
-        if active_sub:
-            return sorted(active_sub, key=lambda x: x.start_date, reverse=True)[0]
-        
-        # If no active subscription, create a FREE one
-        from .subscription import Subscription
-        free_sub = Subscription(
-            student_id=self.id,
-            tier=SubscriptionTierEnum.FREE,
-            is_active=True
-        )
-        db.session.add(free_sub)
-        db.session.commit()
-        return free_sub
+        """
+        Get the current active subscription, or None for students on the
+        free plan. This never writes to the database.
+        """
+        return self.account_summary.subscription
+
+    @property
+    def active_loan_count(self):
+        return self.account_summary.active_loans
     
     @property
     def subscription_tier(self):
-        """Get current subscription tier."""
-        return self.current_subscription.tier
+        """Get current subscription tier from the denormalised columns."""
+        from app.services import entitlements
+        return entitlements.resolve_tier(self)
     
     def has_access_to_ebooks(self):
         """Check if user can access ebooks (PRO or MAX)."""
@@ -70,6 +103,77 @@ class Student(UserMixin, db.Model):
         return f"<Student id={self.id} email={self.email}>"
 
 
+def account_summary_statement(student_id):
+    """
+    One SELECT returning (Student, current Subscription or None, open loan
+    count, pending fine count, pending fine balance); the figures are
+    correlated subqueries, each answered from an index.
+    """
+    from sqlalchemy.orm import aliased
+    from .fine import Fine
+    from .loan import Loan
+    from .subscription import Subscription
+
+    now = datetime.utcnow()
+    current_sub_id = (
+        db.select(Subscription.id)
+        .where(
+            Subscription.student_id == Student.id,
+            Subscription.is_active.is_(True),
+            db.or_(Subscription.end_date.is_(None), Subscription.end_date > now)
+        )
+        .order_by(Subscription.start_date.desc())
+        .limit(1)
+        .correlate(Student)
+        .scalar_subquery()
+    )
+    active_loans = (
+        db.select(db.func.count(Loan.id))
+        .where(Loan.student_id == Student.id, Loan.returned_date.is_(None))
+        .correlate(Student)
+        .scalar_subquery()
+    )
+    pending = db.and_(Loan.student_id == Student.id, Fine.status == FineStatusEnum.PENDING)
+    pending_fines = (
+        db.select(db.func.count(Fine.id))
+        .join(Loan, Fine.loan_id == Loan.id)
+        .where(pending)
+        .correlate(Student)
+        .scalar_subquery()
+    )
+    fines_due = (
+        db.select(db.func.coalesce(db.func.sum(Fine.amount - Fine.paid_amount), 0))
+        .join(Loan, Fine.loan_id == Loan.id)
+        .where(pending)
+        .correlate(Student)
+        .scalar_subquery()
+    )
+    current_sub = aliased(Subscription)
+    return (
+        db.select(Student, current_sub, active_loans, pending_fines, fines_due)
+        .outerjoin(current_sub, current_sub.id == current_sub_id)
+        .where(Student.id == student_id)
+    )
+
+
+def _loans_with_books():
+    from sqlalchemy.orm import selectinload
+    from .loan import Loan
+    return selectinload(Student.loans).options(*Loan.profile('list'))
+
+
+def _summary_from_row(row):
+    if row is None:
+        return AccountSummary(None, 0, 0, Decimal('0'))
+    return AccountSummary(row[1], row[2] or 0, row[3] or 0, Decimal(row[4] or 0))
+
+
 @login_manager.user_loader
 def load_user(user_id):
-    return Student.query.get(int(user_id))
\ No newline at end of file
+    """The student plus their AccountSummary, in one round trip per request."""
+    row = db.session.execute(account_summary_statement(int(user_id))).first()
+    if row is None:
+        return None
+    student = row[0]
+    student._account_summary = _summary_from_row(row)
+    return student
\ No newline at end of file
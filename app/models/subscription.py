@@ -5,6 +5,12 @@ from datetime import timedelta
 class Subscription(db.Model):
     """Model for user subscriptions."""
     __tablename__ = "subscription"
+    __table_args__ = (
+        # current_subscription and verify_payment: a student's active plans, newest first
+        db.Index('ix_subscription_student_id_is_active_start_date', 'student_id', 'is_active', 'start_date'),
+        # my_subscription history: all of a student's plans, newest first
+        db.Index('ix_subscription_student_id_start_date', 'student_id', 'start_date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     tier = db.Column(db.Enum(SubscriptionTierEnum), default=SubscriptionTierEnum.FREE, nullable=False)
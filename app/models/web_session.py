@@ -0,0 +1,18 @@
+# In app/models/web_session.py
+
+from app import db
+
+class WebSession(db.Model):
+    """
+    Server-side session data for the 'sql' session backend
+    (app.services.sessions). The browser cookie only holds the id.
+    """
+    __tablename__ = "web_session"
+
+    id = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    # Sliding expiry, pushed forward as the session is used; the purge job deletes by it
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<WebSession id={self.id[:8]}... expires_at={self.expires_at}>"
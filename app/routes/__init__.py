@@ -7,6 +7,7 @@ main_bp = Blueprint('main', __name__)
 from app.routes import (
     auth_routes,
     book_routes,
+    catalog_routes,
     admin_routes,
     subscription_routes,
     ebook_routes,
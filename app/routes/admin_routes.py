@@ -1,4 +1,4 @@
-from flask import render_template, abort, flash, redirect, url_for, request
+from flask import render_template, abort, flash, redirect, url_for, request, Response, stream_with_context
 from flask_login import login_required, current_user
 from functools import wraps
 from app.routes import main_bp
@@ -8,12 +8,13 @@ from app.models.audiobook import Audiobook
 from app.models.student import Student
 from app.forms import BookForm, EbookForm, AudiobookForm
 from app import db
+from app.services import audio_index, db_routing, exports, pagination
 
-# Admin decorator
+# Admin decorator: staff accounts only (Student.is_admin)
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated:
+        if not current_user.is_authenticated or not current_user.is_admin:
             abort(403)
         return f(*args, **kwargs)
     return decorated_function
@@ -30,9 +31,13 @@ def admin_dashboard():
 @main_bp.route('/admin/books')
 @login_required
 @admin_required
+@db_routing.replica_reads
 def manage_books():
-    books = PhysicalBook.query.order_by(PhysicalBook.title).all()
-    return render_template('admin/manage_books.html', title='Manage Physical Books', books=books)
+    page = pagination.keyset_paginate(
+        PhysicalBook.query, (PhysicalBook.title, PhysicalBook.id),
+        pagination.page_size('ADMIN_PAGE_SIZE'), *pagination.cursor_args()
+    )
+    return render_template('admin/manage_books.html', title='Manage Physical Books', books=page.items, page=page)
 
 
 @main_bp.route('/admin/add_book', methods=['GET', 'POST'])
@@ -96,9 +101,13 @@ def edit_book(book_id):
 @main_bp.route('/admin/ebooks')
 @login_required
 @admin_required
+@db_routing.replica_reads
 def manage_ebooks():
-    ebooks = Ebook.query.order_by(Ebook.title).all()
-    return render_template('admin/manage_ebooks.html', title='Manage Ebooks', ebooks=ebooks)
+    page = pagination.keyset_paginate(
+        Ebook.query, (Ebook.title, Ebook.id),
+        pagination.page_size('ADMIN_PAGE_SIZE'), *pagination.cursor_args()
+    )
+    return render_template('admin/manage_ebooks.html', title='Manage Ebooks', ebooks=page.items, page=page)
 
 
 @main_bp.route('/admin/add_ebook', methods=['GET', 'POST'])
@@ -156,9 +165,23 @@ def edit_ebook(ebook_id):
 @main_bp.route('/admin/audiobooks')
 @login_required
 @admin_required
+@db_routing.replica_reads
 def manage_audiobooks():
-    audiobooks = Audiobook.query.order_by(Audiobook.title).all()
-    return render_template('admin/manage_audiobooks.html', title='Manage Audiobooks', audiobooks=audiobooks)
+    page = pagination.keyset_paginate(
+        Audiobook.query, (Audiobook.title, Audiobook.id),
+        pagination.page_size('ADMIN_PAGE_SIZE'), *pagination.cursor_args()
+    )
+    return render_template('admin/manage_audiobooks.html', title='Manage Audiobooks', audiobooks=page.items, page=page)
+
+
+def _index_audiobook(audiobook):
+    """Build the seek/chapter index at ingest time; a missing file only warns."""
+    try:
+        audio_index.build_index(audiobook)
+        db.session.commit()
+    except (OSError, audio_index.UnsupportedAudio) as e:
+        db.session.rollback()
+        flash(f'Could not index the audio file ({e}); seeking by chapter will be unavailable.', 'warning')
 
 
 @main_bp.route('/admin/add_audiobook', methods=['GET', 'POST'])
@@ -179,6 +202,7 @@ def add_audiobook():
         )
         db.session.add(new_audiobook)
         db.session.commit()
+        _index_audiobook(new_audiobook)
         flash(f'Audiobook "{new_audiobook.title}" has been added successfully!', 'success')
         return redirect(url_for('main.manage_audiobooks'))
     return render_template('admin/add_audiobook.html', title='Add New Audiobook', form=form)
@@ -202,6 +226,7 @@ def edit_audiobook(audiobook_id):
         audiobook.file_size_mb = form.file_size_mb.data
         
         db.session.commit()
+        _index_audiobook(audiobook)
         flash('The audiobook has been updated successfully!', 'success')
         return redirect(url_for('main.manage_audiobooks'))
     
@@ -222,15 +247,49 @@ def edit_audiobook(audiobook_id):
 @main_bp.route('/admin/students')
 @login_required
 @admin_required
+@db_routing.replica_reads
 def manage_students():
-    students = Student.query.order_by(Student.name).all()
-    return render_template('admin/manage_students.html', title='Manage Students', students=students)
+    page = pagination.keyset_paginate(
+        Student.query, (Student.name, Student.id),
+        pagination.page_size('ADMIN_PAGE_SIZE'), *pagination.cursor_args()
+    )
+    return render_template('admin/manage_students.html', title='Manage Students', students=page.items, page=page)
 
 
 @main_bp.route('/admin/student/<int:student_id>')
 @login_required
 @admin_required
+@db_routing.replica_reads
 def student_detail(student_id):
-    student = Student.query.get_or_404(student_id)
+    student = Student.query.options(*Student.profile('detail')).filter_by(id=student_id).first_or_404()
     return render_template('admin/student_detail.html', title=f'Details for {student.name}', student=student)
-                
\ No newline at end of file
+                
+
+
+# ===== DATA EXPORTS =====
+@main_bp.route('/admin/export/<entity>')
+@login_required
+@admin_required
+@db_routing.replica_reads
+def export_data(entity):
+    """
+    Stream a table as CSV or JSON Lines, e.g.
+    /admin/export/loans?format=jsonl&columns=id,student_id,due_date&since=2025-01-01&gzip=1
+    """
+    columns = [c.strip() for c in request.args.get('columns', '').split(',') if c.strip()]
+    try:
+        export = exports.export(
+            entity,
+            fmt=request.args.get('format', 'csv'),
+            columns=columns or None,
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            gzipped=request.args.get('gzip', '').lower() in ('1', 'true', 'yes'),
+        )
+    except exports.ExportError as e:
+        abort(400, description=str(e))
+    return Response(
+        stream_with_context(export.chunks),
+        mimetype=export.mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{export.filename}"'},
+    )
@@ -1,35 +1,43 @@
-from flask import render_template, flash, redirect, url_for, request, jsonify
+import math
+
+from flask import render_template, url_for, request, jsonify, abort
 from flask_login import login_required, current_user
 from app.routes import main_bp
 from app.models.audiobook import Audiobook
 from app import db
-from sqlalchemy import or_
+from app.services import audio_index, db_routing, http_cache, media, pagination, search
 
 @main_bp.route('/audiobooks')
+@http_cache.cached_page(max_age=60)
+@db_routing.replica_reads
 def list_audiobooks():
     """Display list of audiobooks. (Publicly accessible)"""
     search_term = request.args.get('q', '', type=str)
+    per_page = pagination.page_size()
+    after, before = pagination.cursor_args()
     
     if search_term:
-        audiobooks = Audiobook.query.filter(
-            or_(
-                Audiobook.title.ilike(f'%{search_term}%'),
-                Audiobook.author.ilike(f'%{search_term}%'),
-                Audiobook.narrator.ilike(f'%{search_term}%')
-            )
-        ).order_by(Audiobook.title).all()
+        hits = search.search(search_term, kind='audiobook')
+        page = pagination.paginate_hits(hits, per_page, after, before)
+        audiobooks = search.load_hits(Audiobook, page.items)
     else:
-        audiobooks = Audiobook.query.order_by(Audiobook.title).all()
+        page = pagination.keyset_paginate(
+            Audiobook.query, (Audiobook.title, Audiobook.id), per_page, after, before
+        )
+        audiobooks = page.items
     
     return render_template(
         'audiobooks/list.html',
         title='Audiobooks Collection',
         audiobooks=audiobooks,
-        search_term=search_term
+        search_term=search_term,
+        page=page
     )
 
 
 @main_bp.route('/audiobook/<int:audiobook_id>')
+@http_cache.cached_page(max_age=300)
+@db_routing.replica_reads
 def audiobook_detail(audiobook_id):
     """Display audiobook details. (Publicly accessible)"""
     audiobook = Audiobook.query.get_or_404(audiobook_id)
@@ -52,11 +60,13 @@ def listen_audiobook(audiobook_id):
                              feature='audiobooks')
     
     audiobook = Audiobook.query.get_or_404(audiobook_id)
+    index = audio_index.get_index(audiobook, build=False)
     
     return render_template(
         'audiobooks/player.html',
         title=f'Listening: {audiobook.title}',
-        audiobook=audiobook
+        audiobook=audiobook,
+        chapters=index.chapters if index else []
     )
 
 
@@ -72,6 +82,95 @@ def download_audiobook(audiobook_id):
     
     audiobook = Audiobook.query.get_or_404(audiobook_id)
     
-    # In production, this would serve the actual file
-    flash(f'Downloading {audiobook.title}...', 'info')
-    return redirect(url_for('main.audiobook_detail', audiobook_id=audiobook_id))
\ No newline at end of file
+    return media.send_media(audiobook.file_path, download_name=media.download_name_for(audiobook))
+
+
+@main_bp.route('/audiobook/<int:audiobook_id>/stream')
+@login_required
+def stream_audiobook(audiobook_id):
+    """Audio source for the player; Range requests let the player seek."""
+    if not current_user.has_access_to_audiobooks():
+        abort(403)
+    
+    audiobook = Audiobook.query.get_or_404(audiobook_id)
+    
+    return media.send_media(
+        audiobook.file_path,
+        download_name=media.download_name_for(audiobook),
+        as_attachment=False
+    )
+
+
+def _segment_index_or_404(audiobook):
+    try:
+        index = audio_index.get_index(audiobook)
+    except (OSError, audio_index.UnsupportedAudio):
+        index = None
+    if index is None:
+        abort(404)
+    return index
+
+
+@main_bp.route('/audiobook/<int:audiobook_id>/segments.json')
+@login_required
+def audiobook_segments(audiobook_id):
+    """Seek table and chapters, so players can turn a timestamp into a byte range."""
+    if not current_user.has_access_to_audiobooks():
+        abort(403)
+    
+    audiobook = Audiobook.query.get_or_404(audiobook_id)
+    index = _segment_index_or_404(audiobook)
+    
+    return jsonify({
+        'container': index.container,
+        'duration_ms': index.duration_ms,
+        'file_size': index.file_size,
+        'data_start': index.data_start,
+        'data_end': index.data_end,
+        'points': index.points,
+        'chapters': index.chapters,
+        'stream_url': url_for('main.stream_audiobook', audiobook_id=audiobook.id),
+    })
+
+
+def _is_offset(seconds):
+    # float() accepts 'inf' and 'nan', which have no millisecond value
+    return math.isfinite(seconds) and seconds >= 0
+
+
+@main_bp.route('/audiobook/<int:audiobook_id>/segment')
+@login_required
+def audiobook_segment(audiobook_id):
+    """
+    Bytes for a time window, e.g. ?start=3600&end=3660 (seconds) or
+    ?chapter=3 (0-based). The window is widened to the nearest indexed
+    seek points; the X-Segment-* headers give the exact bounds served.
+    """
+    if not current_user.has_access_to_audiobooks():
+        abort(403)
+    
+    audiobook = Audiobook.query.get_or_404(audiobook_id)
+    index = _segment_index_or_404(audiobook)
+    
+    chapter = request.args.get('chapter', type=int)
+    if chapter is not None:
+        chapters = index.chapters
+        if not 0 <= chapter < len(chapters):
+            abort(404)
+        start_ms, end_ms = chapters[chapter]['start_ms'], chapters[chapter]['end_ms']
+    else:
+        start = request.args.get('start', 0, type=float)
+        end = request.args.get('end', type=float)
+        if not _is_offset(start) or (end is not None and not _is_offset(end)):
+            abort(400, description='start and end must be non-negative numbers of seconds')
+        start_ms = int(start * 1000)
+        end_ms = int(end * 1000) if end is not None else None
+        if end_ms is not None and end_ms <= start_ms:
+            abort(400, description='end must be after start')
+    
+    segment = audio_index.find_segment(index, start_ms, end_ms)
+    response = media.send_byte_range(audiobook.file_path, segment.start_byte, segment.end_byte)
+    response.headers['X-Segment-Start-Ms'] = str(segment.start_ms)
+    response.headers['X-Segment-End-Ms'] = str(segment.end_ms)
+    response.headers['X-Segment-Bytes'] = f"{segment.start_byte}-{segment.end_byte - 1}"
+    return response
@@ -1,35 +1,42 @@
-from flask import render_template, flash, redirect, url_for, request, session
+from flask import render_template, flash, redirect, url_for, request, current_app
 from app import db
 from app.models.physical_book import PhysicalBook
 from app.models.loan import Loan
+from app.services import bag, borrowing, db_routing, http_cache, pagination, search
 from flask_login import current_user, login_required
 from datetime import datetime, timedelta
-from sqlalchemy import or_
 from app.routes import main_bp
 
 @main_bp.route('/')
+@http_cache.cached_page(max_age=300)
 def landing_page():
     """Renders the main landing page."""
     return render_template('landing_page.html', title='Welcome to LibraNet')
 
 @main_bp.route('/books')
+@http_cache.cached_page(max_age=60)
+@db_routing.replica_reads
 def list_books():
     """Displays the list of all books in the catalog. (Publicly accessible)"""
     search_term = request.args.get('q', '', type=str)
+    per_page = pagination.page_size()
+    after, before = pagination.cursor_args()
 
     if search_term:
-        books = PhysicalBook.query.filter(
-            or_(
-                PhysicalBook.title.ilike(f'%{search_term}%'),
-                PhysicalBook.author.ilike(f'%{search_term}%')
-            )
-        ).order_by(PhysicalBook.title).all()
+        hits = search.search(search_term, kind='physical_book')
+        page = pagination.paginate_hits(hits, per_page, after, before)
+        books = search.load_hits(PhysicalBook, page.items)
     else:
-        books = PhysicalBook.query.order_by(PhysicalBook.title).all()
+        page = pagination.keyset_paginate(
+            PhysicalBook.query, (PhysicalBook.title, PhysicalBook.id), per_page, after, before
+        )
+        books = page.items
 
-    return render_template('books.html', title='Book Catalog', books=books, search_term=search_term)
+    return render_template('books.html', title='Book Catalog', books=books, search_term=search_term, page=page)
 
 @main_bp.route('/book/<int:book_id>')
+@http_cache.cached_page(max_age=30)
+@db_routing.replica_reads
 def book_detail(book_id):
     """Displays the details of a specific book. (Publicly accessible)"""
     book = PhysicalBook.query.get_or_404(book_id)
@@ -47,22 +54,18 @@ def book_detail(book_id):
 @main_bp.route('/add_to_bag/<int:book_id>', methods=['POST'])
 @login_required
 def add_to_bag(book_id):
-    """Adds a book to the user's bag stored in the session."""
+    """Adds a book to the user's bag."""
     # Check subscription access
     if not current_user.has_access_to_physical_books():
         flash('Upgrade your plan to borrow physical books!', 'warning')
         return redirect(url_for('main.subscriptions'))
     
-    if 'bag' not in session:
-        session['bag'] = []
-
-    if book_id not in session['bag']:
-        session['bag'].append(book_id)
+    book = PhysicalBook.query.get_or_404(book_id)
+    if bag.add(current_user.id, book.id):
         flash('Book added to your bag.', 'success')
     else:
         flash('Book is already in your bag.', 'info')
 
-    session.modified = True
     return redirect(url_for('main.book_detail', book_id=book_id))
 
 @main_bp.route('/my_bag')
@@ -75,14 +78,13 @@ def my_bag():
                              title='Upgrade Required',
                              feature='physical_books')
     
-    if 'bag' not in session or not session['bag']:
+    book_ids = bag.book_ids(current_user.id)
+    if not book_ids:
         return render_template('my_bag.html', title='My Bag', books=[], can_borrow=False, due_date=datetime.utcnow() + timedelta(days=14))
 
-    book_ids = session['bag']
     books = PhysicalBook.query.filter(PhysicalBook.id.in_(book_ids)).all()
 
-    active_loans_count = Loan.query.filter_by(student_id=current_user.id, returned_date=None).count()
-    can_borrow = (len(books) + active_loans_count) <= 5
+    can_borrow = (len(books) + current_user.active_loan_count) <= current_app.config['MAX_ACTIVE_LOANS']
     
     # Calculate due date (14 days from now)
     due_date = datetime.utcnow() + timedelta(days=14)
@@ -93,9 +95,7 @@ def my_bag():
 @login_required
 def remove_from_bag(book_id):
     """Removes a book from the user's bag."""
-    if 'bag' in session and book_id in session['bag']:
-        session['bag'].remove(book_id)
-        session.modified = True
+    if bag.remove(current_user.id, book_id):
         flash('Book removed from your bag.', 'success')
     return redirect(url_for('main.my_bag'))
 
@@ -108,30 +108,23 @@ def borrow():
         flash('Upgrade your plan to borrow physical books!', 'warning')
         return redirect(url_for('main.subscriptions'))
     
-    if 'bag' not in session or not session['bag']:
+    book_ids = bag.book_ids(current_user.id)
+    if not book_ids:
         flash('Your bag is empty.', 'danger')
         return redirect(url_for('main.my_bag'))
 
-    book_ids = session['bag']
-    active_loans_count = Loan.query.filter_by(student_id=current_user.id, returned_date=None).count()
+    result = borrowing.borrow_books(current_user.id, book_ids)
 
-    if (len(book_ids) + active_loans_count) > 5:
-        flash(f'You cannot borrow more than 5 books at a time. You already have {active_loans_count} books on loan.', 'danger')
+    if result.limit_reached:
+        max_loans = current_app.config['MAX_ACTIVE_LOANS']
+        flash(f'You cannot borrow more than {max_loans} books at a time. You already have {result.active_loans} books on loan.', 'danger')
         return redirect(url_for('main.my_bag'))
 
-    borrowed_books = 0
-    for book_id in book_ids:
-        book = PhysicalBook.query.get(book_id)
-        if book and book.is_available:
-            loan = Loan(student_id=current_user.id, book_id=book_id)
-            db.session.add(loan)
-            book.available_copies -= 1
-            borrowed_books += 1
-        else:
-            flash(f"'{book.title if book else 'A book'}' could not be borrowed as it's not available.", 'danger')
+    for outcome in result.failed:
+        flash(f"'{outcome.title or 'A book'}' could not be borrowed as it's not available.", 'danger')
 
+    bag.clear(current_user.id)
     db.session.commit()
-    session.pop('bag', None)
-    if borrowed_books > 0:
-        flash(f'You have successfully borrowed {borrowed_books} book(s).', 'success')
+    if result.borrowed:
+        flash(f'You have successfully borrowed {len(result.borrowed)} book(s).', 'success')
     return redirect(url_for('main.my_loans'))
\ No newline at end of file
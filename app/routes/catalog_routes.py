@@ -0,0 +1,31 @@
+from flask import render_template, request
+from app.routes import main_bp
+from app.services import catalog, db_routing, pagination
+
+@main_bp.route('/catalog')
+@db_routing.replica_reads
+def browse_catalog():
+    """Search and browse every format in one list. (Publicly accessible)"""
+    search_term = request.args.get('q', '', type=str)
+    formats = request.args.getlist('format')
+    after, before = pagination.cursor_args()
+
+    result = catalog.browse_catalog(
+        search_term=search_term,
+        formats=formats,
+        per_page=pagination.page_size(),
+        after=after,
+        before=before
+    )
+
+    return render_template(
+        'catalog.html',
+        title='Library Catalog',
+        publications=result.items,
+        page=result.page,
+        facets=result.facets,
+        formats=catalog.FORMATS,
+        selected_formats=formats,
+        search_term=search_term,
+        is_available=catalog.is_available
+    )
@@ -1,35 +1,41 @@
-from flask import render_template, flash, redirect, url_for, request, abort, send_file
+from flask import current_app, render_template, url_for, request, abort, send_file, Response
 from flask_login import login_required, current_user
 from app.routes import main_bp
 from app.models.ebook import Ebook
 from app import db
-from sqlalchemy import or_
-import os
+from app.services import db_routing, ebook_pages, http_cache, media, pagination, search
 
 @main_bp.route('/ebooks')
+@http_cache.cached_page(max_age=60)
+@db_routing.replica_reads
 def list_ebooks():
     """Display list of ebooks. (Publicly accessible)"""
     search_term = request.args.get('q', '', type=str)
+    per_page = pagination.page_size()
+    after, before = pagination.cursor_args()
     
     if search_term:
-        ebooks = Ebook.query.filter(
-            or_(
-                Ebook.title.ilike(f'%{search_term}%'),
-                Ebook.author.ilike(f'%{search_term}%')
-            )
-        ).order_by(Ebook.title).all()
+        hits = search.search(search_term, kind='ebook')
+        page = pagination.paginate_hits(hits, per_page, after, before)
+        ebooks = search.load_hits(Ebook, page.items)
     else:
-        ebooks = Ebook.query.order_by(Ebook.title).all()
+        page = pagination.keyset_paginate(
+            Ebook.query, (Ebook.title, Ebook.id), per_page, after, before
+        )
+        ebooks = page.items
     
     return render_template(
         'ebooks/list.html',
         title='Ebooks Collection',
         ebooks=ebooks,
-        search_term=search_term
+        search_term=search_term,
+        page=page
     )
 
 
 @main_bp.route('/ebook/<int:ebook_id>')
+@http_cache.cached_page(max_age=300)
+@db_routing.replica_reads
 def ebook_detail(ebook_id):
     """Display ebook details. (Publicly accessible)"""
     ebook = Ebook.query.get_or_404(ebook_id)
@@ -53,13 +59,80 @@ def read_ebook(ebook_id):
     
     ebook = Ebook.query.get_or_404(ebook_id)
     
+    # Only the page count is read here; pages are fetched one at a time.
+    try:
+        info = ebook_pages.book_info(ebook.file_path)
+    except ebook_pages.PagesUnavailable:
+        info = None  # reader falls back to the whole file
+    except FileNotFoundError:
+        abort(404)
+    
     return render_template(
         'ebooks/reader.html',
         title=f'Reading: {ebook.title}',
-        ebook=ebook
+        ebook=ebook,
+        page_count=info.page_count if info else None,
+        start_page=request.args.get('page', 1, type=int)
     )
 
 
+# EPUB chapters are publisher HTML: render them sandboxed, without scripts.
+_PAGE_CSP = "sandbox allow-same-origin; default-src 'self'; img-src 'self' data:; style-src 'self' 'unsafe-inline'; script-src 'none'"
+
+
+@main_bp.route('/ebook/<int:ebook_id>/page/<int:page>')
+@login_required
+def ebook_page(ebook_id, page):
+    """Serve a single page (PDF) or chapter (EPUB) of an ebook."""
+    if not current_user.has_access_to_ebooks():
+        abort(403)
+    
+    ebook = Ebook.query.get_or_404(ebook_id)
+    base_url = url_for('main.ebook_resource', ebook_id=ebook.id, name='')
+    try:
+        result = ebook_pages.get_page(ebook.file_path, page, base_url=base_url)
+    except (ebook_pages.PageNotFound, FileNotFoundError):
+        abort(404)
+    except ebook_pages.PagesUnavailable:
+        abort(501)
+    
+    response = send_file(result.path, mimetype=result.mimetype, conditional=True, etag=True,
+                         max_age=current_app.config.get('MEDIA_MAX_AGE', 3600))
+    response.cache_control.private = True
+    response.headers['Content-Security-Policy'] = _PAGE_CSP
+    return response
+
+
+@main_bp.route('/ebook/<int:ebook_id>/epub/<path:name>')
+@login_required
+def ebook_resource(ebook_id, name):
+    """Images and stylesheets referenced by EPUB chapters."""
+    if not current_user.has_access_to_ebooks():
+        abort(403)
+    
+    ebook = Ebook.query.get_or_404(ebook_id)
+    try:
+        data, mimetype = ebook_pages.get_epub_resource(ebook.file_path, name)
+    except (ebook_pages.PageNotFound, FileNotFoundError):
+        abort(404)
+    
+    response = Response(data, mimetype=mimetype)
+    response.headers['Cache-Control'] = 'private, max-age=%d' % current_app.config.get('MEDIA_MAX_AGE', 3600)
+    response.headers['Content-Security-Policy'] = _PAGE_CSP
+    return response
+
+
+@main_bp.route('/ebook/<int:ebook_id>/file')
+@login_required
+def view_ebook_file(ebook_id):
+    """Whole ebook file shown inline (reader fallback when pages cannot be split)."""
+    if not current_user.has_access_to_ebooks():
+        abort(403)
+    
+    ebook = Ebook.query.get_or_404(ebook_id)
+    return media.send_media(ebook.file_path, download_name=media.download_name_for(ebook), as_attachment=False)
+
+
 @main_bp.route('/ebook/<int:ebook_id>/download')
 @login_required
 def download_ebook(ebook_id):
@@ -72,7 +145,4 @@ def download_ebook(ebook_id):
     
     ebook = Ebook.query.get_or_404(ebook_id)
     
-    # In production, this would serve the actual file
-    # For now, just show a message
-    flash(f'Downloading {ebook.title}...', 'info')
-    return redirect(url_for('main.ebook_detail', ebook_id=ebook_id))
\ No newline at end of file
+    return media.send_media(ebook.file_path, download_name=media.download_name_for(ebook))
\ No newline at end of file
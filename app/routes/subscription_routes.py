@@ -1,25 +1,17 @@
 # ========================================
 # FILE: app/routes/subscription_routes.py
 # ========================================
-from flask import render_template, redirect, url_for, flash, request, jsonify
+from flask import render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
 from app.routes import main_bp
 from app.models.subscription import Subscription
-from app.models import SubscriptionTierEnum
+from app.models import PaymentStatusEnum, SubscriptionTierEnum
 from app import db
-from datetime import datetime, timedelta
+from app.services import entitlements, payments
 from decimal import Decimal
-import razorpay # type: ignore
-import os
 import hmac
 import hashlib
 
-# Initialize Razorpay Client
-RAZORPAY_KEY_ID = os.environ.get('RAZORPAY_KEY_ID', 'rzp_test_YOUR_KEY_ID')
-RAZORPAY_KEY_SECRET = os.environ.get('RAZORPAY_KEY_SECRET', 'YOUR_KEY_SECRET')
-
-razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
-
 # Subscription pricing (inclusive of GST)
 SUBSCRIPTION_PRICES = {
     SubscriptionTierEnum.FREE: 0,
@@ -102,6 +94,13 @@ SUBSCRIPTION_FEATURES = {
 def subscriptions():
     """Display subscription plans."""
     current_sub = current_user.current_subscription
+    if not current_sub:
+        # Free plan: a transient row for display only (not saved to DB)
+        current_sub = Subscription(
+            student_id=current_user.id,
+            tier=SubscriptionTierEnum.FREE,
+            is_active=True
+        )
     return render_template(
         'subscriptions.html',
         title='Subscription Plans',
@@ -141,7 +140,7 @@ def subscribe(tier):
             title=f'Subscribe to {plan_info["name"]}',
             plan=plan_info,
             tier=tier_enum,
-            razorpay_key_id=RAZORPAY_KEY_ID
+            razorpay_key_id=payments.key_id()
         )
     
     # POST method is deprecated - payment now handled via Razorpay
@@ -149,10 +148,33 @@ def subscribe(tier):
     return redirect(url_for('main.subscribe', tier=tier))
 
 
+def _verification_response(verification):
+    """JSON for the payment page: activated, refused, or still being checked."""
+    if verification.status == PaymentStatusEnum.COMPLETED:
+        return jsonify({
+            'success': True,
+            'subscription_id': verification.subscription_id,
+            'message': 'Subscription activated successfully'
+        })
+    if verification.status == PaymentStatusEnum.FAILED:
+        return jsonify({'success': False, 'message': 'Payment not successful'}), 400
+    return jsonify({
+        'success': False,
+        'pending': True,
+        'message': 'We could not confirm your payment with Razorpay yet. '
+                   'Your plan will be activated as soon as it is confirmed.'
+    }), 202
+
+
 @main_bp.route('/verify_payment', methods=['POST'])
 @login_required
 def verify_payment():
-    """Verify Razorpay payment and activate subscription."""
+    """
+    Verify a Razorpay payment and activate the subscription.
+    The gateway is asked through payments.verify_now, which waits a bounded
+    time; a payment it cannot confirm yet stays pending and the reconciler
+    activates the plan later. Posting the same payment again is harmless.
+    """
     try:
         data = request.get_json()
         
@@ -169,54 +191,22 @@ def verify_payment():
             tier_enum = SubscriptionTierEnum[tier.upper()]
         except KeyError:
             return jsonify({'success': False, 'message': 'Invalid tier'}), 400
+        if tier_enum == SubscriptionTierEnum.FREE:
+            return jsonify({'success': False, 'message': 'Invalid tier'}), 400
         
-        # In TEST MODE, we'll skip actual Razorpay verification
-        # In PRODUCTION, you should verify the payment signature
-        try:
-            # Try to fetch payment from Razorpay (works in both test and live mode)
-            payment = razorpay_client.payment.fetch(payment_id)
-            
-            # Check if payment is captured (for test mode, this might be 'authorized')
-            if payment['status'] not in ['captured', 'authorized']:
-                return jsonify({'success': False, 'message': 'Payment not successful'}), 400
-                
-        except Exception as e:
-            # In test mode, if fetching fails, we'll proceed anyway
-            # In production, you should handle this more strictly
-            print(f"Razorpay fetch error (might be test mode): {str(e)}")
-            # For test mode, we'll accept the payment
-            pass
-        
-        # Deactivate all currently active subscriptions for this user
-        Subscription.query.filter_by(
-            student_id=current_user.id, 
-            is_active=True
-        ).update({'is_active': False})
-        
-        # Create new subscription
         price = Decimal(str(SUBSCRIPTION_PRICES[tier_enum]))
         duration = SUBSCRIPTION_FEATURES[tier_enum]['duration_days']
+        verification, created = payments.record_payment(current_user.id, payment_id, tier_enum, price, duration)
         
-        new_sub = Subscription(
-            student_id=current_user.id,
-            tier=tier_enum,
-            start_date=datetime.utcnow(),
-            end_date=datetime.utcnow() + timedelta(days=duration),
-            is_active=True,
-            price_paid=price
-        )
-        
-        db.session.add(new_sub)
-        db.session.commit()
+        if verification.student_id != current_user.id:
+            return jsonify({'success': False, 'message': 'Payment already used'}), 400
+        if created:
+            payments.verify_now(verification)
         
-        return jsonify({
-            'success': True,
-            'subscription_id': new_sub.id,
-            'message': 'Subscription activated successfully'
-        })
+        return _verification_response(verification)
         
-    except Exception as e:
-        print(f"Error in verify_payment: {str(e)}")
+    except Exception:
+        current_app.logger.exception("Error in verify_payment")
         db.session.rollback()
         return jsonify({'success': False, 'message': 'Server error'}), 500
 
@@ -264,6 +254,7 @@ def cancel_subscription():
     )
     
     db.session.add(free_sub)
+    entitlements.apply_subscription(current_user, None)
     db.session.commit()
     
     flash('Subscription cancelled successfully. You are now on the Free plan.', 'success')
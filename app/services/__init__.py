@@ -0,0 +1,4 @@
+# In app/services/__init__.py
+#
+# Service modules hold logic that is shared between routes, CLI commands
+# and models but does not belong to a single model class.
@@ -0,0 +1,389 @@
+# In app/services/audio_index.py
+#
+# Segment index for audiobooks. When a file is ingested we walk its
+# structure once and store a time -> byte offset table plus chapter
+# boundaries (AudiobookSegmentIndex):
+#   MP3       - MPEG audio frame headers; chapters from ID3v2 CHAP frames
+#   M4B / MP4 - the sound track's sample tables (stts/stsc/stsz/stco);
+#               chapters from the Nero 'chpl' atom
+# A seek then needs one lookup and one small ranged read instead of
+# reading the file from the start.
+
+import mmap
+import os
+import struct
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from datetime import datetime
+
+from flask import current_app
+
+from app import db
+from app.models.audiobook_segment_index import AudiobookSegmentIndex
+from app.services import media
+
+ParsedAudio = namedtuple('ParsedAudio', 'container duration_ms data_start data_end points chapters')
+Segment = namedtuple('Segment', 'start_ms end_ms start_byte end_byte')
+
+
+class UnsupportedAudio(ValueError):
+    """The file is not MP3 or MP4 audio, or is too damaged to index."""
+
+
+# --- MP3 ------------------------------------------------------------------
+
+_BITRATES = {  # kbps by (MPEG-1?, layer)
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _mp3_frame(buf, pos):
+    """(frame_length, samples, sample_rate) for a frame header at pos, or None."""
+    if pos + 4 > len(buf) or buf[pos] != 0xFF or buf[pos + 1] & 0xE0 != 0xE0:
+        return None
+    b1, b2 = buf[pos + 1], buf[pos + 2]
+    version = (b1 >> 3) & 3
+    layer = 4 - ((b1 >> 1) & 3)
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 1
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    if layer == 3 and not mpeg1:
+        return 72 * bitrate // sample_rate + padding, 576, sample_rate
+    return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+
+
+def _mp3_resync(buf, pos, end):
+    """Next position with a frame header that is followed by another one (or the end)."""
+    while True:
+        pos = buf.find(b'\xff', pos, end)
+        if pos < 0:
+            return None
+        frame = _mp3_frame(buf, pos)
+        if frame and pos + frame[0] <= end and (pos + frame[0] == end or _mp3_frame(buf, pos + frame[0])):
+            return pos
+        pos += 1
+
+
+def _synchsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _id3_text(data):
+    encoding, text = data[:1], data[1:]
+    codec = {b'\x00': 'latin-1', b'\x01': 'utf-16', b'\x02': 'utf-16-be', b'\x03': 'utf-8'}.get(encoding, 'latin-1')
+    return text.decode(codec, errors='replace').strip('\x00').strip()
+
+
+def _id3_frames(buf, start, end, major):
+    """Yield (frame_id, body) for ID3v2.3/2.4 frames in buf[start:end]."""
+    pos = start
+    while pos + 10 <= end:
+        frame_id = bytes(buf[pos:pos + 4])
+        if not frame_id.strip(b'\x00') or not frame_id.isalnum():
+            return
+        size = _synchsafe(buf[pos + 4:pos + 8]) if major == 4 else struct.unpack('>I', buf[pos + 4:pos + 8])[0]
+        yield frame_id, bytes(buf[pos + 10:pos + 10 + size])
+        pos += 10 + size
+
+
+def _id3_chapters(buf, tag_end, major):
+    chapters = []
+    for frame_id, body in _id3_frames(buf, 10, tag_end, major):
+        if frame_id != b'CHAP':
+            continue
+        element_end = body.find(b'\x00')
+        if element_end < 0 or element_end + 17 > len(body):
+            continue
+        start_ms, end_ms = struct.unpack('>II', body[element_end + 1:element_end + 9])
+        title = body[:element_end].decode('latin-1')
+        for sub_id, sub_body in _id3_frames(body, element_end + 17, len(body), major):
+            if sub_id == b'TIT2':
+                title = _id3_text(sub_body) or title
+        chapters.append({'title': title, 'start_ms': start_ms, 'end_ms': end_ms})
+    return sorted(chapters, key=lambda c: c['start_ms'])
+
+
+def parse_mp3(buf, interval_ms):
+    pos, chapters = 0, []
+    if bytes(buf[:3]) == b'ID3':
+        major, flags = buf[3], buf[5]
+        tag_end = 10 + _synchsafe(buf[6:10])
+        if major in (3, 4):
+            chapters = _id3_chapters(buf, tag_end, major)
+        pos = tag_end + (10 if flags & 0x10 else 0)
+
+    end = len(buf)
+    if end >= 128 and bytes(buf[end - 128:end - 125]) == b'TAG':
+        end -= 128  # ID3v1 trailer
+
+    points, data_start, samples_done, sample_rate = [], None, 0, None
+    next_point = 0
+    while pos + 4 <= end:
+        frame = _mp3_frame(buf, pos)
+        if frame is None or pos + frame[0] > end:
+            pos = _mp3_resync(buf, pos + 1, end)
+            if pos is None:
+                break
+            continue
+        length, samples, sample_rate = frame
+        if data_start is None:
+            data_start = pos
+        time_ms = samples_done * 1000 // sample_rate
+        if time_ms >= next_point:
+            points.append([time_ms, pos])
+            next_point = time_ms + interval_ms
+        samples_done += samples
+        pos += length
+
+    if data_start is None:
+        raise UnsupportedAudio("no MPEG audio frames found")
+    duration_ms = samples_done * 1000 // sample_rate
+    return ParsedAudio('mp3', duration_ms, data_start, min(pos, end), points, chapters)
+
+
+# --- MP4 / M4B ------------------------------------------------------------
+
+def _atoms(buf, start, end):
+    """Yield (type, body_start, atom_end) for the atoms in buf[start:end]."""
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack('>I4s', buf[pos:pos + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', buf[pos + 8:pos + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield kind, pos + header, min(pos + size, end)
+        pos += size
+
+
+def _child(buf, start, end, *path):
+    """Body bounds of the first atom along path below buf[start:end], or None."""
+    for kind in path:
+        for found, body, atom_end in _atoms(buf, start, end):
+            if found == kind:
+                start, end = body, atom_end
+                break
+        else:
+            return None
+    return start, end
+
+
+def _table(buf, bounds, fmt):
+    """Entries of a full-box sample table (version/flags, count, entries)."""
+    start, _ = bounds
+    count = struct.unpack('>I', buf[start + 4:start + 8])[0]
+    size = struct.calcsize(fmt)
+    return [struct.unpack(fmt, buf[start + 8 + i * size:start + 8 + (i + 1) * size]) for i in range(count)]
+
+
+def _nero_chapters(buf, moov):
+    chpl = _child(buf, moov[0], moov[1], b'udta', b'chpl')
+    if chpl is None:
+        return []
+    pos = chpl[0]
+    version = buf[pos]
+    pos += 4 + (4 if version else 0)
+    count = buf[pos]
+    pos += 1
+    chapters = []
+    for _ in range(count):
+        start_100ns = struct.unpack('>Q', buf[pos:pos + 8])[0]
+        length = buf[pos + 8]
+        title = bytes(buf[pos + 9:pos + 9 + length]).decode('utf-8', errors='replace')
+        chapters.append({'title': title, 'start_ms': start_100ns // 10000, 'end_ms': None})
+        pos += 9 + length
+    return chapters
+
+
+def parse_mp4(buf, interval_ms):
+    moov = _child(buf, 0, len(buf), b'moov')
+    if moov is None:
+        raise UnsupportedAudio("no moov atom")
+
+    for kind, body, trak_end in _atoms(buf, moov[0], moov[1]):
+        if kind != b'trak':
+            continue
+        hdlr = _child(buf, body, trak_end, b'mdia', b'hdlr')
+        if hdlr and bytes(buf[hdlr[0] + 8:hdlr[0] + 12]) == b'soun':
+            trak = (body, trak_end)
+            break
+    else:
+        raise UnsupportedAudio("no sound track")
+
+    mdhd = _child(buf, trak[0], trak[1], b'mdia', b'mdhd')
+    stbl = _child(buf, trak[0], trak[1], b'mdia', b'minf', b'stbl')
+    if mdhd is None or stbl is None:
+        raise UnsupportedAudio("sound track has no sample tables")
+    if buf[mdhd[0]] == 1:
+        timescale, duration = struct.unpack('>IQ', buf[mdhd[0] + 20:mdhd[0] + 32])
+    else:
+        timescale, duration = struct.unpack('>II', buf[mdhd[0] + 12:mdhd[0] + 20])
+
+    stts = _table(buf, _child(buf, stbl[0], stbl[1], b'stts'), '>II')
+    stsc = _table(buf, _child(buf, stbl[0], stbl[1], b'stsc'), '>III')
+    stco = _child(buf, stbl[0], stbl[1], b'stco')
+    offsets = [o[0] for o in (_table(buf, stco, '>I') if stco else
+                              _table(buf, _child(buf, stbl[0], stbl[1], b'co64'), '>Q'))]
+    stsz = _child(buf, stbl[0], stbl[1], b'stsz')
+    fixed_size, sample_count = struct.unpack('>II', buf[stsz[0] + 4:stsz[0] + 12])
+
+    def sample_size(index):
+        if fixed_size:
+            return fixed_size
+        return struct.unpack('>I', buf[stsz[0] + 12 + index * 4:stsz[0] + 16 + index * 4])[0]
+
+    def sample_durations():
+        for count, delta in stts:
+            for _ in range(count):
+                yield delta
+
+    durations = sample_durations()
+    points, next_point, ticks, sample = [], 0, 0, 0
+    run, last_chunk_end = 0, offsets[0] if offsets else 0
+    for chunk_number, offset in enumerate(offsets, start=1):
+        # stsc runs: (first_chunk, samples_per_chunk, description)
+        while run + 1 < len(stsc) and stsc[run + 1][0] <= chunk_number:
+            run += 1
+        per_chunk = stsc[run][1]
+        time_ms = ticks * 1000 // timescale
+        if time_ms >= next_point:
+            points.append([time_ms, offset])
+            next_point = time_ms + interval_ms
+        chunk_bytes = 0
+        for _ in range(min(per_chunk, sample_count - sample)):
+            ticks += next(durations, 0)
+            chunk_bytes += sample_size(sample)
+            sample += 1
+        last_chunk_end = max(last_chunk_end, offset + chunk_bytes)
+
+    if not points:
+        raise UnsupportedAudio("sound track has no samples")
+    duration_ms = duration * 1000 // timescale if duration else ticks * 1000 // timescale
+    data_start = min(offsets)
+    return ParsedAudio('mp4', duration_ms, data_start, last_chunk_end, points, _nero_chapters(buf, moov))
+
+
+# --- Building and using the index ------------------------------------------
+
+def parse_file(path, interval_ms=None):
+    """Parse an MP3 or MP4/M4B file into a ParsedAudio; raises UnsupportedAudio if it cannot."""
+    if interval_ms is None:
+        interval_ms = current_app.config.get('AUDIO_INDEX_INTERVAL_SECONDS', 10) * 1000
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise UnsupportedAudio("empty file")
+        # mmap lets the parsers jump around the file without copying it into
+        # memory. MP4 parsing only touches the atom headers and sample
+        # tables; MP3 has no table of contents, so parse_mp3 visits every
+        # frame header and in effect reads the whole file once.
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            try:
+                if bytes(buf[4:8]) == b'ftyp':
+                    parsed = parse_mp4(buf, interval_ms)
+                else:
+                    parsed = parse_mp3(buf, interval_ms)
+            except (struct.error, IndexError, TypeError, ZeroDivisionError) as e:
+                # Truncated atoms, missing sample tables, a zero timescale...
+                raise UnsupportedAudio(f"damaged file: {e!r}")
+    for i, chapter in enumerate(parsed.chapters):
+        if not chapter['end_ms']:
+            following = parsed.chapters[i + 1]['start_ms'] if i + 1 < len(parsed.chapters) else parsed.duration_ms
+            chapter['end_ms'] = following
+    return parsed
+
+
+def build_index(audiobook):
+    """
+    (Re)build the segment index for an audiobook and fill in its duration
+    and size if they were left blank. The caller commits.
+    """
+    path = media.resolve(audiobook.file_path)
+    if path is None or not os.path.isfile(path):
+        raise FileNotFoundError(audiobook.file_path)
+    stat = os.stat(path)
+    parsed = parse_file(path)
+
+    index = audiobook.segment_index or AudiobookSegmentIndex(audiobook=audiobook)
+    index.container = parsed.container
+    index.file_size = stat.st_size
+    index.file_mtime = stat.st_mtime
+    index.duration_ms = parsed.duration_ms
+    index.data_start = parsed.data_start
+    index.data_end = parsed.data_end
+    index.points = parsed.points
+    index.chapters = parsed.chapters
+    index.indexed_at = datetime.utcnow()
+    db.session.add(index)
+
+    if not audiobook.duration_minutes:
+        audiobook.duration_minutes = round(parsed.duration_ms / 60000)
+    if not audiobook.file_size_mb:
+        audiobook.file_size_mb = round(stat.st_size / (1024 * 1024), 2)
+    return index
+
+
+def is_stale(index, path):
+    stat = os.stat(path)
+    return index.file_size != stat.st_size or abs(index.file_mtime - stat.st_mtime) > 1e-3
+
+
+def get_index(audiobook, build=True):
+    """The audiobook's current index, rebuilding it (and committing) if missing or stale."""
+    index = audiobook.segment_index
+    path = media.resolve(audiobook.file_path)
+    fresh = index is not None and path is not None and os.path.isfile(path) and not is_stale(index, path)
+    if fresh or not build:
+        return index
+    index = build_index(audiobook)
+    db.session.commit()
+    return index
+
+
+def find_segment(index, start_ms, end_ms=None):
+    """
+    Byte range covering [start_ms, end_ms), aligned outwards to indexed
+    seek points. end_ms=None means to the end of the audio.
+    """
+    points = index.points
+    times = [p[0] for p in points]
+    first = max(0, bisect_right(times, max(0, start_ms)) - 1)
+    if end_ms is None:
+        return Segment(times[first], index.duration_ms, points[first][1], index.data_end)
+    last = bisect_left(times, end_ms)
+    if last >= len(points):
+        return Segment(times[first], index.duration_ms, points[first][1], index.data_end)
+    return Segment(times[first], times[last], points[first][1], points[last][1])
+
+
+def index_audiobooks(audiobooks, progress=None):
+    """Build indexes for many audiobooks; returns (indexed, failed)."""
+    indexed = failed = 0
+    for audiobook in audiobooks:
+        try:
+            build_index(audiobook)
+            db.session.commit()
+            indexed += 1
+        except (OSError, UnsupportedAudio) as e:
+            db.session.rollback()
+            failed += 1
+            current_app.logger.warning(f"Could not index audiobook {audiobook.id} ({audiobook.file_path}): {e}")
+        if progress:
+            progress(audiobook, indexed, failed)
+    return indexed, failed
@@ -0,0 +1,58 @@
+# In app/services/bag.py
+#
+# The borrowing bag: physical books a student has picked but not yet
+# borrowed. Stored in bag_item rows keyed by student, so the same bag shows
+# up on every device they log in from.
+
+from flask_login import current_user
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models.bag_item import BagItem
+
+
+def book_ids(student_id):
+    """Book ids in the bag, oldest first."""
+    return list(db.session.scalars(
+        select(BagItem.book_id).where(BagItem.student_id == student_id).order_by(BagItem.id)
+    ))
+
+
+def count(student_id):
+    return db.session.scalar(
+        select(func.count()).select_from(BagItem).where(BagItem.student_id == student_id)
+    )
+
+
+def add(student_id, book_id):
+    """Put a book in the bag and commit; False if it was already there."""
+    db.session.add(BagItem(student_id=student_id, book_id=book_id))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Unique (student_id, book_id): already in the bag
+        db.session.rollback()
+        return False
+    return True
+
+
+def remove(student_id, book_id):
+    """Take a book out of the bag and commit; False if it was not there."""
+    removed = db.session.execute(
+        delete(BagItem).where(BagItem.student_id == student_id, BagItem.book_id == book_id)
+    ).rowcount
+    db.session.commit()
+    return removed > 0
+
+
+def clear(student_id):
+    """Empty the bag; the caller commits."""
+    db.session.execute(delete(BagItem).where(BagItem.student_id == student_id))
+
+
+def init_app(app):
+    @app.context_processor
+    def inject_bag_count():
+        # Called from the navbar only for logged-in students
+        return {'bag_count': lambda: count(current_user.id) if current_user.is_authenticated else 0}
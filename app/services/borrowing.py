@@ -0,0 +1,120 @@
+# In app/services/borrowing.py
+#
+# The borrow transaction. Stock is decremented with a conditional UPDATE
+# (available_copies = available_copies - 1 WHERE available_copies > 0), so
+# two students can never both take the last copy, and the active-loan
+# limit is checked inside the same transaction after taking a per-student
+# lock, so two parallel borrows by one student cannot both pass it.
+
+from collections import namedtuple
+from flask import current_app
+from sqlalchemy import func, insert, update
+
+from app import db
+from app.models.loan import Loan
+from app.models.physical_book import PhysicalBook
+from app.models.student import Student
+from app.services import http_cache
+
+BORROWED = 'borrowed'
+UNAVAILABLE = 'unavailable'
+NOT_FOUND = 'not_found'
+LIMIT_REACHED = 'limit_reached'
+
+BorrowOutcome = namedtuple('BorrowOutcome', 'book_id title status')
+
+
+class BorrowResult:
+    """Per-book outcomes of one borrow attempt."""
+
+    def __init__(self, outcomes, active_loans):
+        self.outcomes = outcomes
+        self.active_loans = active_loans
+
+    @property
+    def borrowed(self):
+        return [o for o in self.outcomes if o.status == BORROWED]
+
+    @property
+    def failed(self):
+        return [o for o in self.outcomes if o.status != BORROWED]
+
+    @property
+    def limit_reached(self):
+        return any(o.status == LIMIT_REACHED for o in self.outcomes)
+
+
+def _lock_student(student_id):
+    """
+    Serialise borrows by the same student. The no-op UPDATE takes the
+    student's row lock on MySQL and the database write lock on SQLite, and
+    holds it until commit or rollback.
+    """
+    student = Student.__table__
+    db.session.execute(
+        update(student).where(student.c.id == student_id).values(id=student.c.id)
+    )
+
+
+def borrow_books(student_id, book_ids, max_active_loans=None):
+    """
+    Borrow every book in book_ids for a student in one transaction.
+    Either the whole request is within the loan limit, or nothing is
+    borrowed; within the limit each book succeeds or fails on its own.
+    """
+    if max_active_loans is None:
+        max_active_loans = current_app.config.get('MAX_ACTIVE_LOANS', 5)
+    book_ids = list(dict.fromkeys(book_ids))
+    book_table = PhysicalBook.__table__
+
+    try:
+        _lock_student(student_id)
+
+        # Locking read so MySQL sees loans committed after our snapshot began.
+        active_loans = (
+            db.session.query(func.count(Loan.id))
+            .filter(Loan.student_id == student_id, Loan.returned_date.is_(None))
+            .with_for_update(read=True)
+            .scalar()
+        )
+        titles = dict(
+            db.session.query(PhysicalBook.id, PhysicalBook.title)
+            .filter(PhysicalBook.id.in_(book_ids))
+            .all()
+        ) if book_ids else {}
+
+        if active_loans + len(book_ids) > max_active_loans:
+            db.session.rollback()
+            return BorrowResult(
+                [BorrowOutcome(i, titles.get(i), LIMIT_REACHED) for i in book_ids], active_loans
+            )
+
+        outcomes = []
+        for book_id in book_ids:
+            if book_id not in titles:
+                outcomes.append(BorrowOutcome(book_id, None, NOT_FOUND))
+                continue
+            taken = db.session.execute(
+                update(book_table)
+                .where(book_table.c.id == book_id, book_table.c.available_copies > 0)
+                .values(available_copies=book_table.c.available_copies - 1)
+            ).rowcount
+            status = BORROWED if taken == 1 else UNAVAILABLE
+            outcomes.append(BorrowOutcome(book_id, titles[book_id], status))
+
+        # One executemany INSERT; dates and status come from the Loan defaults.
+        new_loans = [
+            {'student_id': student_id, 'book_id': o.book_id}
+            for o in outcomes if o.status == BORROWED
+        ]
+        if new_loans:
+            db.session.execute(insert(Loan), new_loans)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if new_loans:
+        # Availability shown on the cached public pages just changed.
+        http_cache.bump_catalog_version()
+    return BorrowResult(outcomes, active_loans + len(new_loans))
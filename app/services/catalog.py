@@ -0,0 +1,78 @@
+# In app/services/catalog.py
+#
+# Cross-format catalog queries. Physical books, ebooks and audiobooks all
+# inherit from Publication (joined-table inheritance), so one polymorphic
+# query with LEFT OUTER JOINs to the three subtype tables returns a mixed
+# page of fully loaded objects in a single round trip.
+
+from collections import namedtuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import with_polymorphic
+
+from app import db
+from app.models.publication import Publication
+from app.models.physical_book import PhysicalBook
+from app.models.ebook import Ebook
+from app.models.audiobook import Audiobook
+from app.services import pagination, search
+
+# Publication.type value -> label shown in the UI
+FORMATS = {
+    'physical_book': 'Physical Books',
+    'ebook': 'Ebooks',
+    'audiobook': 'Audiobooks',
+}
+
+CatalogPage = namedtuple('CatalogPage', 'items page facets')
+
+
+def publication_entity():
+    """Publication with all subtype columns loaded eagerly."""
+    return with_polymorphic(Publication, [PhysicalBook, Ebook, Audiobook])
+
+
+def is_available(publication):
+    """Digital formats are always available; physical books need a free copy."""
+    if isinstance(publication, PhysicalBook):
+        return publication.is_available
+    return True
+
+
+def format_facets():
+    """Number of publications per format, e.g. {'ebook': 12, ...}."""
+    rows = db.session.query(Publication.type, func.count(Publication.id)).group_by(Publication.type)
+    counts = dict.fromkeys(FORMATS, 0)
+    counts.update({kind: count for kind, count in rows if kind in counts})
+    return counts
+
+
+def browse_catalog(search_term='', formats=None, per_page=24, after=None, before=None):
+    """
+    Return one CatalogPage of publications across all formats.
+    With a search term results are ranked by relevance, otherwise they are
+    ordered by (title, id). formats optionally restricts the Publication.type
+    values returned; facets always count every format so the UI can offer them.
+    """
+    formats = [f for f in (formats or []) if f in FORMATS]
+    entity = publication_entity()
+    query = db.session.query(entity)
+
+    if search_term:
+        hits = search.search(search_term)
+        facets = dict.fromkeys(FORMATS, 0)
+        for hit in hits:
+            if hit.kind in facets:
+                facets[hit.kind] += 1
+        if formats:
+            hits = [hit for hit in hits if hit.kind in formats]
+        page = pagination.paginate_hits(hits, per_page, after, before)
+        ids = [hit.id for hit in page.items]
+        rows = {row.id: row for row in query.filter(entity.id.in_(ids))} if ids else {}
+        items = [rows[i] for i in ids if i in rows]
+        return CatalogPage(items, page, facets)
+
+    if formats:
+        query = query.filter(entity.type.in_(formats))
+    page = pagination.keyset_paginate(query, (entity.title, entity.id), per_page, after, before)
+    return CatalogPage(page.items, page, format_facets())
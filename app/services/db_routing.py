@@ -0,0 +1,174 @@
+# In app/services/db_routing.py
+#
+# Read/write splitting. Views decorated with @replica_reads send their plain
+# SELECTs to a read replica from SQLALCHEMY_REPLICA_URIS, round-robin over
+# the replicas that pass their health check. Everything else stays on the
+# primary:
+#   - flushes, INSERT/UPDATE/DELETE and SELECT ... FOR UPDATE
+#   - every read in a request after that request has written (read-after-write)
+#     or locked rows with FOR UPDATE
+#   - all requests of a browser session for REPLICA_STICKY_SECONDS after one
+#     of its requests wrote, so the page a POST redirects to does not show
+#     data the replica has not caught up with yet
+#   - undecorated views, CLI commands and background jobs
+# With no replicas configured, or none healthy, everything uses the primary.
+#
+# A replica is checked with SELECT 1 at most every REPLICA_HEALTH_CHECK_SECONDS.
+# One whose connection fails mid-request is taken out of rotation until its
+# next successful check.
+#
+# Replica engines get the same SQLALCHEMY_ENGINE_OPTIONS (pool size,
+# pre-ping, recycle) as the primary. They are kept out of SQLALCHEMY_BINDS
+# so that create_all() and migrations never touch them. To try it locally,
+# point SQLALCHEMY_REPLICA_URIS at a copy of the SQLite file, or at a second
+# MySQL instance replicating from the first.
+#
+# Decorate after @login_required: the current user is then loaded from the
+# primary, so a student who has just registered is never logged out by lag.
+
+import itertools
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.sql.dml import UpdateBase
+
+_STICKY_KEY = '_db_primary_until'
+
+
+class Replica:
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        self.healthy = True
+        self.checked_at = 0.0  # monotonic time of the last health check
+
+
+def _is_select(clause):
+    return clause is not None and getattr(clause, 'is_select', False)
+
+
+def _is_plain_select(clause):
+    return _is_select(clause) and getattr(clause, '_for_update_arg', None) is None
+
+
+class RoutingSession(Session):
+    """db.session class: plain SELECTs may go to a replica, everything else to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or isinstance(clause, UpdateBase):
+                _mark_written()
+            elif _is_select(clause) and not _is_plain_select(clause):
+                _pin_to_primary()  # FOR UPDATE: later reads must see what it locked
+            elif _is_plain_select(clause):
+                replica = replica_engine()
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+# --- Routing state --------------------------------------------------------
+
+def _mark_written():
+    if has_request_context():
+        g._db_wrote = True
+
+
+def _pin_to_primary():
+    """Keep the rest of this request on the primary, without the sticky window of a write."""
+    if has_request_context():
+        g._db_pinned = True
+
+
+def _check(replica):
+    replica.checked_at = time.monotonic()  # first, so other threads do not check too
+    try:
+        with replica.engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+    except Exception as e:
+        if replica.healthy:
+            current_app.logger.warning(f"Read replica {replica.name} is down: {e}")
+        replica.healthy = False
+    else:
+        if not replica.healthy:
+            current_app.logger.info(f"Read replica {replica.name} is back")
+        replica.healthy = True
+
+
+def _pick_replica(app):
+    state = app.extensions['db_routing']
+    replicas = state['replicas']
+    interval = app.config.get('REPLICA_HEALTH_CHECK_SECONDS', 10)
+    for _ in range(len(replicas)):
+        with state['lock']:
+            replica = replicas[next(state['turn'])]
+        if time.monotonic() - replica.checked_at >= interval:
+            _check(replica)
+        if replica.healthy:
+            return replica.engine
+    return None
+
+
+def replica_engine():
+    """The replica this request reads from, or None when it must use the primary."""
+    if (not has_request_context() or not g.get('_db_replica_reads')
+            or g.get('_db_wrote') or g.get('_db_pinned')):
+        return None
+    if '_db_replica' not in g:
+        app = current_app._get_current_object()
+        g._db_replica = _pick_replica(app) if app.extensions['db_routing']['replicas'] else None
+    return g._db_replica
+
+
+def read_engine():
+    """Engine for raw read-only SQL: the request's replica if it has one, else the primary."""
+    from app import db
+    return replica_engine() or db.engine
+
+
+def replica_reads(view):
+    """Let a read-only view's SELECTs go to a read replica."""
+    @wraps(view)
+    def decorated_view(*args, **kwargs):
+        if session.get(_STICKY_KEY, 0) < time.time():
+            g._db_replica_reads = True
+        return view(*args, **kwargs)
+    return decorated_view
+
+
+def _remember_writes(response):
+    if g.get('_db_wrote'):
+        session[_STICKY_KEY] = time.time() + current_app.config.get('REPLICA_STICKY_SECONDS', 5)
+    return response
+
+
+def _on_replica_error(replica, exception_context):
+    if exception_context.is_disconnect or exception_context.connection is None:
+        replica.healthy = False
+        replica.checked_at = time.monotonic()
+
+
+def init_app(app):
+    uris = app.config.get('SQLALCHEMY_REPLICA_URIS') or []
+    if isinstance(uris, str):
+        uris = [uri.strip() for uri in uris.split(',') if uri.strip()]
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+
+    replicas = []
+    for i, uri in enumerate(uris):
+        replica = Replica(f"replica{i}", create_engine(uri, **options))
+        event.listen(replica.engine, 'handle_error',
+                     lambda context, replica=replica: _on_replica_error(replica, context))
+        replicas.append(replica)
+
+    app.extensions['db_routing'] = {
+        'replicas': replicas,
+        'turn': itertools.cycle(range(len(replicas))),
+        'lock': threading.Lock(),
+    }
+    if replicas:
+        app.after_request(_remember_writes)
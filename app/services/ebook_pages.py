@@ -0,0 +1,345 @@
+# In app/services/ebook_pages.py
+#
+# Page-at-a-time ebook reading. Instead of shipping the whole file to the
+# browser, the reader asks for one page at a time:
+#   EPUB - page n is the n-th spine entry (a chapter), read straight out of
+#          the zip; images and CSS it links to are served from the zip too
+#   PDF  - page n is cut out as a one-page PDF with `pypdf`; each file is
+#          parsed once and its reader kept for the following pages
+# Files that cannot be split (damaged, or PDF without pypdf installed)
+# raise PagesUnavailable and the reader falls back to the whole file.
+# Extracted pages are kept in an LRU disk cache keyed by a hash of the file
+# and the page number, and the next few pages are extracted in the
+# background, so turning a page is usually a cache hit.
+
+import hashlib
+import io
+import os
+import posixpath
+import re
+import shutil
+import threading
+import zipfile
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from xml.etree import ElementTree
+
+from flask import current_app
+
+from app.services import media
+
+Page = namedtuple('Page', 'path mimetype')
+BookInfo = namedtuple('BookInfo', 'kind page_count spine')  # spine: zip paths (EPUB only)
+
+
+class PageNotFound(LookupError):
+    """Page number out of range, or a resource missing from the EPUB."""
+
+
+class PagesUnavailable(RuntimeError):
+    """This file cannot be split into pages here (PDF without pypdf, damaged file)."""
+
+
+# What malformed EPUB/PDF structure surfaces as from zipfile, ElementTree and pypdf
+_DAMAGED = (KeyError, AttributeError, IndexError, TypeError, ValueError)
+
+
+# --- File identity --------------------------------------------------------
+
+_SAMPLE = 1024 * 1024
+
+
+def file_hash(path):
+    """
+    Content hash used in cache keys. For speed on very large files it hashes
+    the size and modification time plus the first and last MiB, so an edit
+    in the middle of the file changes it too (through the mtime).
+    """
+    stat = os.stat(path)
+    return _file_hash(path, stat.st_size, stat.st_mtime_ns)
+
+
+@lru_cache(maxsize=1024)
+def _file_hash(path, size, mtime_ns):
+    digest = hashlib.sha256(f"{size}:{mtime_ns}".encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(_SAMPLE))
+        if size > 2 * _SAMPLE:
+            f.seek(-_SAMPLE, os.SEEK_END)
+            digest.update(f.read(_SAMPLE))
+    return digest.hexdigest()
+
+
+# --- Disk cache -----------------------------------------------------------
+
+class DiskLRUCache:
+    """
+    Files under a directory, evicted least-recently-used first once their
+    total size passes max_bytes. Reads refresh an entry's mtime.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)  # atomic, so readers never see half a page
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+        return path
+
+    def _entries(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith('.tmp'):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        # Trim to 90% so we do not evict on every write near the limit.
+        target = self.max_bytes * 0.9
+        size = self._scan_size()
+        for _, entry_size, path in sorted(self._entries()):
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+                size -= entry_size
+            except FileNotFoundError:
+                pass
+        self._size = size
+
+    def clear(self):
+        with self._lock:
+            shutil.rmtree(self.root, ignore_errors=True)
+            self._size = 0
+
+
+# --- EPUB -----------------------------------------------------------------
+
+_NS = {
+    'c': 'urn:oasis:names:tc:opendocument:xmlns:container',
+    'opf': 'http://www.idpf.org/2007/opf',
+}
+
+
+def _epub_spine(zf):
+    container = ElementTree.fromstring(zf.read('META-INF/container.xml'))
+    opf_path = container.find('.//c:rootfile', _NS).get('full-path')
+    opf = ElementTree.fromstring(zf.read(opf_path))
+    base = posixpath.dirname(opf_path)
+    manifest = {
+        item.get('id'): posixpath.normpath(posixpath.join(base, item.get('href')))
+        for item in opf.find('opf:manifest', _NS)
+    }
+    return [manifest[ref.get('idref')] for ref in opf.find('opf:spine', _NS)
+            if ref.get('idref') in manifest and ref.get('linear', 'yes') != 'no']
+
+
+_HEAD_RE = re.compile(rb'<head[^>]*>', re.IGNORECASE)
+
+
+def _epub_page(zf, spine, page, base_url):
+    name = spine[page - 1]
+    html = zf.read(name)
+    # Let relative links (images, CSS) resolve to the resource endpoint.
+    base = f'<base href="{base_url}{posixpath.dirname(name)}/">'.encode()
+    match = _HEAD_RE.search(html)
+    if match:
+        html = html[:match.end()] + base + html[match.end():]
+    else:
+        html = base + html
+    return html
+
+
+# --- PDF ------------------------------------------------------------------
+
+@lru_cache(maxsize=8)
+def _pdf_document(path, digest):
+    """
+    Parsed PdfReader for one version of a file, kept so that turning pages
+    and read-ahead do not re-parse the whole PDF each time, plus the lock
+    that serialises its use (PdfReader is not thread-safe). A reader holds
+    the file in memory, hence the small cache.
+    """
+    try:
+        from pypdf import PdfReader  # type: ignore
+        from pypdf.errors import PyPdfError  # type: ignore
+    except ImportError:
+        raise PagesUnavailable("PDF page extraction needs the 'pypdf' package (pip install pypdf)")
+    try:
+        reader = PdfReader(path)
+        page_count = len(reader.pages)
+    except (PyPdfError, *_DAMAGED) as e:
+        raise PagesUnavailable(f"cannot read PDF: {e!r}")
+    return reader, page_count, threading.Lock()
+
+
+def _pdf_page(path, digest, page):
+    from pypdf import PdfWriter  # type: ignore
+    from pypdf.errors import PyPdfError  # type: ignore
+    reader, _, lock = _pdf_document(path, digest)
+    try:
+        with lock:
+            writer = PdfWriter()
+            writer.add_page(reader.pages[page - 1])
+            out = io.BytesIO()
+            writer.write(out)
+    except (PyPdfError, *_DAMAGED) as e:
+        raise PagesUnavailable(f"cannot extract page {page}: {e!r}")
+    return out.getvalue()
+
+
+# --- Public API -----------------------------------------------------------
+
+@lru_cache(maxsize=256)
+def _book_info(path, digest):
+    if zipfile.is_zipfile(path):
+        try:
+            with zipfile.ZipFile(path) as zf:
+                spine = _epub_spine(zf)
+        except (zipfile.BadZipFile, ElementTree.ParseError, *_DAMAGED) as e:
+            # No container.xml, bad OPF XML, no rootfile...
+            raise PagesUnavailable(f"cannot read EPUB: {e!r}")
+        return BookInfo('epub', len(spine), tuple(spine))
+    return BookInfo('pdf', _pdf_document(path, digest)[1], ())
+
+
+def _resolve(file_path):
+    path = media.resolve(file_path)
+    if path is None or not os.path.isfile(path):
+        raise FileNotFoundError(file_path)
+    return path
+
+
+def book_info(file_path):
+    """Kind and page count of an ebook file (cached per file hash)."""
+    path = _resolve(file_path)
+    return _book_info(path, file_hash(path))
+
+
+def _cache():
+    app = current_app._get_current_object()
+    state = app.extensions.setdefault('ebook_pages', {})
+    if 'cache' not in state:
+        root = app.config.get('EBOOK_PAGE_CACHE_DIR') or os.path.join(app.instance_path, 'page_cache')
+        state['cache'] = DiskLRUCache(root, app.config.get('EBOOK_PAGE_CACHE_MAX_MB', 512) * 1024 * 1024)
+    return state['cache']
+
+
+def _extract(path, digest, info, page, base_url):
+    if info.kind == 'epub':
+        try:
+            with zipfile.ZipFile(path) as zf:
+                return _epub_page(zf, info.spine, page, base_url)
+        except (zipfile.BadZipFile, *_DAMAGED) as e:
+            raise PagesUnavailable(f"cannot read chapter {page}: {e!r}")
+    return _pdf_page(path, digest, page)
+
+
+def _cached_page(cache, path, digest, info, page, base_url):
+    mimetype = 'text/html' if info.kind == 'epub' else 'application/pdf'
+    key = hashlib.sha256(f"{digest}:{page}:{base_url}".encode()).hexdigest()
+    cached = cache.get(key)
+    if cached is None:
+        cached = cache.put(key, _extract(path, digest, info, page, base_url))
+    return Page(cached, mimetype)
+
+
+_prefetcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='ebook-prefetch')
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def _prefetch(cache, path, digest, info, pages, base_url):
+    for page in pages:
+        job = (digest, page, base_url)
+        with _in_flight_lock:
+            if job in _in_flight:
+                continue
+            _in_flight.add(job)
+
+        def run(page=page, job=job):
+            try:
+                _cached_page(cache, path, digest, info, page, base_url)
+            except Exception:
+                pass  # the page is extracted again when actually requested
+            finally:
+                with _in_flight_lock:
+                    _in_flight.discard(job)
+
+        _prefetcher.submit(run)
+
+
+def get_page(file_path, page, base_url=''):
+    """
+    Return a Page (file path in the cache + mimetype) for page number
+    `page` (1-based) and queue the following pages for prefetching.
+    base_url is where EPUB resources are served from, e.g. /ebook/3/epub/.
+    """
+    path = _resolve(file_path)
+    digest = file_hash(path)
+    info = _book_info(path, digest)
+    if not 1 <= page <= info.page_count:
+        raise PageNotFound(page)
+
+    cache = _cache()
+    result = _cached_page(cache, path, digest, info, page, base_url)
+    ahead = current_app.config.get('EBOOK_PREFETCH_PAGES', 3)
+    upcoming = range(page + 1, min(info.page_count, page + ahead) + 1)
+    if upcoming:
+        _prefetch(cache, path, digest, info, upcoming, base_url)
+    return result
+
+
+def clear_cache():
+    _cache().clear()
+
+
+def get_epub_resource(file_path, name):
+    """(bytes, mimetype) of a file inside an EPUB, e.g. an image a chapter links to."""
+    path = _resolve(file_path)
+    name = posixpath.normpath(name).lstrip('/')
+    if name.startswith('..') or name.startswith('META-INF'):
+        raise PageNotFound(name)
+    try:
+        with zipfile.ZipFile(path) as zf:
+            data = zf.read(name)
+    except KeyError:
+        raise PageNotFound(name)
+    except (zipfile.BadZipFile, zlib.error) as e:
+        # Not an EPUB at all (e.g. a PDF), or a damaged one
+        raise PageNotFound(f"{name}: {e!r}")
+    return data, media.guess_mimetype(name)
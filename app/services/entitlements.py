@@ -0,0 +1,87 @@
+# In app/services/entitlements.py
+
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from app import db
+from app.models import SubscriptionTierEnum
+
+
+def resolve_tier(student):
+    """
+    Return the effective SubscriptionTierEnum for a student.
+    Reads only the denormalised columns on the (already loaded) student row;
+    a paid tier whose expiry has passed reads as FREE even before the
+    expiry sweep has caught up.
+    """
+    expires_at = student.active_tier_expires_at
+    if expires_at is not None and expires_at <= datetime.utcnow():
+        return SubscriptionTierEnum.FREE
+    return student.active_tier or SubscriptionTierEnum.FREE
+
+
+def apply_subscription(student, subscription):
+    """
+    Copy a subscription's tier and expiry onto the student row.
+    Pass None to put the student back on the free plan. The caller commits.
+    """
+    if subscription is None or subscription.tier == SubscriptionTierEnum.FREE:
+        student.active_tier = SubscriptionTierEnum.FREE
+        student.active_tier_expires_at = None
+    else:
+        student.active_tier = subscription.tier
+        student.active_tier_expires_at = subscription.end_date
+    student.refresh_account_summary()
+
+
+def activate_subscription(student, tier, price, duration_days):
+    """
+    Replace a student's active plans with a new paid one starting now and
+    apply it. Returns the new Subscription; the caller commits.
+    """
+    from app.models.subscription import Subscription
+
+    Subscription.query.filter_by(student_id=student.id, is_active=True).update({'is_active': False})
+    now = datetime.utcnow()
+    subscription = Subscription(
+        student_id=student.id,
+        tier=tier,
+        start_date=now,
+        end_date=now + timedelta(days=duration_days),
+        is_active=True,
+        price_paid=price
+    )
+    db.session.add(subscription)
+    apply_subscription(student, subscription)
+    return subscription
+
+
+def expire_subscriptions(now=None):
+    """
+    Deactivate lapsed subscriptions and drop lapsed students back to FREE.
+    Returns (subscriptions_expired, students_downgraded).
+    """
+    from app.models.student import Student
+    from app.models.subscription import Subscription
+
+    now = now or datetime.utcnow()
+    expired = db.session.execute(
+        update(Subscription)
+        .where(
+            Subscription.is_active.is_(True),
+            Subscription.end_date.is_not(None),
+            Subscription.end_date <= now
+        )
+        .values(is_active=False, auto_renew=False)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    downgraded = db.session.execute(
+        update(Student)
+        .where(
+            Student.active_tier_expires_at.is_not(None),
+            Student.active_tier_expires_at <= now
+        )
+        .values(active_tier=SubscriptionTierEnum.FREE, active_tier_expires_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return expired, downgraded
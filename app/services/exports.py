@@ -0,0 +1,192 @@
+# In app/services/exports.py
+#
+# Streaming data exports for admins (/admin/export/<entity>).
+# Rows come from a server-side cursor (yield_per) as plain Core rows, are
+# encoded as CSV or JSON Lines into ~64 KB chunks and optionally gzipped on
+# the fly, so memory use stays flat however large the table is.
+
+import csv
+import io
+import json
+import zlib
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from enum import Enum
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from app import db
+from app.models.publication import Publication
+from app.models.physical_book import PhysicalBook
+from app.models.ebook import Ebook
+from app.models.audiobook import Audiobook
+from app.models.student import Student
+from app.models.loan import Loan
+from app.models.fine import Fine
+from app.models.subscription import Subscription
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+_CHUNK_BYTES = 64 * 1024
+
+# columns: ordered {name: column expression}; date_column: what since/until filter on
+ExportSpec = namedtuple('ExportSpec', 'columns select_from date_column order_by')
+Export = namedtuple('Export', 'filename mimetype chunks')
+
+
+class ExportError(ValueError):
+    """Bad export parameters (unknown entity, column or date)."""
+
+
+def _publication_spec():
+    pub, book = Publication.__table__, PhysicalBook.__table__
+    ebook, audio = Ebook.__table__, Audiobook.__table__
+    columns = {
+        'id': pub.c.id,
+        'type': pub.c.type,
+        'title': pub.c.title,
+        'author': pub.c.author,
+        'summary': pub.c.summary,
+        'image_url': pub.c.image_url,
+        'isbn': book.c.isbn,
+        'total_copies': book.c.total_copies,
+        'available_copies': book.c.available_copies,
+        'related_courses': book.c.related_courses,
+        'file_path': func.coalesce(ebook.c.file_path, audio.c.file_path),
+        'file_format': func.coalesce(ebook.c.file_format, audio.c.file_format),
+        'file_size_mb': func.coalesce(ebook.c.file_size_mb, audio.c.file_size_mb),
+        'duration_minutes': audio.c.duration_minutes,
+        'narrator': audio.c.narrator,
+    }
+    joined = (
+        pub.outerjoin(book, book.c.id == pub.c.id)
+        .outerjoin(ebook, ebook.c.id == pub.c.id)
+        .outerjoin(audio, audio.c.id == pub.c.id)
+    )
+    return ExportSpec(columns, joined, None, pub.c.id)
+
+
+def _table_spec(model, date_column, exclude=()):
+    table = model.__table__
+    columns = {c.name: c for c in table.columns if c.name not in exclude}
+    return ExportSpec(columns, table, table.c[date_column], table.c.id)
+
+
+ENTITIES = {
+    'publications': _publication_spec,
+    # Never export password hashes.
+    'students': lambda: _table_spec(Student, 'joined_at', exclude=('password_hash',)),
+    'loans': lambda: _table_spec(Loan, 'borrowed_date'),
+    'fines': lambda: _table_spec(Fine, 'issued_date'),
+    'subscriptions': lambda: _table_spec(Subscription, 'start_date'),
+}
+
+
+def _parse_date(value, name):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ExportError(f"{name} must be a date like 2025-01-31")
+
+
+def build_statement(entity, columns=None, since=None, until=None):
+    """The SELECT behind an export; since/until are inclusive YYYY-MM-DD dates."""
+    if entity not in ENTITIES:
+        raise ExportError(f"Unknown export '{entity}'. Choose from: {', '.join(ENTITIES)}")
+    spec = ENTITIES[entity]()
+
+    names = columns or list(spec.columns)
+    unknown = [name for name in names if name not in spec.columns]
+    if unknown:
+        raise ExportError(f"Unknown column(s) for {entity}: {', '.join(unknown)}")
+
+    stmt = (
+        select(*[spec.columns[name].label(name) for name in names])
+        .select_from(spec.select_from)
+        .order_by(spec.order_by)
+    )
+    if since or until:
+        if spec.date_column is None:
+            raise ExportError(f"{entity} cannot be filtered by date")
+        if since:
+            stmt = stmt.where(spec.date_column >= _parse_date(since, 'since'))
+        if until:
+            # Inclusive: everything before the start of the next day
+            stmt = stmt.where(spec.date_column < _parse_date(until, 'until') + timedelta(days=1))
+    return names, stmt
+
+
+def _plain(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _rows(stmt):
+    batch = current_app.config.get('EXPORT_YIELD_PER', 1000)
+    # yield_per streams from a server-side cursor instead of buffering every row.
+    result = db.session.execute(stmt.execution_options(yield_per=batch))
+    for row in result:
+        yield [_plain(value) for value in row]
+
+
+def csv_chunks(names, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= _CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def jsonl_chunks(names, rows):
+    lines, size = [], 0
+    for row in rows:
+        line = json.dumps(dict(zip(names, row)), ensure_ascii=False)
+        lines.append(line)
+        size += len(line) + 1
+        if size >= _CHUNK_BYTES:
+            yield '\n'.join(lines) + '\n'
+            lines, size = [], 0
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def gzip_chunks(chunks):
+    """gzip a stream of text chunks without holding more than one in memory."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(entity, fmt='csv', columns=None, since=None, until=None, gzipped=False):
+    """Build a streaming Export; parameters are validated before any row is read."""
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format '{fmt}'. Choose from: {', '.join(FORMATS)}")
+    names, stmt = build_statement(entity, columns, since, until)
+    encode = csv_chunks if fmt == 'csv' else jsonl_chunks
+    chunks = encode(names, _rows(stmt))
+    if gzipped:
+        chunks = gzip_chunks(chunks)
+    else:
+        chunks = (chunk.encode('utf-8') for chunk in chunks)
+    stamp = datetime.utcnow().strftime('%Y%m%d')
+    filename = f"libranet-{entity}-{stamp}.{fmt}" + ('.gz' if gzipped else '')
+    mimetype = 'application/gzip' if gzipped else FORMATS[fmt]
+    return Export(filename, mimetype, chunks)
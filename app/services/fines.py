@@ -0,0 +1,125 @@
+# In app/services/fines.py
+#
+# Overdue fine accrual, run as a scheduled job (`flask fines accrue`)
+# rather than on page views. Every step is a single set-based statement
+# over a range of loan ids, so the job touches each loan once per run and
+# can be re-run at any time with the same result (idempotent).
+#
+# Rule: ₹500.00 per started week overdue (1-7 days = 1 week, 8-14 = 2, ...).
+
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import DateTime, Integer, Numeric, and_, cast, exists, func, insert, literal, literal_column, or_, select, update
+
+from app import db
+from app.models import FineStatusEnum, LoanStatusEnum
+from app.models.fine import Fine
+from app.models.loan import Loan
+
+AccrualResult = namedtuple('AccrualResult', 'created updated settled overdue_loans batches')
+
+
+def _days_overdue(now):
+    """Whole days between Loan.due_date and now, as a SQL expression."""
+    if db.engine.dialect.name == 'sqlite':
+        return cast(func.julianday(literal(now, DateTime)) - func.julianday(Loan.due_date), Integer)
+    return func.timestampdiff(literal_column('DAY'), Loan.due_date, literal(now, DateTime))
+
+
+def _amount_due(now, rate):
+    """Fine amount for a loan as a SQL expression (only valid for >= 1 day overdue)."""
+    weeks = (_days_overdue(now) - 1) // 7 + 1
+    return weeks * literal(rate, Numeric(10, 2))
+
+
+def accrue_fines(now=None, batch_size=None):
+    """
+    Create, update and settle fines for all loans, batch by batch.
+    Returns an AccrualResult with the number of rows affected per step.
+    """
+    now = now or datetime.utcnow()
+    batch_size = batch_size or current_app.config.get('FINE_ACCRUAL_BATCH_SIZE', 5000)
+    rate = current_app.config.get('FINE_RATE_PER_WEEK')
+    # A loan starts accruing once it is at least one whole day overdue.
+    cutoff = now - timedelta(days=1)
+    amount = _amount_due(now, rate)
+
+    low, high = db.session.query(func.min(Loan.id), func.max(Loan.id)).one()
+    totals = [0, 0, 0, 0]
+    batches = 0
+    if low is None:
+        return AccrualResult(0, 0, 0, 0, 0)
+
+    for start in range(low, high + 1, batch_size):
+        in_batch = and_(Loan.id >= start, Loan.id < start + batch_size)
+        accruing = and_(in_batch, Loan.returned_date.is_(None), Loan.due_date <= cutoff)
+
+        # 1. New fines for overdue loans that have none yet
+        new_fines = (
+            select(
+                amount,
+                literal(0, Numeric(10, 2)),
+                literal(FineStatusEnum.PENDING, Fine.__table__.c.status.type),
+                literal(now, DateTime),
+                Loan.id
+            )
+            .where(accruing, ~exists().where(Fine.loan_id == Loan.id))
+        )
+        created = db.session.execute(
+            insert(Fine).from_select(
+                ['amount', 'paid_amount', 'status', 'issued_date', 'loan_id'], new_fines
+            )
+        ).rowcount
+
+        # 2. Bring pending fines of still-open overdue loans up to date
+        current_amount = select(amount).where(Loan.id == Fine.loan_id).scalar_subquery()
+        updated = db.session.execute(
+            update(Fine)
+            .where(
+                Fine.status == FineStatusEnum.PENDING,
+                Fine.loan_id.in_(select(Loan.id).where(accruing)),
+                Fine.amount != current_amount
+            )
+            .values(amount=current_amount)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        # 3. Settle pending fines with nothing left to pay once the loan
+        #    is no longer accruing (returned, or not overdue any more)
+        settled = db.session.execute(
+            update(Fine)
+            .where(
+                Fine.status == FineStatusEnum.PENDING,
+                Fine.paid_amount >= Fine.amount,
+                Fine.loan_id.in_(
+                    select(Loan.id).where(
+                        in_batch,
+                        or_(Loan.returned_date.is_not(None), Loan.due_date > cutoff)
+                    )
+                )
+            )
+            .values(status=FineStatusEnum.PAID)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        # 4. Flag open loans past their due date as overdue
+        overdue = db.session.execute(
+            update(Loan)
+            .where(
+                in_batch,
+                Loan.returned_date.is_(None),
+                Loan.status == LoanStatusEnum.BORROWED,
+                Loan.due_date < now
+            )
+            .values(status=LoanStatusEnum.OVERDUE)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        db.session.commit()
+        batches += 1
+        for i, count in enumerate((created, updated, settled, overdue)):
+            totals[i] += max(count, 0)
+
+    return AccrualResult(*totals, batches)
@@ -0,0 +1,321 @@
+# In app/services/http_cache.py
+#
+# Whole-response cache for the public catalog pages, used only for
+# anonymous visitors (logged-in pages show loans, bag and plan state).
+#
+#   @main_bp.route('/books')
+#   @http_cache.cached_page(max_age=60)
+#   def list_books(): ...
+#
+# Entries are keyed by endpoint, path, query arguments and the catalog
+# version. The version changes whenever a publication is written (session
+# hook below, plus explicit bump_catalog_version() calls from the bulk
+# importer and the borrow transaction, which bypass the ORM), so nothing
+# has to be purged by hand. The version lives in the backend, so only a
+# backend shared by every process (filesystem, redis) guarantees that a
+# bump in one gunicorn worker or in a CLI command reaches all the others.
+#
+# Every cached response carries a strong ETag; a matching If-None-Match is
+# answered with 304 straight from the cache. A cache hit renders nothing and
+# never touches the database.
+#
+# HTTP_CACHE_BACKEND picks the store:
+#   'filesystem' - files under HTTP_CACHE_DIR, shared by workers and CLI
+#                  commands on one host (default)
+#   'memory'     - per-process LRU for a single-process server (flask run);
+#                  other processes' bumps never reach it, so with several
+#                  workers it can serve old pages for up to HTTP_CACHE_TTL
+#   'redis'      - any Redis-protocol server at HTTP_CACHE_REDIS_URL
+#                  (Redis, Valkey, KeyDB...); needs the `redis` package
+#   'null'       - caching disabled
+
+import functools
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+
+from flask import current_app, request, session
+from flask_login import current_user
+from sqlalchemy import event
+from werkzeug.wrappers import Response
+
+from app import db
+
+CachedPage = namedtuple('CachedPage', 'body mimetype etag expires_at')
+
+
+class NullBackend:
+    """Caching disabled."""
+
+    def get_version(self):
+        return '0'
+
+    def bump_version(self):
+        pass
+
+    def get(self, key):
+        return None
+
+    def set(self, key, page):
+        pass
+
+
+class MemoryBackend:
+    """Per-process LRU. Only suits a single process: bumps made elsewhere never reach it."""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._version = uuid.uuid4().hex
+        self._lock = threading.Lock()
+
+    def get_version(self):
+        return self._version
+
+    def bump_version(self):
+        with self._lock:
+            self._version = uuid.uuid4().hex
+            self._entries.clear()
+
+    def get(self, key):
+        with self._lock:
+            page = self._entries.get(key)
+            if page is not None:
+                self._entries.move_to_end(key)
+            return page
+
+    def set(self, key, page):
+        with self._lock:
+            self._entries[key] = page
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class FileSystemBackend:
+    """
+    One file per page under <root>/<version>/. The current version is a
+    token in <root>/VERSION, replaced atomically on bump; old version
+    directories are then deleted.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _version_file(self):
+        return os.path.join(self.root, 'VERSION')
+
+    def get_version(self):
+        try:
+            with open(self._version_file()) as f:
+                return f.read().strip() or '0'
+        except FileNotFoundError:
+            return '0'
+
+    def bump_version(self):
+        version = uuid.uuid4().hex
+        tmp = f"{self._version_file()}.{version}"
+        with open(tmp, 'w') as f:
+            f.write(version)
+        os.replace(tmp, self._version_file())
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name != version and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _path(self, key):
+        version, _, digest = key.partition(':')
+        return os.path.join(self.root, version, digest)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                meta = json.loads(f.readline())
+                body = f.read()
+        except (FileNotFoundError, ValueError):
+            return None
+        return CachedPage(body, meta['mimetype'], meta['etag'], meta['expires_at'])
+
+    def set(self, key, page):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = {'mimetype': page.mimetype, 'etag': page.etag, 'expires_at': page.expires_at}
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(json.dumps(meta).encode() + b'\n')
+            f.write(page.body)
+        os.replace(tmp, path)
+
+
+class RedisBackend:
+    """Pages in a Redis-protocol server; entries expire with their TTL."""
+
+    prefix = 'libranet:page:'
+
+    def __init__(self, url):
+        try:
+            import redis  # type: ignore
+        except ImportError:
+            raise RuntimeError("HTTP_CACHE_BACKEND='redis' needs the 'redis' package (pip install redis)")
+        self.client = redis.Redis.from_url(url)
+
+    def get_version(self):
+        return (self.client.get(self.prefix + 'version') or b'0').decode()
+
+    def bump_version(self):
+        self.client.incr(self.prefix + 'version')
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        meta, _, body = raw.partition(b'\n')
+        meta = json.loads(meta)
+        return CachedPage(body, meta['mimetype'], meta['etag'], meta['expires_at'])
+
+    def set(self, key, page):
+        meta = {'mimetype': page.mimetype, 'etag': page.etag, 'expires_at': page.expires_at}
+        ttl = max(1, int(page.expires_at - time.time()))
+        self.client.set(self.prefix + key, json.dumps(meta).encode() + b'\n' + page.body, ex=ttl)
+
+
+def _create_backend(app):
+    choice = app.config.get('HTTP_CACHE_BACKEND', 'filesystem')
+    if choice == 'memory':
+        return MemoryBackend(app.config.get('HTTP_CACHE_MAX_ENTRIES', 1000))
+    if choice == 'filesystem':
+        return FileSystemBackend(app.config.get('HTTP_CACHE_DIR') or os.path.join(app.instance_path, 'http_cache'))
+    if choice == 'redis':
+        return RedisBackend(app.config['HTTP_CACHE_REDIS_URL'])
+    if choice == 'null':
+        return NullBackend()
+    raise ValueError(f"Unknown HTTP_CACHE_BACKEND '{choice}'")
+
+
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return this app's page cache backend, creating it on first use."""
+    app = current_app._get_current_object()
+    state = app.extensions['http_cache']
+    if state['backend'] is None:
+        with _backend_lock:
+            if state['backend'] is None:
+                state['backend'] = _create_backend(app)
+    return state['backend']
+
+
+def bump_catalog_version():
+    """Invalidate every cached page; call after writes the session hook cannot see."""
+    try:
+        get_backend().bump_version()
+    except Exception as e:
+        current_app.logger.warning(f"Could not bump catalog version: {e}")
+
+
+# --- Decorator -------------------------------------------------------------
+
+def _cacheable_request():
+    return (
+        request.method == 'GET'
+        and not current_user.is_authenticated
+        and '_flashes' not in session
+    )
+
+
+def _cache_key(version):
+    args = sorted(request.args.items(multi=True))
+    raw = json.dumps([request.endpoint, request.path, args])
+    return f"{version}:{hashlib.sha256(raw.encode()).hexdigest()}"
+
+
+def _respond(page, max_age):
+    response = Response(page.body, mimetype=page.mimetype)
+    response.set_etag(page.etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
+
+
+def cached_page(max_age=60, ttl=None):
+    """
+    Cache a public GET view for anonymous visitors.
+    max_age is the Cache-Control max-age sent to browsers and proxies; ttl
+    (default HTTP_CACHE_TTL) bounds how long the server keeps the page even
+    if the catalog version never changes.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not _cacheable_request():
+                response = current_app.make_response(view(*args, **kwargs))
+                # Personalised page: never let a shared cache keep it.
+                response.cache_control.private = True
+                response.vary.add('Cookie')
+                return response
+
+            try:
+                backend = get_backend()
+                key = _cache_key(backend.get_version())
+                page = backend.get(key)
+            except Exception as e:
+                current_app.logger.warning(f"Page cache unavailable: {e}")
+                return view(*args, **kwargs)
+            if page is not None and page.expires_at > time.time():
+                return _respond(page, max_age)
+
+            response = current_app.make_response(view(*args, **kwargs))
+            # Only plain 200s that set no cookies are safe to replay to everyone.
+            if response.status_code != 200 or response.is_streamed or session.modified:
+                return response
+
+            body = response.get_data()
+            page = CachedPage(
+                body,
+                response.mimetype,
+                hashlib.sha256(body).hexdigest(),
+                time.time() + (ttl or current_app.config.get('HTTP_CACHE_TTL', 600)),
+            )
+            try:
+                backend.set(key, page)
+            except Exception as e:
+                current_app.logger.warning(f"Could not store page in cache: {e}")
+            return _respond(page, max_age)
+        return wrapper
+    return decorator
+
+
+# --- Invalidation ---------------------------------------------------------
+
+def _after_flush(session, flush_context):
+    from app.models.publication import Publication
+
+    if any(isinstance(obj, Publication)
+           for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['catalog_changed'] = True
+
+
+def _after_commit(session):
+    if session.info.pop('catalog_changed', False):
+        bump_catalog_version()
+
+
+def _after_rollback(session):
+    session.info.pop('catalog_changed', None)
+
+
+def init_app(app):
+    app.extensions['http_cache'] = {'backend': None}
+    if not getattr(init_app, '_listening', False):
+        event.listen(db.session, 'after_flush', _after_flush)
+        event.listen(db.session, 'after_commit', _after_commit)
+        event.listen(db.session, 'after_rollback', _after_rollback)
+        init_app._listening = True
@@ -0,0 +1,361 @@
+# In app/services/importer.py
+#
+# Streaming catalog importer (`flask catalog import books.csv`).
+# The CSV is read in chunks; each chunk is diffed against the database and
+# written with executemany INSERTs and one bulk UPDATE per format, then
+# committed, so a refresh never empties the catalog and never holds one
+# huge transaction. Rows are matched on a natural key instead of being
+# deleted and re-created:
+#   physical books - ISBN (or title + author when there is no ISBN)
+#   ebooks/audiobooks - file_path
+# With dry_run=True nothing is written and the report lists what would change.
+
+import csv
+import re
+from collections import namedtuple
+from functools import lru_cache
+from itertools import islice
+
+from flask import current_app
+from sqlalchemy import insert, select, tuple_, update
+
+from app import db
+from app.models.publication import Publication
+from app.models.physical_book import PhysicalBook
+from app.models.ebook import Ebook
+from app.models.audiobook import Audiobook
+from app.services import http_cache, search
+
+# CSV header -> field. The first block matches the original books.csv.
+HEADERS = {
+    'Book Name': 'title',
+    'Author': 'author',
+    'Available Copies': 'total_copies',
+    'ISBN Code': 'isbn',
+    'Related Courses': 'related_courses',
+    'Summary': 'summary',
+    'Book Link': 'image_url',
+    # Optional columns for digital formats
+    'Format': 'format',
+    'File Path': 'file_path',
+    'File Format': 'file_format',
+    'File Size MB': 'file_size_mb',
+    'Duration Minutes': 'duration_minutes',
+    'Narrator': 'narrator',
+}
+
+MODELS = {
+    'physical_book': PhysicalBook,
+    'ebook': Ebook,
+    'audiobook': Audiobook,
+}
+
+# Columns stored on the publication table; the rest live on the subtype table
+BASE_FIELDS = ('title', 'author', 'summary', 'image_url')
+
+# Columns the importer owns, per format (available_copies is derived)
+FIELDS = {
+    'physical_book': ('title', 'author', 'summary', 'image_url', 'isbn', 'total_copies', 'related_courses'),
+    'ebook': ('title', 'author', 'summary', 'image_url', 'file_path', 'file_format', 'file_size_mb'),
+    'audiobook': ('title', 'author', 'summary', 'image_url', 'file_path', 'file_format', 'file_size_mb',
+                  'duration_minutes', 'narrator'),
+}
+
+RowError = namedtuple('RowError', 'line message')
+# One planned write: action is 'insert' or 'update'; changes maps field -> (old, new)
+Change = namedtuple('Change', 'line kind key action changes')
+
+
+class ImportReport:
+    """Running totals of one import, updated after every chunk."""
+
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.chunks = 0
+        self.errors = []
+        self.changes = []  # only filled in a dry run
+
+    def __repr__(self):
+        return (f"<ImportReport rows={self.rows} inserted={self.inserted} updated={self.updated} "
+                f"unchanged={self.unchanged} errors={len(self.errors)}>")
+
+
+# --- Cover image links --------------------------------------------------
+
+_DRIVE_FILE_RE = re.compile(r"/d/([a-zA-Z0-9_-]+)")
+_DRIVE_ID_RE = re.compile(r"id=([a-zA-Z0-9_-]+)")
+
+
+@lru_cache(maxsize=4096)
+def convert_google_drive_url(url):
+    """
+    Converts a Google Drive sharing URL to a direct, embeddable image link.
+    Handles both '.../d/FILE_ID/...' and '.../uc?id=FILE_ID' formats.
+    """
+    if not url or "drive.google.com" not in url:
+        return url
+
+    match = _DRIVE_FILE_RE.search(url) or _DRIVE_ID_RE.search(url)
+    if match:
+        return f"https://drive.google.com/uc?export=view&id={match.group(1)}"
+
+    # If it's a share.google link
+    if "share.google" in url:
+        # This is a bit of a guess, but often the last part is the key
+        return f"https://drive.google.com/uc?export=view&id={url.split('/')[-1]}"
+
+    return url  # Return original if no ID is found
+
+
+def normalise_image_urls(rows):
+    """Convert the image_url of every parsed row in place (memoised per distinct URL)."""
+    for row in rows:
+        row['image_url'] = convert_google_drive_url(row.get('image_url'))
+
+
+# --- Parsing ------------------------------------------------------------
+
+def _text(value):
+    value = (value or '').strip()
+    return value or None
+
+
+def _number(value, cast, field):
+    value = _text(value)
+    if value is None:
+        return None
+    try:
+        return cast(value)
+    except ValueError:
+        raise ValueError(f"{field} must be a number, got '{value}'")
+
+
+def parse_row(raw, default_format='physical_book'):
+    """Turn one CSV record into a field dict; raises ValueError for bad rows."""
+    row = {field: _text(raw.get(header)) for header, field in HEADERS.items()}
+    kind = row.pop('format') or default_format
+    if kind not in MODELS:
+        raise ValueError(f"unknown format '{kind}'")
+    if not row['title'] or not row['author']:
+        raise ValueError("title and author are required")
+
+    if kind == 'physical_book':
+        copies = _number(raw.get('Available Copies'), int, 'Available Copies')
+        row['total_copies'] = max(1, copies if copies is not None else 1)
+    else:
+        if not row['file_path'] or not row['file_format']:
+            raise ValueError("file path and file format are required for digital formats")
+        row['file_format'] = row['file_format'].upper()
+        row['file_size_mb'] = _number(raw.get('File Size MB'), float, 'File Size MB')
+        if kind == 'audiobook':
+            row['duration_minutes'] = _number(raw.get('Duration Minutes'), int, 'Duration Minutes')
+    return kind, {field: row[field] for field in FIELDS[kind]}
+
+
+def natural_key(kind, row):
+    if kind == 'physical_book':
+        return (kind, 'isbn', row['isbn']) if row['isbn'] else (kind, 'title', row['title'], row['author'])
+    return (kind, 'file', row['file_path'])
+
+
+# --- Diff and write -------------------------------------------------------
+
+def _existing(kind, keys):
+    """Current rows for the given natural keys, as {key: row mapping}."""
+    model = MODELS[kind]
+    columns = [model.id] + [getattr(model, f) for f in FIELDS[kind]]
+    if kind == 'physical_book':
+        columns.append(model.available_copies)
+
+    filters = []
+    if kind == 'physical_book':
+        isbns = [k[2] for k in keys if k[1] == 'isbn']
+        if isbns:
+            filters.append(model.isbn.in_(isbns))
+        pairs = [(k[2], k[3]) for k in keys if k[1] == 'title']
+        if pairs:
+            filters.append(model.isbn.is_(None) & tuple_(model.title, model.author).in_(pairs))
+    else:
+        filters.append(model.file_path.in_([k[2] for k in keys]))
+
+    found = {}
+    for condition in filters:
+        for row in db.session.execute(select(*columns).where(condition)).mappings():
+            found[natural_key(kind, row)] = row
+    return found
+
+
+def _plan_chunk(parsed, report):
+    """
+    Split parsed (line, kind, key, row) tuples into per-format insert and
+    update lists, counting unchanged rows.
+    """
+    inserts = {kind: [] for kind in MODELS}
+    updates = {kind: [] for kind in MODELS}
+    for kind in MODELS:
+        rows = [item for item in parsed if item[1] == kind]
+        if not rows:
+            continue
+        existing = _existing(kind, [item[2] for item in rows])
+        for line, _, key, row in rows:
+            current = existing.get(key)
+            if current is None:
+                if kind == 'physical_book':
+                    row = dict(row, available_copies=row['total_copies'])
+                inserts[kind].append(row)
+                if report.dry_run:
+                    report.changes.append(Change(line, kind, key[2:], 'insert', {}))
+                continue
+
+            changes = {f: (current[f], row[f]) for f in FIELDS[kind] if current[f] != row[f]}
+            if not changes:
+                report.unchanged += 1
+                continue
+            values = dict(row, id=current['id'])
+            if 'total_copies' in changes:
+                # Keep copies that are out on loan out of the available count.
+                values['available_copies'] = max(
+                    0, current['available_copies'] + row['total_copies'] - current['total_copies']
+                )
+            updates[kind].append(values)
+            if report.dry_run:
+                report.changes.append(Change(line, kind, key[2:], 'update', changes))
+    return inserts, updates
+
+
+def _new_publication_ids(model, rows):
+    """
+    Ids of the publication rows just inserted for `rows`, in row order.
+    They are the rows of this type that have no subtype row yet: other
+    writers add both rows in one transaction, so only ours are visible
+    half-made. Rows sharing a title and author are told apart by insertion
+    order, which auto-increment ids follow within one statement.
+    """
+    table = Publication.__table__
+    pairs = {(row['title'], row['author']) for row in rows}
+    orphans = (
+        select(table.c.id, table.c.title, table.c.author)
+        .outerjoin(model.__table__, model.__table__.c.id == table.c.id)
+        .where(
+            table.c.type == model.__mapper__.polymorphic_identity,
+            model.__table__.c.id.is_(None),
+            tuple_(table.c.title, table.c.author).in_(pairs),
+        )
+        .order_by(table.c.id)
+    )
+    found = {}
+    for new_id, title, author in db.session.execute(orphans):
+        found.setdefault((title, author), []).append(new_id)
+    ids = []
+    for row in rows:
+        candidates = found.get((row['title'], row['author']))
+        if not candidates:
+            raise RuntimeError(f"inserted publication '{row['title']}' could not be found again")
+        ids.append(candidates.pop(0))
+    return ids
+
+
+def _insert_rows(model, rows):
+    """
+    Insert new publications of one format: one executemany into
+    publication (ids from AUTO_INCREMENT, as for any other insert), one
+    SELECT for the new ids, one executemany into the subtype table.
+    Letting the ORM insert a joined-inheritance model would need each base
+    row's id back, which without RETURNING (MySQL) means one INSERT per row.
+    """
+    identity = model.__mapper__.polymorphic_identity
+    db.session.execute(insert(Publication.__table__),
+                       [dict({f: row[f] for f in BASE_FIELDS}, type=identity) for row in rows])
+    ids = _new_publication_ids(model, rows)
+    db.session.execute(insert(model.__table__), [
+        dict({f: v for f, v in row.items() if f not in BASE_FIELDS}, id=new_id)
+        for new_id, row in zip(ids, rows)
+    ])
+    return ids
+
+
+def _write_chunk(inserts, updates):
+    """Bulk-write one chunk; returns the publication ids touched."""
+    touched = set()
+    for kind, model in MODELS.items():
+        if inserts[kind]:
+            touched.update(_insert_rows(model, inserts[kind]))
+        if updates[kind]:
+            db.session.execute(update(model), updates[kind])
+            touched.update(row['id'] for row in updates[kind])
+    return touched
+
+
+def import_catalog(csv_file, chunk_size=None, dry_run=False, default_format='physical_book', progress=None):
+    """
+    Import a catalog CSV (a path or an open text file). Returns an
+    ImportReport; progress, if given, is called with it after every chunk.
+    """
+    chunk_size = chunk_size or current_app.config.get('IMPORT_CHUNK_SIZE', 1000)
+    report = ImportReport(dry_run)
+
+    if isinstance(csv_file, str):
+        with open(csv_file, 'r', encoding='utf-8', newline='') as f:
+            return import_catalog(f, chunk_size, dry_run, default_format, progress)
+
+    reader = csv.DictReader(csv_file)
+    if not reader.fieldnames:
+        report.errors.append(RowError(None, "CSV file is empty"))
+        return report
+
+    seen = {}
+    while True:
+        records = []
+        for raw in islice(reader, chunk_size):
+            records.append((reader.line_num, raw))
+        if not records:
+            break
+
+        parsed = []
+        for line, raw in records:
+            report.rows += 1
+            try:
+                kind, row = parse_row(raw, default_format)
+            except ValueError as e:
+                report.errors.append(RowError(line, str(e)))
+                continue
+            key = natural_key(kind, row)
+            if key in seen:
+                report.errors.append(RowError(line, f"duplicate of line {seen[key]}"))
+                continue
+            seen[key] = line
+            parsed.append((line, kind, key, row))
+        normalise_image_urls(row for _, _, _, row in parsed)
+
+        try:
+            inserts, updates = _plan_chunk(parsed, report)
+            inserted = sum(len(rows) for rows in inserts.values())
+            updated = sum(len(rows) for rows in updates.values())
+            if dry_run:
+                db.session.rollback()
+            else:
+                touched = _write_chunk(inserts, updates)
+                db.session.commit()
+                # Bulk statements bypass the session's search and page-cache hooks.
+                search.reindex(touched)
+                http_cache.bump_catalog_version()
+        except Exception as e:
+            db.session.rollback()
+            report.errors.append(RowError(records[0][0], f"chunk failed, nothing written: {e}"))
+            # Nothing from this chunk was written, so a later row with the
+            # same key is not a duplicate.
+            for _, _, key, _ in parsed:
+                del seen[key]
+        else:
+            report.inserted += inserted
+            report.updated += updated
+
+        report.chunks += 1
+        if progress:
+            progress(report)
+
+    return report
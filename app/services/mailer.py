@@ -0,0 +1,237 @@
+# In app/services/mailer.py
+#
+# Outbound email goes through a persistent outbox:
+#   1. Request handlers call enqueue_email(), which only inserts a row.
+#   2. The mail worker (`flask mail worker`) claims due rows in batches,
+#      renders them from Jinja templates and sends them over one reused
+#      SMTP connection, retrying failures with exponential backoff.
+# An SMTP outage therefore delays mail instead of failing registrations.
+# Once a row is sent or has failed for good its template context (which
+# can hold an OTP) is cleared, and `flask mail purge` deletes such rows
+# after MAIL_OUTBOX_RETENTION_DAYS.
+#
+# Flask-Mail is set up on first use by the worker (get_mail), so web
+# workers, which only enqueue, never import it.
+
+import random
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app, render_template
+from sqlalchemy import delete, update
+
+from app import db
+from app.models import EmailStatusEnum
+from app.models.outbox_email import OutboxEmail
+from app.services import metrics
+
+
+def enqueue_email(recipient, subject, template, **context):
+    """
+    Add an email to the outbox in the current transaction (the caller
+    commits). template is a path under app/templates, e.g. 'email/otp.html'.
+    """
+    email = OutboxEmail(recipient=recipient, subject=subject, template=template)
+    email.context = context
+    db.session.add(email)
+    return email
+
+
+def backoff_seconds(attempts):
+    """Delay before retry number `attempts`: exponential, capped, with jitter."""
+    base = current_app.config.get('MAIL_OUTBOX_RETRY_BASE_SECONDS', 30)
+    cap = current_app.config.get('MAIL_OUTBOX_RETRY_MAX_SECONDS', 3600)
+    delay = min(cap, base * (2 ** max(0, attempts - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _claim_batch(batch_size):
+    """
+    Reserve up to batch_size due emails for this worker by pushing their
+    next_attempt_at forward (a lease), so parallel workers skip them.
+    """
+    now = datetime.utcnow()
+    lease = timedelta(seconds=current_app.config.get('MAIL_OUTBOX_LEASE_SECONDS', 300))
+    ids = [
+        row.id for row in
+        db.session.query(OutboxEmail.id)
+        .filter(OutboxEmail.status == EmailStatusEnum.PENDING, OutboxEmail.next_attempt_at <= now)
+        .order_by(OutboxEmail.next_attempt_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ]
+    if not ids:
+        db.session.rollback()
+        return []
+    db.session.execute(
+        update(OutboxEmail)
+        .where(OutboxEmail.id.in_(ids))
+        .values(next_attempt_at=now + lease)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return OutboxEmail.query.filter(OutboxEmail.id.in_(ids)).order_by(OutboxEmail.id).all()
+
+
+_mail_lock = threading.Lock()
+
+
+def get_mail(app=None):
+    """This app's Flask-Mail state (its .connect() opens an SMTP connection)."""
+    app = app or current_app._get_current_object()
+    if 'mail' not in app.extensions:
+        with _mail_lock:
+            if 'mail' not in app.extensions:
+                from flask_mail import Mail  # type: ignore
+                Mail().init_app(app)  # reads MAIL_* settings; connects nothing
+    return app.extensions['mail']
+
+
+def _build_message(email):
+    from flask_mail import Message  # type: ignore
+    get_mail()  # Message() reads the default sender from it
+    msg = Message(subject=email.subject, recipients=[email.recipient])
+    # render_template reuses the compiled template from the Jinja cache.
+    msg.html = render_template(email.template, **email.context)
+    return msg
+
+
+def _deliver_batch(batch, connection):
+    """Send a claimed batch over an open connection; returns (sent, failed)."""
+    sent = failed = 0
+    max_attempts = current_app.config.get('MAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    for email in batch:
+        try:
+            message = _build_message(email)
+            with metrics.smtp_send():
+                connection.send(message)
+        except Exception as e:
+            email.attempts += 1
+            email.last_error = str(e)[:1000]
+            if email.attempts >= max_attempts:
+                email.status = EmailStatusEnum.FAILED
+                email.context = {}
+            else:
+                email.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff_seconds(email.attempts))
+            failed += 1
+        else:
+            email.status = EmailStatusEnum.SENT
+            email.sent_at = datetime.utcnow()
+            email.context = {}  # nothing left to render; don't keep OTPs around
+            email.attempts += 1
+            sent += 1
+        db.session.commit()
+    return sent, failed
+
+
+def deliver_pending(batch_size=None, connection=None):
+    """
+    Deliver one batch of due emails. Opens (and closes) an SMTP connection
+    unless one is passed in. Returns (sent, failed).
+    """
+    batch_size = batch_size or current_app.config.get('MAIL_OUTBOX_BATCH_SIZE', 50)
+    batch = _claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+    if connection is not None:
+        return _deliver_batch(batch, connection)
+    with get_mail().connect() as conn:
+        return _deliver_batch(batch, conn)
+
+
+def run_worker(poll_interval=None, batch_size=None, stop_event=None):
+    """
+    Deliver mail until stop_event is set. The SMTP connection is kept open
+    while there is work and closed once the outbox runs dry.
+    """
+    poll_interval = poll_interval or current_app.config.get('MAIL_OUTBOX_POLL_SECONDS', 2)
+    stop_event = stop_event or threading.Event()
+    connection = None
+    try:
+        while not stop_event.is_set():
+            batch = _claim_batch(batch_size or current_app.config.get('MAIL_OUTBOX_BATCH_SIZE', 50))
+            if not batch:
+                if connection is not None:
+                    _close(connection)
+                    connection = None
+                stop_event.wait(poll_interval)
+                continue
+            if connection is None:
+                try:
+                    connection = get_mail().connect().__enter__()
+                except Exception as e:
+                    # SMTP is down: release the claimed rows for a later retry.
+                    current_app.logger.warning(f"SMTP connect failed: {e}")
+                    _release(batch, str(e))
+                    stop_event.wait(poll_interval)
+                    continue
+            sent, failed = _deliver_batch(batch, connection)
+            if failed and not sent:
+                # The connection may be broken; reconnect for the next batch.
+                _close(connection)
+                connection = None
+    finally:
+        if connection is not None:
+            _close(connection)
+
+
+def _close(connection):
+    try:
+        connection.__exit__(None, None, None)
+    except Exception:
+        pass
+
+
+def _release(batch, error):
+    for email in batch:
+        email.last_error = error[:1000]
+        email.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff_seconds(email.attempts + 1))
+    db.session.commit()
+
+
+def purge(batch_size=None, older_than_days=None, now=None):
+    """
+    Delete sent and failed emails created more than older_than_days ago,
+    batch_size rows per transaction. Returns how many were deleted.
+    """
+    batch_size = batch_size or current_app.config.get('MAIL_OUTBOX_PURGE_BATCH_SIZE', 1000)
+    if older_than_days is None:
+        older_than_days = current_app.config.get('MAIL_OUTBOX_RETENTION_DAYS', 30)
+    cutoff = (now or datetime.utcnow()) - timedelta(days=older_than_days)
+    purged = 0
+    while True:
+        ids = [
+            row.id for row in
+            db.session.query(OutboxEmail.id)
+            .filter(OutboxEmail.status.in_([EmailStatusEnum.SENT, EmailStatusEnum.FAILED]),
+                    OutboxEmail.created_at < cutoff)
+            .limit(batch_size)
+        ]
+        if not ids:
+            break
+        db.session.execute(delete(OutboxEmail).where(OutboxEmail.id.in_(ids)))
+        db.session.commit()
+        purged += len(ids)
+        if len(ids) < batch_size:
+            break
+    return purged
+
+
+def kick_delivery():
+    """
+    When MAIL_OUTBOX_DELIVER_INLINE is set (handy in development, where no
+    worker runs), deliver due mail from a background thread right away.
+    The calling request does not wait for it.
+    """
+    if not current_app.config.get('MAIL_OUTBOX_DELIVER_INLINE'):
+        return
+    app = current_app._get_current_object()
+
+    def _deliver():
+        with app.app_context():
+            try:
+                deliver_pending()
+            except Exception as e:
+                app.logger.warning(f"Inline mail delivery failed: {e}")
+
+    threading.Thread(target=_deliver, daemon=True).start()
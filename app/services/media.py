@@ -0,0 +1,127 @@
+# In app/services/media.py
+#
+# Delivery of ebook and audiobook files. Ebook.file_path and
+# Audiobook.file_path are relative to MEDIA_ROOT.
+#
+# By default Flask serves the file itself with send_file(conditional=True):
+# Range requests get 206 Partial Content, and ETag / Last-Modified answer
+# conditional GETs with 304, so resumed downloads and audio seeking only
+# transfer the bytes asked for. Full-file responses go out through the WSGI
+# server's file wrapper (sendfile on gunicorn/uWSGI).
+#
+# Behind a front proxy the transfer can be handed off entirely:
+#   MEDIA_ACCEL = 'nginx'     -> X-Accel-Redirect to MEDIA_ACCEL_PREFIX + path
+#                                (an `internal` nginx location aliasing MEDIA_ROOT)
+#   MEDIA_ACCEL = 'sendfile'  -> X-Sendfile with the absolute path (Apache mod_xsendfile, lighttpd)
+# The proxy then handles Range, conditional requests and zero-copy sending.
+
+import mimetypes
+import os
+from urllib.parse import quote
+
+from flask import Response, abort, current_app, send_file
+from werkzeug.security import safe_join
+
+# Types mimetypes does not know everywhere
+_MIMETYPES = {
+    '.epub': 'application/epub+zip',
+    '.m4b': 'audio/mp4',
+    '.m4a': 'audio/mp4',
+    '.mp3': 'audio/mpeg',
+}
+
+
+def media_root():
+    return os.path.abspath(current_app.config['MEDIA_ROOT'])
+
+
+def resolve(file_path):
+    """Absolute path of a stored file_path, or None if it escapes MEDIA_ROOT."""
+    root = media_root()
+    if os.path.isabs(file_path):
+        file_path = os.path.relpath(file_path, root)
+    return safe_join(root, file_path)
+
+
+def guess_mimetype(path):
+    ext = os.path.splitext(path)[1].lower()
+    return _MIMETYPES.get(ext) or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def _accel_response(mode, path, mimetype, download_name, as_attachment):
+    response = Response(status=200, mimetype=mimetype)
+    if mode == 'nginx':
+        relative = os.path.relpath(path, media_root()).replace(os.sep, '/')
+        prefix = current_app.config.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+        response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(relative)
+    else:
+        response.headers['X-Sendfile'] = path
+    disposition = 'attachment' if as_attachment else 'inline'
+    response.headers['Content-Disposition'] = f"{disposition}; filename*=UTF-8''{quote(download_name)}"
+    # Access is per user, so no shared caches.
+    response.headers['Cache-Control'] = 'private, no-transform'
+    return response
+
+
+def send_media(file_path, download_name=None, as_attachment=True):
+    """
+    Response delivering a media file, with Range and conditional GET support.
+    Aborts with 404 when the file is missing or outside MEDIA_ROOT.
+    """
+    path = resolve(file_path)
+    if path is None or not os.path.isfile(path):
+        current_app.logger.warning(f"Media file not found: {file_path}")
+        abort(404)
+
+    mimetype = guess_mimetype(path)
+    download_name = download_name or os.path.basename(path)
+    mode = current_app.config.get('MEDIA_ACCEL')
+    if mode in ('nginx', 'sendfile'):
+        return _accel_response(mode, path, mimetype, download_name, as_attachment)
+
+    response = send_file(
+        path,
+        mimetype=mimetype,
+        as_attachment=as_attachment,
+        download_name=download_name,
+        conditional=True,
+        etag=True,
+        max_age=current_app.config.get('MEDIA_MAX_AGE', 3600),
+    )
+    response.cache_control.private = True
+    response.cache_control.public = False
+    return response
+
+
+def send_byte_range(file_path, start, end, mimetype=None, block_size=64 * 1024):
+    """
+    200 response with just bytes [start, end) of a media file, streamed in
+    blocks. Used for audiobook segments, whose bounds come from the index
+    rather than from a client Range header.
+    """
+    path = resolve(file_path)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    def generate():
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                block = f.read(min(block_size, remaining))
+                if not block:
+                    break
+                remaining -= len(block)
+                yield block
+
+    response = Response(generate(), mimetype=mimetype or guess_mimetype(path), direct_passthrough=True)
+    response.content_length = end - start
+    response.headers['Cache-Control'] = 'private, max-age=%d' % current_app.config.get('MEDIA_MAX_AGE', 3600)
+    return response
+
+
+def download_name_for(publication):
+    """Readable file name, e.g. 'The Hobbit.epub'."""
+    ext = os.path.splitext(publication.file_path)[1]
+    safe_title = ''.join(c for c in publication.title if c not in '\\/:*?"<>|').strip() or 'download'
+    return f"{safe_title}{ext}"
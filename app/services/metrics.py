@@ -0,0 +1,190 @@
+# In app/services/metrics.py
+#
+# Prometheus metrics, served at /metrics in the text exposition format:
+#   libranet_http_request_duration_seconds{endpoint,method}  histogram
+#   libranet_http_requests_total{endpoint,method,status}      counter
+#   libranet_db_pool_checked_out{pool}, libranet_db_pool_overflow{pool}
+#                                   gauges; pool is "primary", a bind key or
+#                                   a read replica (replica0, replica1...)
+#   libranet_smtp_send_duration_seconds, libranet_smtp_send_errors_total
+#   libranet_razorpay_request_duration_seconds{operation},
+#   libranet_razorpay_errors_total{operation}
+# Endpoints are Flask endpoint names (main.list_books, main.borrow...), so
+# label cardinality stays bounded; requests that match no route are
+# counted under "<unmatched>".
+#
+# Several worker processes (gunicorn -w N): set the PROMETHEUS_MULTIPROC_DIR
+# environment variable to an empty, writable directory before the server
+# starts. Every process then writes its samples there and /metrics merges
+# them. Wipe the directory on deploy, and call mark_process_dead(worker.pid)
+# from gunicorn's child_exit hook.
+#
+# Needs the `prometheus_client` package (in requirements.txt); without it
+# metrics are off and recording is a no-op. Recording a request is a
+# perf_counter() pair plus two in-memory increments. /metrics can be
+# protected with METRICS_TOKEN (sent as "Authorization: Bearer <token>").
+
+import os
+import time
+from contextlib import contextmanager
+
+from flask import Response, abort, current_app, g, request
+from sqlalchemy import event
+
+from app import db
+
+try:
+    import prometheus_client  # type: ignore
+    from prometheus_client import Counter, Gauge, Histogram  # type: ignore
+except ImportError:
+    prometheus_client = None
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+if prometheus_client is not None:
+    REQUEST_LATENCY = Histogram(
+        'libranet_http_request_duration_seconds', 'Time spent handling a request.',
+        ['endpoint', 'method'], buckets=_LATENCY_BUCKETS,
+    )
+    REQUESTS = Counter(
+        'libranet_http_requests_total', 'Requests handled, by response status.',
+        ['endpoint', 'method', 'status'],
+    )
+    # livesum: add up the values of the processes that are still running
+    POOL_CHECKED_OUT = Gauge(
+        'libranet_db_pool_checked_out', 'Database connections currently checked out.',
+        ['pool'], multiprocess_mode='livesum',
+    )
+    POOL_OVERFLOW = Gauge(
+        'libranet_db_pool_overflow', 'Connections open beyond the pool size.',
+        ['pool'], multiprocess_mode='livesum',
+    )
+    SMTP_LATENCY = Histogram(
+        'libranet_smtp_send_duration_seconds', 'Time to hand one email to the SMTP server.',
+        buckets=_LATENCY_BUCKETS,
+    )
+    SMTP_ERRORS = Counter('libranet_smtp_send_errors_total', 'Emails the SMTP server did not accept.')
+    RAZORPAY_LATENCY = Histogram(
+        'libranet_razorpay_request_duration_seconds', 'Razorpay API call latency.',
+        ['operation'], buckets=_LATENCY_BUCKETS,
+    )
+    RAZORPAY_ERRORS = Counter('libranet_razorpay_errors_total', 'Failed Razorpay API calls.', ['operation'])
+
+
+def enabled():
+    return prometheus_client is not None
+
+
+# --- Requests -------------------------------------------------------------
+
+def _start_request():
+    g._metrics_start = time.perf_counter()
+
+
+def _finish_request(response):
+    start = g.pop('_metrics_start', None)
+    if start is not None:
+        endpoint = request.endpoint or '<unmatched>'
+        REQUEST_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - start)
+        REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    return response
+
+
+# --- Connection pool ------------------------------------------------------
+
+def _pool_overflow(pool):
+    overflow = getattr(pool, 'overflow', None)
+    return max(overflow(), 0) if overflow else 0
+
+
+def _watch_pool(pool, name):
+    checked_out = POOL_CHECKED_OUT.labels(name)
+    overflow = POOL_OVERFLOW.labels(name)
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_out.inc()
+        overflow.set(_pool_overflow(pool))
+
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out.dec()
+        overflow.set(_pool_overflow(pool))
+
+    event.listen(pool, 'checkout', on_checkout)
+    event.listen(pool, 'checkin', on_checkin)
+
+
+# --- Outbound calls -------------------------------------------------------
+
+@contextmanager
+def smtp_send():
+    """Time one SMTP send: `with metrics.smtp_send(): connection.send(msg)`."""
+    if not enabled():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        SMTP_ERRORS.inc()
+        raise
+    finally:
+        SMTP_LATENCY.observe(time.perf_counter() - start)
+
+
+@contextmanager
+def razorpay_call(operation):
+    """Time one Razorpay API call, e.g. `with metrics.razorpay_call('payment.fetch'): ...`."""
+    if not enabled():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        RAZORPAY_ERRORS.labels(operation).inc()
+        raise
+    finally:
+        RAZORPAY_LATENCY.labels(operation).observe(time.perf_counter() - start)
+
+
+# --- Exposition -----------------------------------------------------------
+
+def _registry():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import CollectorRegistry, multiprocess  # type: ignore
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return prometheus_client.REGISTRY
+
+
+def metrics_view():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(401)
+    return Response(prometheus_client.generate_latest(_registry()),
+                    mimetype=prometheus_client.CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead(pid):
+    """Drop a dead worker's live gauges (gunicorn child_exit hook)."""
+    if enabled() and os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess  # type: ignore
+        multiprocess.mark_process_dead(pid)
+
+
+def init_app(app):
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    if not enabled():
+        app.logger.info("prometheus_client is not installed; /metrics is disabled")
+        return
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    with app.app_context():
+        for key, engine in db.engines.items():
+            _watch_pool(engine.pool, key or 'primary')
+    # Read replicas (db_routing, initialised first) have engines of their own
+    for replica in app.extensions.get('db_routing', {}).get('replicas', []):
+        _watch_pool(replica.engine.pool, replica.name)
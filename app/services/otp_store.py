@@ -0,0 +1,270 @@
+# In app/services/otp_store.py
+#
+# Where registration OTPs live. OTP_BACKEND selects the store:
+#   'sql'    - the otp table (default; works with any number of workers)
+#   'memory' - a dict in this process, swept of expired codes as new ones
+#              are issued (single process only)
+#   'redis'  - any Redis-protocol server at OTP_REDIS_URL; keys expire on
+#              their own, so OTP checks never touch the relational database.
+# Every store counts wrong guesses atomically, so parallel submissions can
+# never get more than OTP_MAX_ATTEMPTS tries at a code.
+
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import delete, or_, update
+
+from app import db
+from app.models.otp import OTP
+
+VERIFIED = 'verified'
+INVALID = 'invalid'          # wrong code, attempts remain
+LOCKED_OUT = 'locked_out'    # too many wrong codes
+EXPIRED = 'expired'          # no live code for this email
+
+VerifyResult = namedtuple('VerifyResult', 'status attempts_left')
+
+
+class SQLOTPStore:
+    """
+    OTPs as rows of the otp table. Changes join the caller's transaction,
+    so marking a code used commits together with the new account.
+    """
+    name = 'sql'
+
+    def issue(self, email, ttl_minutes):
+        self.discard(email)
+        otp = OTP(email=email, expiry_minutes=ttl_minutes)
+        db.session.add(otp)
+        return otp.otp_code
+
+    def discard(self, email):
+        db.session.execute(delete(OTP).where(OTP.email == email, OTP.is_used.is_(False)))
+
+    def verify(self, email, code, max_attempts):
+        now = datetime.utcnow()
+        # Served by ix_otp_email_is_used_created_at
+        otp = (
+            OTP.query.filter(OTP.email == email, OTP.is_used.is_(False))
+            .order_by(OTP.created_at.desc())
+            .first()
+        )
+        if otp is None or otp.expires_at <= now:
+            return VerifyResult(EXPIRED, 0)
+
+        table = OTP.__table__
+        live = (
+            (table.c.id == otp.id)
+            & table.c.is_used.is_(False)
+            & (table.c.attempts < max_attempts)
+            & (table.c.expires_at > now)
+        )
+        if otp.otp_code == code:
+            used = db.session.execute(update(table).where(live).values(is_used=True)).rowcount
+            if used == 1:
+                return VerifyResult(VERIFIED, max_attempts - otp.attempts)
+            return VerifyResult(LOCKED_OUT, 0)
+
+        counted = db.session.execute(
+            update(table).where(live).values(attempts=table.c.attempts + 1)
+        ).rowcount
+        attempts = db.session.query(OTP.attempts).filter(OTP.id == otp.id).scalar()
+        # Commit now so a wrong guess counts even if the request fails later.
+        db.session.commit()
+        if counted == 0 or attempts >= max_attempts:
+            return VerifyResult(LOCKED_OUT, 0)
+        return VerifyResult(INVALID, max_attempts - attempts)
+
+    def purge(self, batch_size, now=None):
+        """Delete used and expired codes, batch_size rows per transaction."""
+        now = now or datetime.utcnow()
+        purged = 0
+        while True:
+            ids = [
+                row.id for row in
+                db.session.query(OTP.id)
+                .filter(or_(OTP.is_used.is_(True), OTP.expires_at <= now))
+                .limit(batch_size)
+            ]
+            if not ids:
+                break
+            db.session.execute(delete(OTP).where(OTP.id.in_(ids)))
+            db.session.commit()
+            purged += len(ids)
+            if len(ids) < batch_size:
+                break
+        return purged
+
+
+class MemoryOTPStore:
+    """
+    OTPs in a dict of email -> [code, expires_at, attempts], guarded by a lock.
+    issue() also drops expired codes, at most every SWEEP_INTERVAL seconds,
+    so codes nobody comes back for do not pile up in the web process.
+    """
+    name = 'memory'
+    SWEEP_INTERVAL = 60
+
+    def __init__(self):
+        self._codes = {}
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def _sweep(self, now, cutoff=None):
+        """Drop codes expired by cutoff (default: now); the caller holds the lock."""
+        cutoff = now if cutoff is None else cutoff
+        expired = [email for email, entry in self._codes.items() if entry[1] <= cutoff]
+        for email in expired:
+            del self._codes[email]
+        self._next_sweep = now + self.SWEEP_INTERVAL
+        return len(expired)
+
+    def issue(self, email, ttl_minutes):
+        code = OTP.generate_otp()
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            self._codes[email] = [code, now + ttl_minutes * 60, 0]
+        return code
+
+    def discard(self, email):
+        with self._lock:
+            self._codes.pop(email, None)
+
+    def verify(self, email, code, max_attempts):
+        with self._lock:
+            entry = self._codes.get(email)
+            if entry is None or entry[1] <= time.monotonic():
+                self._codes.pop(email, None)
+                return VerifyResult(EXPIRED, 0)
+            if entry[0] == code:
+                del self._codes[email]
+                return VerifyResult(VERIFIED, max_attempts - entry[2])
+            entry[2] += 1
+            if entry[2] >= max_attempts:
+                del self._codes[email]
+                return VerifyResult(LOCKED_OUT, 0)
+            return VerifyResult(INVALID, max_attempts - entry[2])
+
+    def purge(self, batch_size, now=None):
+        # Only this process's dict: `flask otp purge` runs elsewhere and
+        # finds nothing, so issue() does the sweeping. Expiry here is on the
+        # monotonic clock, so a wall-clock `now` is applied as an offset.
+        clock = time.monotonic()
+        cutoff = clock if now is None else clock + (now - datetime.utcnow()).total_seconds()
+        with self._lock:
+            return self._sweep(clock, cutoff)
+
+
+# Check and count an attempt in one server-side step.
+# Returns {status, attempts}: 1 = verified, 0 = wrong code, -1 = missing, -2 = locked out.
+_VERIFY_SCRIPT = """
+local code = redis.call('HGET', KEYS[1], 'code')
+if not code then return {-1, 0} end
+local attempts = tonumber(redis.call('HGET', KEYS[1], 'attempts'))
+local max_attempts = tonumber(ARGV[2])
+if attempts >= max_attempts then
+    redis.call('DEL', KEYS[1])
+    return {-2, attempts}
+end
+if code == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return {1, attempts}
+end
+attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+if attempts >= max_attempts then redis.call('DEL', KEYS[1]) end
+return {0, attempts}
+"""
+
+
+class RedisOTPStore:
+    """OTPs as Redis hashes under otp:<email> with a server-side TTL."""
+    name = 'redis'
+
+    def __init__(self, url):
+        try:
+            import redis  # type: ignore
+        except ImportError:
+            raise RuntimeError("OTP_BACKEND='redis' needs the 'redis' package (pip install redis)")
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+        self._verify = self._client.register_script(_VERIFY_SCRIPT)
+
+    @staticmethod
+    def _key(email):
+        return f"otp:{email}"
+
+    def issue(self, email, ttl_minutes):
+        code = OTP.generate_otp()
+        key = self._key(email)
+        with self._client.pipeline() as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping={'code': code, 'attempts': 0})
+            pipe.expire(key, int(ttl_minutes * 60))
+            pipe.execute()
+        return code
+
+    def discard(self, email):
+        self._client.delete(self._key(email))
+
+    def verify(self, email, code, max_attempts):
+        status, attempts = self._verify(keys=[self._key(email)], args=[code, max_attempts])
+        if status == 1:
+            return VerifyResult(VERIFIED, max_attempts - attempts)
+        if status == -1:
+            return VerifyResult(EXPIRED, 0)
+        if status == -2 or attempts >= max_attempts:
+            return VerifyResult(LOCKED_OUT, 0)
+        return VerifyResult(INVALID, max_attempts - attempts)
+
+    def purge(self, batch_size, now=None):
+        # Redis expires keys itself.
+        return 0
+
+
+def _create_store(app):
+    choice = app.config.get('OTP_BACKEND', 'sql')
+    if choice == 'sql':
+        return SQLOTPStore()
+    if choice == 'memory':
+        return MemoryOTPStore()
+    if choice == 'redis':
+        return RedisOTPStore(app.config.get('OTP_REDIS_URL', 'redis://localhost:6379/0'))
+    raise ValueError(f"Unknown OTP_BACKEND '{choice}'")
+
+
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return this app's OTP store, creating it on first use."""
+    app = current_app._get_current_object()
+    state = app.extensions.setdefault('otp_store', {'store': None})
+    if state['store'] is None:
+        with _store_lock:
+            if state['store'] is None:
+                state['store'] = _create_store(app)
+    return state['store']
+
+
+def issue(email):
+    """Create a fresh code for email, replacing any earlier one, and return it."""
+    return get_store().issue(email, current_app.config.get('OTP_EXPIRY_MINUTES', 10))
+
+
+def verify(email, code):
+    """Check a submitted code. With the SQL store a successful check is committed by the caller."""
+    return get_store().verify(email, code, current_app.config.get('OTP_MAX_ATTEMPTS', 3))
+
+
+def discard(email):
+    get_store().discard(email)
+
+
+def purge(batch_size=None):
+    """Remove used and expired codes; returns how many were removed."""
+    batch_size = batch_size or current_app.config.get('OTP_PURGE_BATCH_SIZE', 1000)
+    return get_store().purge(batch_size)
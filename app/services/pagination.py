@@ -0,0 +1,140 @@
+# In app/services/pagination.py
+#
+# Cursor (keyset) pagination. Instead of OFFSET, each page remembers the
+# sort key of its first and last row; the next page is "rows after the
+# last key", which an index on the sort columns answers directly no matter
+# how deep into the listing we are.
+
+import base64
+import bisect
+import json
+import math
+from collections import namedtuple
+
+from flask import current_app, request
+from sqlalchemy import and_, or_
+
+KeysetPage = namedtuple('KeysetPage', 'items next_cursor prev_cursor total')
+
+
+def encode_cursor(values):
+    """Encode a sort key (list of JSON-safe values) as an opaque token."""
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _is_key(values, size=2):
+    """
+    True for a well-formed sort key: `size` scalars (str, int or finite
+    float) ending in an int id. Anything else would reach the SQL as an
+    unbindable or NULL parameter.
+    """
+    if not isinstance(values, list) or len(values) != size:
+        return False
+    *sort_values, last_id = values
+    if isinstance(last_id, bool) or not isinstance(last_id, int):
+        return False
+    for value in sort_values:
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            return False
+        if isinstance(value, float) and not math.isfinite(value):
+            return False
+    return True
+
+
+def decode_cursor(token):
+    """Decode a cursor token; returns None if it is missing or malformed."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+    return values if _is_key(values) else None
+
+
+def page_size(config_key='CATALOG_PAGE_SIZE'):
+    """Page size from ?per_page=, defaulting to config and capped at MAX_PAGE_SIZE."""
+    default = current_app.config.get(config_key, 24)
+    limit = current_app.config.get('MAX_PAGE_SIZE', 100)
+    per_page = request.args.get('per_page', default, type=int)
+    return max(1, min(per_page, limit))
+
+
+def cursor_args():
+    """Return the decoded (after, before) cursors from the query string."""
+    return decode_cursor(request.args.get('after')), decode_cursor(request.args.get('before'))
+
+
+def _keyset_filter(columns, values, forward):
+    """(c1, c2) > (v1, v2) spelled out so MySQL can use a range scan."""
+    first, second = columns
+    v1, v2 = values
+    if forward:
+        return or_(first > v1, and_(first == v1, second > v2))
+    return or_(first < v1, and_(first == v1, second < v2))
+
+
+def keyset_paginate(query, columns, per_page, after=None, before=None):
+    """
+    Return one KeysetPage of an ORM query ordered by columns, which must be
+    a (sort_column, unique_id_column) pair, e.g. (PhysicalBook.title, PhysicalBook.id).
+    """
+    sort_col, id_col = columns
+    forward = before is None or after is not None
+    cursor = after if forward else before
+
+    if cursor is not None and _is_key(cursor, len(columns)):
+        query = query.filter(_keyset_filter(columns, cursor, forward))
+    else:
+        cursor = None
+
+    if forward:
+        query = query.order_by(sort_col.asc(), id_col.asc())
+    else:
+        query = query.order_by(sort_col.desc(), id_col.desc())
+
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if not forward:
+        rows.reverse()
+
+    def key(row):
+        return [getattr(row, sort_col.key), getattr(row, id_col.key)]
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if (forward and has_more) or (not forward and cursor is not None):
+            next_cursor = encode_cursor(key(rows[-1]))
+        if (forward and cursor is not None) or (not forward and has_more):
+            prev_cursor = encode_cursor(key(rows[0]))
+    return KeysetPage(rows, next_cursor, prev_cursor, None)
+
+
+def paginate_hits(hits, per_page, after=None, before=None):
+    """
+    Page through ranked search hits (already ordered best first) using the
+    same cursor scheme, keyed on (score, id).
+    """
+    keys = [(-hit.score, hit.id) for hit in hits]
+
+    def as_key(cursor):
+        return (-float(cursor[0]), int(cursor[1]))
+
+    start, end = 0, min(per_page, len(hits))
+    try:
+        if after is not None:
+            start = bisect.bisect_right(keys, as_key(after))
+            end = min(start + per_page, len(hits))
+        elif before is not None:
+            end = bisect.bisect_left(keys, as_key(before))
+            start = max(0, end - per_page)
+    except (ValueError, TypeError, IndexError):
+        start, end = 0, min(per_page, len(hits))
+
+    items = hits[start:end]
+    next_cursor = encode_cursor([items[-1].score, items[-1].id]) if items and end < len(hits) else None
+    prev_cursor = encode_cursor([items[0].score, items[0].id]) if items and start > 0 else None
+    return KeysetPage(items, next_cursor, prev_cursor, len(hits))
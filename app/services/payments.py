@@ -0,0 +1,350 @@
+# In app/services/payments.py
+#
+# Razorpay gateway access, arranged so that a slow or failing gateway
+# cannot tie up the web workers:
+#   - every API call has connect and read timeouts (PAYMENT_CONNECT_TIMEOUT,
+#     PAYMENT_READ_TIMEOUT) and is retried up to PAYMENT_MAX_ATTEMPTS times
+#     on timeouts, connection errors and 5xx, with exponential backoff and
+#     full jitter
+#   - a circuit breaker: after PAYMENT_BREAKER_FAILURES failed calls in a
+#     row, calls fail at once for PAYMENT_BREAKER_RESET_SECONDS; then a single
+#     trial call decides whether the gateway is back
+#   - requests verify through a bounded thread pool (PAYMENT_WORKERS) and
+#     wait at most PAYMENT_VERIFY_WAIT_SECONDS. When the pool is full, the
+#     breaker is open or the wait runs out, the PaymentVerification stays
+#     PENDING and `flask payments reconcile` (run it from cron) settles it.
+# Client, breaker and pool are built on first use, per process, so workers
+# and CLI commands that never take a payment do not load the razorpay and
+# requests packages at all.
+#
+# RAZORPAY_API_URL points the client at another server than
+# api.razorpay.com, e.g. the RazorpayStandIn in tests/helpers.py.
+
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import PaymentStatusEnum
+from app.models.payment_verification import PaymentVerification
+from app.services import entitlements, metrics
+
+ReconcileResult = namedtuple('ReconcileResult', 'completed failed pending')
+
+# Razorpay payment statuses
+_PAID = ('captured', 'authorized')
+_UNPAID = ('failed', 'refunded')
+
+
+class GatewayUnavailable(RuntimeError):
+    """The gateway did not answer usefully (timeouts, 5xx, circuit open); try again later."""
+
+
+class PaymentRejected(ValueError):
+    """The gateway refused the request itself (e.g. unknown payment id); retrying will not help."""
+
+
+class CircuitBreaker:
+    """Closed until `threshold` failures in a row, then open for `reset_seconds`, then one trial call."""
+
+    def __init__(self, threshold, reset_seconds):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None  # monotonic time the circuit last opened
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened_at >= self.reset_seconds else 'open'
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_seconds and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+# --- Per-app state --------------------------------------------------------
+
+_state_lock = threading.Lock()
+
+
+def _create_state(app):
+    import razorpay  # type: ignore
+
+    options = {'base_url': app.config['RAZORPAY_API_URL']} if app.config.get('RAZORPAY_API_URL') else {}
+    workers = app.config.get('PAYMENT_WORKERS', 8)
+    return {
+        'client': razorpay.Client(auth=(app.config['RAZORPAY_KEY_ID'], app.config['RAZORPAY_KEY_SECRET']), **options),
+        'breaker': CircuitBreaker(app.config.get('PAYMENT_BREAKER_FAILURES', 5),
+                                  app.config.get('PAYMENT_BREAKER_RESET_SECONDS', 30)),
+        'pool': ThreadPoolExecutor(max_workers=workers, thread_name_prefix='payments'),
+        'slots': threading.BoundedSemaphore(workers),  # verifications in flight, queued ones included
+    }
+
+
+def _state(app):
+    state = app.extensions.get('payments')
+    if state is None:
+        with _state_lock:
+            state = app.extensions.get('payments')
+            if state is None:
+                state = app.extensions['payments'] = _create_state(app)
+    return state
+
+
+def get_client(app=None):
+    """Return this app's razorpay.Client, creating it on first use."""
+    return _state(app or current_app._get_current_object())['client']
+
+
+def breaker(app=None):
+    return _state(app or current_app._get_current_object())['breaker']
+
+
+def key_id():
+    """Public key id for Razorpay Checkout on the payment page."""
+    return current_app.config['RAZORPAY_KEY_ID']
+
+
+# --- Gateway calls --------------------------------------------------------
+
+def _retry_delay(app, attempt):
+    base = app.config.get('PAYMENT_RETRY_BASE_SECONDS', 0.25)
+    cap = app.config.get('PAYMENT_RETRY_MAX_SECONDS', 2)
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+def fetch_payment(payment_id, app=None):
+    """
+    Fetch a payment from Razorpay with timeouts, retries and the circuit
+    breaker. Raises GatewayUnavailable or PaymentRejected.
+    """
+    import requests  # type: ignore
+    from razorpay.errors import BadRequestError, GatewayError, ServerError  # type: ignore
+
+    app = app or current_app._get_current_object()
+    state = _state(app)
+    timeout = (app.config.get('PAYMENT_CONNECT_TIMEOUT', 3), app.config.get('PAYMENT_READ_TIMEOUT', 5))
+    attempts = app.config.get('PAYMENT_MAX_ATTEMPTS', 3)
+    error = None
+    for attempt in range(1, attempts + 1):
+        if not state['breaker'].allow():
+            raise GatewayUnavailable("Payment gateway circuit is open")
+        try:
+            with metrics.razorpay_call('payment.fetch'):
+                payment = state['client'].payment.fetch(payment_id, timeout=timeout)
+        except BadRequestError as e:
+            state['breaker'].success()  # the gateway is up; the request was wrong
+            raise PaymentRejected(str(e))
+        except (requests.RequestException, ServerError, GatewayError, ValueError) as e:
+            # ValueError: a body that is not JSON, e.g. a proxy's error page
+            state['breaker'].failure()
+            error = e
+            if attempt < attempts:
+                time.sleep(_retry_delay(app, attempt))
+        else:
+            state['breaker'].success()
+            return payment
+    raise GatewayUnavailable(f"Payment gateway failed {attempts} time(s): {error}")
+
+
+# --- Verifications --------------------------------------------------------
+
+def record_payment(student_id, payment_id, tier, price, duration_days):
+    """
+    Store a payment the browser reported, before asking the gateway about
+    it, and commit. Returns (verification, created); an existing row for the
+    same payment id comes back with created=False.
+    """
+    verification = PaymentVerification(
+        payment_id=payment_id, student_id=student_id, tier=tier, amount=Decimal(str(price)),
+        duration_days=duration_days,
+        # The request settles it if it can; the reconciler only looks later.
+        next_attempt_at=datetime.utcnow() + timedelta(seconds=current_app.config.get('PAYMENT_RECONCILE_DELAY_SECONDS', 60)),
+    )
+    db.session.add(verification)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return PaymentVerification.query.filter_by(payment_id=payment_id).one(), False
+    return verification, True
+
+
+def _resolve(verification, status, error=None):
+    """Move a PENDING verification to `status`; False if someone else already resolved it."""
+    now = datetime.utcnow()
+    changed = db.session.execute(
+        update(PaymentVerification)
+        .where(PaymentVerification.id == verification.id, PaymentVerification.status == PaymentStatusEnum.PENDING)
+        .values(status=status, resolved_at=now, last_error=error)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if changed:
+        verification.status, verification.resolved_at, verification.last_error = status, now, error
+    else:
+        db.session.refresh(verification)
+    return bool(changed)
+
+
+def _fail(verification, error):
+    current_app.logger.warning(f"Payment {verification.payment_id} failed verification: {error}")
+    _resolve(verification, PaymentStatusEnum.FAILED, error[:1000])
+
+
+def _retry_later(verification, error):
+    verification.attempts += 1
+    max_attempts = current_app.config.get('PAYMENT_RECONCILE_MAX_ATTEMPTS', 12)
+    if verification.attempts >= max_attempts:
+        current_app.logger.error(
+            f"Giving up on payment {verification.payment_id} after {verification.attempts} attempts; "
+            f"check it in the Razorpay dashboard: {error}"
+        )
+        _resolve(verification, PaymentStatusEnum.FAILED, f"Unverified after {verification.attempts} attempts: {error}"[:1000])
+        return
+    verification.last_error = error[:1000]
+    verification.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff_seconds(verification.attempts))
+
+
+def backoff_seconds(attempts):
+    """Delay before reconciling again after `attempts` tries: exponential, capped, with jitter."""
+    base = current_app.config.get('PAYMENT_RECONCILE_DELAY_SECONDS', 60)
+    cap = current_app.config.get('PAYMENT_RECONCILE_MAX_DELAY_SECONDS', 3600)
+    delay = min(cap, base * (2 ** max(0, attempts - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def settle(verification, payment):
+    """Apply the gateway's view of a payment to its verification. The caller commits."""
+    status = payment.get('status')
+    expected_paise = int(verification.amount * 100)
+    noted_student = (payment.get('notes') or {}).get('student_id')
+    if status in _PAID:
+        if payment.get('amount') is not None and int(payment['amount']) != expected_paise:
+            _fail(verification, f"Paid {payment['amount']} paise, expected {expected_paise}")
+        elif noted_student and str(noted_student) != str(verification.student_id):
+            _fail(verification, f"Payment belongs to student {noted_student}")
+        elif _resolve(verification, PaymentStatusEnum.COMPLETED):
+            verification.subscription = entitlements.activate_subscription(
+                verification.student, verification.tier, verification.amount, verification.duration_days
+            )
+    elif status in _UNPAID:
+        _fail(verification, f"Payment status is '{status}'")
+    else:
+        # 'created': the bank has not authorised it yet
+        _retry_later(verification, f"Payment status is '{status}'")
+
+
+def _check(verification, fetch):
+    try:
+        payment = fetch()
+    except GatewayUnavailable as e:
+        _retry_later(verification, str(e))
+    except PaymentRejected as e:
+        _fail(verification, str(e))
+    else:
+        settle(verification, payment)
+
+
+def verify_now(verification):
+    """
+    Ask the gateway about a new verification from the request, waiting at
+    most PAYMENT_VERIFY_WAIT_SECONDS, and commit. Whatever is not settled
+    by then stays PENDING for the reconciler.
+    """
+    app = current_app._get_current_object()
+    state = _state(app)
+    if not state['slots'].acquire(blocking=False):
+        _retry_later(verification, "Too many payment verifications in flight")
+        db.session.commit()
+        return verification
+    future = state['pool'].submit(fetch_payment, verification.payment_id, app)
+    future.add_done_callback(lambda _: state['slots'].release())
+
+    def wait():
+        try:
+            return future.result(timeout=app.config.get('PAYMENT_VERIFY_WAIT_SECONDS', 8))
+        except FutureTimeout:
+            raise GatewayUnavailable("Payment gateway did not answer in time")
+
+    _check(verification, wait)
+    db.session.commit()
+    return verification
+
+
+def _claim_batch(batch_size):
+    """Lease up to batch_size due PENDING verifications, like the mail outbox does."""
+    now = datetime.utcnow()
+    lease = timedelta(seconds=current_app.config.get('PAYMENT_RECONCILE_LEASE_SECONDS', 120))
+    ids = [
+        row.id for row in
+        db.session.query(PaymentVerification.id)
+        .filter(PaymentVerification.status == PaymentStatusEnum.PENDING, PaymentVerification.next_attempt_at <= now)
+        .order_by(PaymentVerification.next_attempt_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ]
+    if not ids:
+        db.session.rollback()
+        return []
+    db.session.execute(
+        update(PaymentVerification)
+        .where(PaymentVerification.id.in_(ids))
+        .values(next_attempt_at=now + lease)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return PaymentVerification.query.filter(PaymentVerification.id.in_(ids)).order_by(PaymentVerification.id).all()
+
+
+def reconcile(batch_size=None):
+    """
+    Settle every PENDING verification that is due. Stops early while the
+    circuit is open; the rows it had claimed come back when their lease ends.
+    """
+    batch_size = batch_size or current_app.config.get('PAYMENT_RECONCILE_BATCH_SIZE', 50)
+    counts = {status: 0 for status in PaymentStatusEnum}
+    circuit_open = False
+    while not circuit_open:
+        batch = _claim_batch(batch_size)
+        for verification in batch:
+            if breaker().state == 'open':
+                circuit_open = True
+                counts[PaymentStatusEnum.PENDING] += 1
+                continue
+            _check(verification, lambda: fetch_payment(verification.payment_id))
+            db.session.commit()
+            counts[verification.status] += 1
+        if len(batch) < batch_size:
+            break
+    return ReconcileResult(counts[PaymentStatusEnum.COMPLETED], counts[PaymentStatusEnum.FAILED],
+                           counts[PaymentStatusEnum.PENDING])
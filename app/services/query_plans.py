@@ -0,0 +1,94 @@
+# In app/services/query_plans.py
+#
+# Query-plan regression checks for the hottest per-student queries.
+# `flask query-plans check` runs EXPLAIN QUERY PLAN (SQLite) for each query
+# below and fails if any of them reads a whole table instead of an index.
+# Keep the queries here in step with the routes they mirror.
+
+from collections import namedtuple
+
+from sqlalchemy import select, update
+
+from app import db
+from app.models.fine import Fine
+from app.models.loan import Loan
+from app.models.student import account_summary_statement
+from app.models.subscription import Subscription
+
+HotQuery = namedtuple('HotQuery', 'name used_by statement')
+PlanReport = namedtuple('PlanReport', 'query plan full_scans')
+
+# Any id works: plans do not depend on the parameter values.
+_STUDENT_ID = 1
+_BOOK_ID = 1
+
+
+def hot_queries():
+    """The per-student queries every logged-in page view leans on."""
+    return [
+        HotQuery(
+            'open loans count', 'borrow',
+            select(db.func.count(Loan.id))
+            .where(Loan.student_id == _STUDENT_ID, Loan.returned_date.is_(None))
+        ),
+        HotQuery(
+            'open loan of one book', 'book_detail',
+            select(Loan)
+            .where(Loan.student_id == _STUDENT_ID, Loan.book_id == _BOOK_ID, Loan.returned_date.is_(None))
+            .limit(1)
+        ),
+        HotQuery(
+            'loans of a student', 'my_loans',
+            select(Loan).where(Loan.student_id == _STUDENT_ID)
+        ),
+        HotQuery(
+            'student with account summary', 'load_user',
+            account_summary_statement(_STUDENT_ID)
+        ),
+        HotQuery(
+            'deactivate active subscriptions', 'verify_payment',
+            update(Subscription)
+            .where(Subscription.student_id == _STUDENT_ID, Subscription.is_active.is_(True))
+            .values(is_active=False)
+        ),
+        HotQuery(
+            'subscription history', 'my_subscription',
+            select(Subscription)
+            .where(Subscription.student_id == _STUDENT_ID)
+            .order_by(Subscription.start_date.desc())
+        ),
+        HotQuery(
+            'fines of a student', 'dues',
+            select(Fine)
+            .join(Loan, Fine.loan_id == Loan.id)
+            .where(Loan.student_id == _STUDENT_ID)
+            .order_by(Fine.issued_date.desc())
+        ),
+    ]
+
+
+def _is_full_scan(detail):
+    # SQLite reports "SCAN <table>" for a table scan and
+    # "SCAN <table> USING [COVERING] INDEX ..." for a full index scan;
+    # both read every row.
+    return detail.startswith('SCAN ') and 'SUBQUERY' not in detail
+
+
+def explain(statement):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement (SQLite only)."""
+    # Inline the parameters so enum and date values go through their type's
+    # conversion, as they would when the statement really runs.
+    compiled = statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+    rows = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}")
+    return [row[-1] for row in rows]
+
+
+def check_plans(queries=None):
+    """Explain every hot query; returns a PlanReport per query."""
+    if db.engine.dialect.name != 'sqlite':
+        raise RuntimeError("Query-plan checks run against SQLite; set SQLALCHEMY_DATABASE_URI to a SQLite database.")
+    reports = []
+    for query in queries or hot_queries():
+        plan = explain(query.statement)
+        reports.append(PlanReport(query, plan, [line for line in plan if _is_full_scan(line)]))
+    return reports
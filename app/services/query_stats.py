@@ -0,0 +1,167 @@
+# In app/services/query_stats.py
+#
+# Per-request SQL instrumentation. Engine cursor events record, for the
+# current request, how many statements ran, how long the database took and
+# how often each statement shape (fingerprint) repeated. A SELECT shape
+# that repeats more than SQL_N_PLUS_ONE_THRESHOLD times in one request is
+# reported as a likely N+1 (a query per row of some list).
+#
+# Output:
+#   - a Server-Timing header (db;dur=...;desc="N queries"), shown in the
+#     browser's network panel; on when SQL_STATS_SERVER_TIMING is true
+#     (default: in debug mode)
+#   - one JSON log line per request at INFO when SQL_STATS_LOG is on, and
+#     a WARNING line whenever an N+1 is suspected
+#   - capture(), which tests use to check query budgets (see tests/helpers.py)
+
+import json
+import re
+import threading
+import time
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+RepeatedStatement = namedtuple('RepeatedStatement', 'fingerprint count')
+
+_WHITESPACE_RE = re.compile(r'\s+')
+# "IN (?, ?, ?)" / "IN (%s, %s)" -> "IN (?...)", so batches of any size share a fingerprint
+_IN_LIST_RE = re.compile(r'\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))+\s*\)')
+
+
+def fingerprint(statement):
+    """Statement text with whitespace and IN-list lengths normalised."""
+    statement = _WHITESPACE_RE.sub(' ', statement).strip()
+    return _IN_LIST_RE.sub('(?...)', statement)
+
+
+class RequestStats:
+    """Statements seen while handling one request."""
+
+    def __init__(self, endpoint=None):
+        self.endpoint = endpoint
+        self.count = 0
+        self.duration = 0.0  # seconds
+        self.fingerprints = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold):
+        """SELECT shapes run more than `threshold` times: likely N+1 queries."""
+        return [
+            RepeatedStatement(fp, n) for fp, n in self.fingerprints.most_common()
+            if n > threshold and fp.upper().startswith('SELECT')
+        ]
+
+    def summary(self, threshold):
+        return {
+            'endpoint': self.endpoint,
+            'queries': self.count,
+            'db_ms': round(self.duration * 1000, 2),
+            'distinct': len(self.fingerprints),
+            'n_plus_one': [{'count': r.count, 'statement': r.fingerprint[:200]}
+                           for r in self.repeated(threshold)],
+        }
+
+
+# --- Engine events --------------------------------------------------------
+
+def _current_stats():
+    if not has_app_context():
+        return None
+    return g.get('_query_stats')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats() is not None:
+        conn.info.setdefault('query_stats_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    starts = conn.info.get('query_stats_start')
+    if stats is None or not starts:
+        return
+    stats.record(statement, time.perf_counter() - starts.pop())
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute.
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_stats_start'):
+        conn.info['query_stats_start'].pop()
+
+
+# --- Request hooks --------------------------------------------------------
+
+_captures = []
+_captures_lock = threading.Lock()
+
+
+@contextmanager
+def capture():
+    """
+    Collect the RequestStats of every request finished inside the block:
+        with query_stats.capture() as seen:
+            client.get('/my-loans')
+        assert seen[-1].count <= 6
+    """
+    seen = []
+    with _captures_lock:
+        _captures.append(seen)
+    try:
+        yield seen
+    finally:
+        with _captures_lock:
+            _captures.remove(seen)
+
+
+def _start_request():
+    g._query_stats = RequestStats(request.endpoint)
+
+
+def _finish_request(response):
+    stats = g.pop('_query_stats', None)
+    if stats is None:
+        return response
+    app = current_app
+    threshold = app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 5)
+
+    server_timing = app.config.get('SQL_STATS_SERVER_TIMING')
+    if server_timing if server_timing is not None else app.debug:
+        response.headers.add(
+            'Server-Timing', f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries"'
+        )
+
+    repeated = stats.repeated(threshold)
+    if repeated or app.config.get('SQL_STATS_LOG', False):
+        line = dict(stats.summary(threshold), method=request.method, path=request.path,
+                    status=response.status_code)
+        if repeated:
+            app.logger.warning(f"Likely N+1 queries: {json.dumps(line)}")
+        else:
+            app.logger.info(json.dumps(line))
+
+    with _captures_lock:
+        for seen in _captures:
+            seen.append(stats)
+    return response
+
+
+def init_app(app):
+    if not app.config.get('SQL_STATS_ENABLED', True):
+        return
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    if not getattr(init_app, '_listening', False):
+        # On the Engine class, so every engine the app creates is covered.
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        init_app._listening = True
@@ -0,0 +1,503 @@
+# In app/services/search.py
+#
+# Full-text search over the publication catalog.
+#
+# Three interchangeable backends:
+#   - 'memory': an in-process inverted index ranked with BM25
+#   - 'sqlite': an FTS5 virtual table (local development)
+#   - 'mysql':  a FULLTEXT-indexed shadow table (production)
+# SEARCH_BACKEND='auto' picks the database backend that matches the
+# configured engine and falls back to 'memory'.
+#
+# The index follows the catalog incrementally: publications flushed in a
+# transaction are re-indexed once that transaction commits.
+
+import heapq
+import math
+import re
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+from flask import current_app
+from sqlalchemy import event, inspect, select, text
+
+from app import db
+from app.services import db_routing
+
+SearchHit = namedtuple('SearchHit', 'id score kind')
+
+# Relative importance of each indexed field when ranking.
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'author': 2.0,
+    'narrator': 2.0,
+    'related_courses': 1.5,
+    'summary': 1.0,
+}
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have in is it its of on or that
+the this to was were will with
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# (suffix, replacement) tried in order; the first match wins.
+_STEM_RULES = (
+    ('ational', 'ate'), ('ization', 'ize'), ('fulness', 'ful'),
+    ('ousness', 'ous'), ('iveness', 'ive'), ('ations', 'ate'),
+    ('ation', 'ate'), ('ments', 'ment'), ('ings', ''), ('ing', ''),
+    ('edly', ''), ('ied', 'y'), ('ies', 'y'), ('sses', 'ss'), ('ss', 'ss'),
+    ('ed', ''), ('ly', ''), ('s', ''),
+)
+
+
+def stem(word):
+    """A small suffix-stripping stemmer ('programming' -> 'program')."""
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix, replacement in _STEM_RULES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)] + replacement
+            break
+    if len(word) > 4 and word[-1] == word[-2] and word[-1] not in 'lsz':
+        word = word[:-1]
+    if len(word) > 3 and word.endswith('e'):
+        word = word[:-1]
+    return word
+
+
+def tokenize(value):
+    """Lowercase, split on non-alphanumerics, drop stopwords and stem."""
+    if not value:
+        return []
+    return [stem(t) for t in _TOKEN_RE.findall(value.lower()) if t not in STOPWORDS]
+
+
+def publication_documents(ids=None):
+    """
+    Yield one searchable document (a dict) per publication, loaded with a
+    single query across the subtype tables. Pass ids to limit the load.
+    """
+    from app.models.publication import Publication
+    from app.models.physical_book import PhysicalBook
+    from app.models.audiobook import Audiobook
+
+    pub = Publication.__table__
+    book = PhysicalBook.__table__
+    audio = Audiobook.__table__
+    stmt = (
+        select(pub.c.id, pub.c.type, pub.c.title, pub.c.author, pub.c.summary,
+               book.c.related_courses, audio.c.narrator)
+        .select_from(pub.outerjoin(book, book.c.id == pub.c.id)
+                        .outerjoin(audio, audio.c.id == pub.c.id))
+    )
+    if ids is not None:
+        stmt = stmt.where(pub.c.id.in_(list(ids)))
+    with db.engine.connect() as conn:
+        for row in conn.execute(stmt):
+            yield {
+                'id': row.id,
+                'kind': row.type,
+                'title': row.title,
+                'author': row.author,
+                'summary': row.summary,
+                'related_courses': row.related_courses,
+                'narrator': row.narrator,
+            }
+
+
+class InvertedIndexBackend:
+    """In-process inverted index with BM25 ranking (one copy per worker)."""
+
+    name = 'memory'
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, refresh_seconds=300):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.RLock()
+        self._postings = defaultdict(dict)   # term -> {doc_id: weighted tf}
+        self._doc_terms = {}                 # doc_id -> set of terms
+        self._doc_len = {}                   # doc_id -> weighted length
+        self._doc_kind = {}
+        self._total_len = 0.0
+        self._built_at = None
+
+    def _ensure_built(self):
+        stale = (self._built_at is None or
+                 (self.refresh_seconds and time.monotonic() - self._built_at > self.refresh_seconds))
+        if stale:
+            self.rebuild()
+
+    def rebuild(self):
+        documents = list(publication_documents())
+        with self._lock:
+            self._postings = defaultdict(dict)
+            self._doc_terms, self._doc_len, self._doc_kind = {}, {}, {}
+            self._total_len = 0.0
+            for doc in documents:
+                self._add(doc)
+            self._built_at = time.monotonic()
+        return len(documents)
+
+    def _add(self, doc):
+        weighted = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(doc.get(field)):
+                weighted[term] += weight
+        doc_id = doc['id']
+        for term, tf in weighted.items():
+            self._postings[term][doc_id] = tf
+        self._doc_terms[doc_id] = set(weighted)
+        self._doc_len[doc_id] = sum(weighted.values())
+        self._doc_kind[doc_id] = doc['kind']
+        self._total_len += self._doc_len[doc_id]
+
+    def _discard(self, doc_id):
+        for term in self._doc_terms.pop(doc_id, ()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_len -= self._doc_len.pop(doc_id, 0.0)
+        self._doc_kind.pop(doc_id, None)
+
+    def index(self, documents):
+        if self._built_at is None:
+            return  # The first search builds the whole index anyway.
+        with self._lock:
+            for doc in documents:
+                self._discard(doc['id'])
+                self._add(doc)
+
+    def remove(self, ids):
+        with self._lock:
+            for doc_id in ids:
+                self._discard(doc_id)
+
+    def search(self, query, kind=None, limit=100):
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        self._ensure_built()
+        with self._lock:
+            n_docs = len(self._doc_len)
+            if not n_docs:
+                return []
+            avg_len = self._total_len / n_docs or 1.0
+            scores = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    if kind and self._doc_kind.get(doc_id) != kind:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / avg_len)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+            ranked = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+            return [SearchHit(doc_id, score, self._doc_kind[doc_id]) for doc_id, score in ranked]
+
+
+class SQLiteFTS5Backend:
+    """SQLite FTS5 virtual table ranked with the built-in bm25()."""
+
+    name = 'sqlite'
+    table = 'publication_fts'
+    _columns = ('title', 'author', 'narrator', 'related_courses', 'summary')
+
+    def __init__(self):
+        self._ready = False
+
+    def _ensure_table(self):
+        if self._ready:
+            return
+        with db.engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE name = :name"), {'name': self.table}
+            ).first()
+        if not exists:
+            self.rebuild()
+        self._ready = True
+
+    def rebuild(self):
+        with db.engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {self.table}"))
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {self.table} USING fts5("
+                f"{', '.join(self._columns)}, kind UNINDEXED, "
+                f"tokenize='porter unicode61')"
+            ))
+        documents = list(publication_documents())
+        self._write(documents)
+        self._ready = True
+        return len(documents)
+
+    def _write(self, documents):
+        if not documents:
+            return
+        with db.engine.begin() as conn:
+            conn.execute(text(f"DELETE FROM {self.table} WHERE rowid = :id"),
+                         [{'id': doc['id']} for doc in documents])
+            conn.execute(
+                text(f"INSERT INTO {self.table} (rowid, {', '.join(self._columns)}, kind) "
+                     f"VALUES (:id, {', '.join(':' + c for c in self._columns)}, :kind)"),
+                documents
+            )
+
+    def index(self, documents):
+        self._ensure_table()
+        self._write(list(documents))
+
+    def remove(self, ids):
+        self._ensure_table()
+        ids = list(ids)
+        if ids:
+            with db.engine.begin() as conn:
+                conn.execute(text(f"DELETE FROM {self.table} WHERE rowid = :id"),
+                             [{'id': doc_id} for doc_id in ids])
+
+    def search(self, query, kind=None, limit=100):
+        words = [w for w in _TOKEN_RE.findall(query.lower()) if w not in STOPWORDS]
+        if not words:
+            return []
+        self._ensure_table()
+        match = ' OR '.join(f'"{w}"' for w in words)
+        weights = ', '.join(str(FIELD_WEIGHTS[c]) for c in self._columns)
+        sql = (f"SELECT rowid AS id, kind, bm25({self.table}, {weights}, 0) AS rank "
+               f"FROM {self.table} WHERE {self.table} MATCH :match")
+        params = {'match': match, 'limit': limit}
+        if kind:
+            sql += " AND kind = :kind"
+            params['kind'] = kind
+        sql += " ORDER BY rank, rowid LIMIT :limit"
+        with db_routing.read_engine().connect() as conn:
+            rows = conn.execute(text(sql), params).all()
+        # bm25() is "lower is better"; flip it so higher scores rank first.
+        return [SearchHit(row.id, -row.rank, row.kind) for row in rows]
+
+
+class MySQLFullTextBackend:
+    """
+    MySQL FULLTEXT search over a shadow table of pre-stemmed terms.
+    Stemming happens in Python (tokenize), so the InnoDB parser only ever
+    sees stems; title terms get their own FULLTEXT index for weighting.
+    """
+
+    name = 'mysql'
+    table = 'publication_search'
+
+    def __init__(self):
+        self._ready = False
+
+    def _ensure_table(self):
+        if self._ready:
+            return
+        if not inspect(db.engine).has_table(self.table):
+            self.rebuild()
+        self._ready = True
+
+    def rebuild(self):
+        with db.engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {self.table}"))
+            conn.execute(text(
+                f"CREATE TABLE {self.table} ("
+                " publication_id INTEGER NOT NULL PRIMARY KEY,"
+                " kind VARCHAR(50),"
+                " title_terms TEXT,"
+                " body_terms TEXT,"
+                " FULLTEXT KEY ft_publication_search_title (title_terms),"
+                " FULLTEXT KEY ft_publication_search_all (title_terms, body_terms)"
+                ") ENGINE=InnoDB"
+            ))
+        documents = list(publication_documents())
+        self._write(documents)
+        self._ready = True
+        return len(documents)
+
+    @staticmethod
+    def _row(doc):
+        body = ' '.join(doc.get(f) or '' for f in ('author', 'narrator', 'related_courses', 'summary'))
+        return {
+            'id': doc['id'],
+            'kind': doc['kind'],
+            'title_terms': ' '.join(tokenize(doc.get('title'))),
+            'body_terms': ' '.join(tokenize(body)),
+        }
+
+    def _write(self, documents):
+        rows = [self._row(doc) for doc in documents]
+        if not rows:
+            return
+        with db.engine.begin() as conn:
+            conn.execute(
+                text(f"INSERT INTO {self.table} (publication_id, kind, title_terms, body_terms) "
+                     "VALUES (:id, :kind, :title_terms, :body_terms) "
+                     "ON DUPLICATE KEY UPDATE kind = VALUES(kind), "
+                     "title_terms = VALUES(title_terms), body_terms = VALUES(body_terms)"),
+                rows
+            )
+
+    def index(self, documents):
+        self._ensure_table()
+        self._write(list(documents))
+
+    def remove(self, ids):
+        self._ensure_table()
+        ids = list(ids)
+        if ids:
+            with db.engine.begin() as conn:
+                conn.execute(text(f"DELETE FROM {self.table} WHERE publication_id = :id"),
+                             [{'id': doc_id} for doc_id in ids])
+
+    def search(self, query, kind=None, limit=100):
+        terms = ' '.join(tokenize(query))
+        if not terms:
+            return []
+        self._ensure_table()
+        title_weight = FIELD_WEIGHTS['title'] - 1
+        sql = (f"SELECT publication_id AS id, kind, "
+               f"MATCH(title_terms, body_terms) AGAINST (:q IN NATURAL LANGUAGE MODE) "
+               f"+ {title_weight} * MATCH(title_terms) AGAINST (:q IN NATURAL LANGUAGE MODE) AS score "
+               f"FROM {self.table} "
+               f"WHERE MATCH(title_terms, body_terms) AGAINST (:q IN NATURAL LANGUAGE MODE)")
+        params = {'q': terms, 'limit': limit}
+        if kind:
+            sql += " AND kind = :kind"
+            params['kind'] = kind
+        sql += " ORDER BY score DESC, publication_id LIMIT :limit"
+        with db_routing.read_engine().connect() as conn:
+            rows = conn.execute(text(sql), params).all()
+        return [SearchHit(row.id, float(row.score), row.kind) for row in rows]
+
+
+def _sqlite_has_fts5():
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(text("CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_probe USING fts5(x)"))
+            conn.execute(text("DROP TABLE temp.fts5_probe"))
+        return True
+    except Exception:
+        return False
+
+
+def _create_backend(app):
+    choice = app.config.get('SEARCH_BACKEND', 'auto')
+    if choice == 'auto':
+        dialect = db.engine.dialect.name
+        if dialect == 'mysql':
+            choice = 'mysql'
+        elif dialect == 'sqlite' and _sqlite_has_fts5():
+            choice = 'sqlite'
+        else:
+            choice = 'memory'
+    if choice == 'sqlite':
+        return SQLiteFTS5Backend()
+    if choice == 'mysql':
+        return MySQLFullTextBackend()
+    if choice == 'memory':
+        return InvertedIndexBackend(app.config.get('SEARCH_INDEX_REFRESH_SECONDS', 300))
+    raise ValueError(f"Unknown SEARCH_BACKEND '{choice}'")
+
+
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return this app's search backend, creating it on first use."""
+    app = current_app._get_current_object()
+    state = app.extensions['search']
+    if state['backend'] is None:
+        with _backend_lock:
+            if state['backend'] is None:
+                state['backend'] = _create_backend(app)
+    return state['backend']
+
+
+def search(query, kind=None, limit=None):
+    """
+    Return SearchHit tuples for a free-text query, best match first.
+    kind restricts results to one publication type ('physical_book',
+    'ebook' or 'audiobook').
+    """
+    if limit is None:
+        limit = current_app.config.get('SEARCH_MAX_RESULTS', 200)
+    return get_backend().search(query, kind=kind, limit=limit)
+
+
+def load_hits(model, hits):
+    """Fetch the rows behind a list of hits in one query, keeping rank order."""
+    if not hits:
+        return []
+    rows = {row.id: row for row in model.query.filter(model.id.in_([hit.id for hit in hits]))}
+    return [rows[hit.id] for hit in hits if hit.id in rows]
+
+
+def reindex(ids):
+    """Refresh the index entries for the given publication ids."""
+    ids = set(ids)
+    if not ids:
+        return
+    backend = get_backend()
+    documents = list(publication_documents(ids))
+    backend.index(documents)
+    missing = ids - {doc['id'] for doc in documents}
+    if missing:
+        backend.remove(missing)
+
+
+def rebuild():
+    """Rebuild the whole index from the database; returns documents indexed."""
+    return get_backend().rebuild()
+
+
+# --- Incremental updates -------------------------------------------------
+
+_INDEXED_ATTRS = ('title', 'author', 'summary', 'related_courses', 'narrator')
+
+
+def _after_flush(session, flush_context):
+    from app.models.publication import Publication
+
+    pending = session.info.setdefault('search_reindex', set())
+    for obj in session.new:
+        if isinstance(obj, Publication):
+            pending.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, Publication):
+            pending.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, Publication):
+            state = inspect(obj)
+            if any(name in state.attrs and state.attrs[name].history.has_changes()
+                   for name in _INDEXED_ATTRS):
+                pending.add(obj.id)
+
+
+def _after_commit(session):
+    pending = session.info.pop('search_reindex', None)
+    if not pending:
+        return
+    try:
+        reindex(pending)
+    except Exception as e:
+        # The catalog write already succeeded; a stale index entry is
+        # repaired by the next rebuild (or memory-backend refresh).
+        current_app.logger.warning(f"Search reindex failed for {sorted(pending)}: {e}")
+
+
+def _after_rollback(session):
+    session.info.pop('search_reindex', None)
+
+
+def init_app(app):
+    app.extensions['search'] = {'backend': None}
+    if not getattr(init_app, '_listening', False):
+        event.listen(db.session, 'after_flush', _after_flush)
+        event.listen(db.session, 'after_commit', _after_commit)
+        event.listen(db.session, 'after_rollback', _after_rollback)
+        init_app._listening = True
@@ -0,0 +1,327 @@
+# In app/services/sessions.py
+#
+# Server-side sessions. The cookie carries only a random session id; the
+# session dict itself lives in a store picked by SESSION_BACKEND:
+#   'sql'        - the web_session table (default)
+#   'filesystem' - one file per session under SESSION_DIR
+#   'redis'      - any Redis-protocol server at SESSION_REDIS_URL
+#                  (Redis, Valkey, KeyDB...); needs the `redis` package
+#
+# Data is serialised with Flask's tagged JSON (so flashes, datetimes etc.
+# round-trip) and zlib-compressed when that makes it smaller.
+#
+# Expiry slides: every session lives PERMANENT_SESSION_LIFETIME past its
+# last use. To avoid a write per request, an unmodified session is only
+# touched once its stored expiry has fallen SESSION_TOUCH_SECONDS behind.
+# Expired sessions are deleted by `flask sessions purge` (run it from cron);
+# the redis store expires keys by itself.
+#
+# Empty sessions are never stored and set no cookie, so anonymous catalog
+# browsing stays cookie-less.
+
+import os
+import re
+import secrets
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from flask import current_app, session
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from sqlalchemy import delete, insert, select, update
+from werkzeug.datastructures import CallbackDict
+
+from app import db
+from app.models.web_session import WebSession
+
+_serializer = TaggedJSONSerializer()
+_SID_RE = re.compile(r'^[A-Za-z0-9_-]{43}$')  # secrets.token_urlsafe(32)
+_COMPRESS_MIN = 200
+
+
+def dumps(data):
+    raw = _serializer.dumps(dict(data)).encode('utf-8')
+    if len(raw) >= _COMPRESS_MIN:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return b'z' + packed
+    return b'j' + raw
+
+
+def loads(blob):
+    kind, body = blob[:1], blob[1:]
+    if kind == b'z':
+        body = zlib.decompress(body)
+    return _serializer.loads(body.decode('utf-8'))
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dict that remembers its id and whether it changed."""
+
+    def __init__(self, data=None, sid=None, expires_at=None):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(data, on_update)
+        self.sid = sid
+        self.expires_at = expires_at  # unix time as last stored, None if never stored
+        self.modified = False
+        self.accessed = False
+        self.rotate = False
+
+
+# --- Stores ---------------------------------------------------------------
+# load(sid) -> (blob, expires_at) or None; save(sid, blob, expires_at);
+# touch(sid, expires_at); delete(sid); purge(batch_size) -> count
+
+class SQLSessionStore:
+    name = 'sql'
+
+    def __init__(self):
+        self.table = WebSession.__table__
+
+    def load(self, sid):
+        t = self.table
+        with db.engine.connect() as conn:
+            row = conn.execute(
+                select(t.c.data, t.c.expires_at)
+                .where(t.c.id == sid, t.c.expires_at > datetime.utcnow())
+            ).first()
+        if row is None:
+            return None
+        return row.data, (row.expires_at - datetime(1970, 1, 1)).total_seconds()
+
+    def save(self, sid, blob, expires_at):
+        t = self.table
+        expires = datetime.utcfromtimestamp(expires_at)
+        # Own transaction: never commit whatever the view left in db.session.
+        with db.engine.begin() as conn:
+            updated = conn.execute(
+                update(t).where(t.c.id == sid).values(data=blob, expires_at=expires)
+            ).rowcount
+            if not updated:
+                conn.execute(insert(t).values(id=sid, data=blob, expires_at=expires))
+
+    def touch(self, sid, expires_at):
+        t = self.table
+        with db.engine.begin() as conn:
+            conn.execute(update(t).where(t.c.id == sid).values(expires_at=datetime.utcfromtimestamp(expires_at)))
+
+    def delete(self, sid):
+        with db.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.id == sid))
+
+    def purge(self, batch_size):
+        t = self.table
+        now = datetime.utcnow()
+        purged = 0
+        while True:
+            with db.engine.begin() as conn:
+                ids = list(conn.scalars(select(t.c.id).where(t.c.expires_at <= now).limit(batch_size)))
+                if ids:
+                    conn.execute(delete(t).where(t.c.id.in_(ids)))
+            purged += len(ids)
+            if len(ids) < batch_size:
+                return purged
+
+
+class FileSystemSessionStore:
+    """One file per session; the file's mtime is set to its expiry time."""
+    name = 'filesystem'
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, sid):
+        return os.path.join(self.root, sid[:2], sid)
+
+    def load(self, sid):
+        path = self._path(sid)
+        try:
+            expires_at = os.stat(path).st_mtime
+            if expires_at <= time.time():
+                return None
+            with open(path, 'rb') as f:
+                return f.read(), expires_at
+        except FileNotFoundError:
+            return None
+
+    def save(self, sid, blob, expires_at):
+        path = self._path(sid)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(blob)
+        os.utime(tmp, (expires_at, expires_at))
+        os.replace(tmp, path)
+
+    def touch(self, sid, expires_at):
+        try:
+            os.utime(self._path(sid), (expires_at, expires_at))
+        except FileNotFoundError:
+            pass
+
+    def delete(self, sid):
+        try:
+            os.remove(self._path(sid))
+        except FileNotFoundError:
+            pass
+
+    def purge(self, batch_size):
+        now = time.time()
+        purged = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.stat(path).st_mtime <= now:
+                        os.remove(path)
+                        purged += 1
+                except FileNotFoundError:
+                    pass
+        return purged
+
+
+class RedisSessionStore:
+    """Sessions as keys with a TTL; Redis drops expired ones itself."""
+    name = 'redis'
+    prefix = 'libranet:session:'
+
+    def __init__(self, url):
+        try:
+            import redis  # type: ignore
+        except ImportError:
+            raise RuntimeError("SESSION_BACKEND='redis' needs the 'redis' package (pip install redis)")
+        self.client = redis.Redis.from_url(url)
+
+    def load(self, sid):
+        pipe = self.client.pipeline()
+        pipe.get(self.prefix + sid)
+        pipe.pttl(self.prefix + sid)
+        blob, ttl_ms = pipe.execute()
+        if blob is None:
+            return None
+        return blob, time.time() + max(ttl_ms, 0) / 1000
+
+    def save(self, sid, blob, expires_at):
+        self.client.set(self.prefix + sid, blob, exat=int(expires_at))
+
+    def touch(self, sid, expires_at):
+        self.client.expireat(self.prefix + sid, int(expires_at))
+
+    def delete(self, sid):
+        self.client.delete(self.prefix + sid)
+
+    def purge(self, batch_size):
+        return 0
+
+
+def _create_store(app):
+    choice = app.config.get('SESSION_BACKEND', 'sql')
+    if choice == 'sql':
+        return SQLSessionStore()
+    if choice == 'filesystem':
+        return FileSystemSessionStore(app.config.get('SESSION_DIR') or os.path.join(app.instance_path, 'sessions'))
+    if choice == 'redis':
+        return RedisSessionStore(app.config['SESSION_REDIS_URL'])
+    raise ValueError(f"Unknown SESSION_BACKEND '{choice}'")
+
+
+_store_lock = threading.Lock()
+
+
+def get_store(app=None):
+    """Return this app's session store, creating it on first use."""
+    app = app or current_app._get_current_object()
+    state = app.extensions['sessions']
+    if state['store'] is None:
+        with _store_lock:
+            if state['store'] is None:
+                state['store'] = _create_store(app)
+    return state['store']
+
+
+# --- Session interface ----------------------------------------------------
+
+class ServerSideSessionInterface(SessionInterface):
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and _SID_RE.match(sid):
+            try:
+                stored = get_store(app).load(sid)
+            except Exception as e:
+                app.logger.warning(f"Session store unavailable: {e}")
+                stored = None
+            if stored is not None:
+                blob, expires_at = stored
+                try:
+                    return ServerSession(loads(blob), sid=sid, expires_at=expires_at)
+                except (ValueError, zlib.error):
+                    pass  # unreadable (e.g. old format): start afresh
+        return ServerSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        store = get_store(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            # Emptied (e.g. logout with nothing left): drop it everywhere.
+            if session.sid and session.modified:
+                store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        expires_at = time.time() + app.permanent_session_lifetime.total_seconds()
+        new_sid = session.sid is None or session.rotate
+        if new_sid:
+            if session.sid:
+                store.delete(session.sid)
+            session.sid = secrets.token_urlsafe(32)
+
+        if new_sid or session.modified:
+            store.save(session.sid, dumps(session), expires_at)
+        elif expires_at - (session.expires_at or 0) > app.config.get('SESSION_TOUCH_SECONDS', 300):
+            store.touch(session.sid, expires_at)
+        else:
+            return
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+            partitioned=self.get_cookie_partitioned(app),
+        )
+
+
+def regenerate():
+    """Give the current session a fresh id (call on login, against session fixation)."""
+    session.rotate = True
+    session.modified = True
+
+
+def purge(batch_size=None):
+    """Delete expired sessions; returns how many were removed."""
+    batch_size = batch_size or current_app.config.get('SESSION_PURGE_BATCH_SIZE', 1000)
+    return get_store().purge(batch_size)
+
+
+def init_app(app):
+    app.extensions['sessions'] = {'store': None}
+    app.session_interface = ServerSideSessionInterface()
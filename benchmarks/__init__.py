@@ -0,0 +1,22 @@
+# In benchmarks/__init__.py
+#
+# Load tests and microbenchmarks for LibraNet. Run from the project root:
+#
+#   # In-process: a throw-away SQLite database filled with synthetic data,
+#   # every scenario through the Flask test client
+#   python -m benchmarks run --publications 5000 --students 1000 --save bench.json
+#   python -m benchmarks run --baseline bench.json          # exit 1 on regression
+#
+#   # Against a real database (SQLite file or MySQL): fill it, then measure
+#   python -m benchmarks generate --database mysql+pymysql://... --publications 50000
+#   python -m benchmarks run --database mysql+pymysql://... --no-generate
+#
+#   # Concurrent HTTP load against a running server that uses that database
+#   python -m benchmarks load http://localhost:8080 --database ... --workers 16 --duration 60
+#
+#   # Worker and CLI start-up time against a budget, with the heaviest imports
+#   python -m benchmarks startup --runs 9 --budget-ms 600 --baseline startup.json
+#
+# Reports give p50/p95/p99 latency, throughput and SQL statements per
+# request for every step. See datagen.py for the data, scenarios.py for the
+# scenarios, report.py for the baseline comparison.
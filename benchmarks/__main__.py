@@ -0,0 +1,197 @@
+# In benchmarks/__main__.py
+#
+# Command line: `python -m benchmarks {generate,run,load} --help`.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+from benchmarks import report
+
+
+def _config(database, overrides, testing=False):
+    """A Config subclass pointing at `database`, with KEY=VALUE overrides applied."""
+    from config import Config
+
+    settings = {'SQL_STATS_ENABLED': True, 'METRICS_ENABLED': False}
+    if database:
+        settings['SQLALCHEMY_DATABASE_URI'] = database
+    if testing:
+        settings.update(WTF_CSRF_ENABLED=False)
+    for item in overrides:
+        key, _, value = item.partition('=')
+        settings[key.strip()] = {'true': True, 'false': False}.get(value.lower(), value)
+    return type('BenchmarkConfig', (Config,), settings)
+
+
+def _make_app(args, testing=False):
+    from app import create_app
+    return create_app(_config(args.database, args.config, testing))
+
+
+def _generate(app, args):
+    from app import db
+    from benchmarks import datagen
+
+    with app.app_context():
+        db.create_all()  # no-op for tables that exist
+        return datagen.generate(
+            publications=args.publications, students=args.students,
+            loans_per_student=args.loans_per_student, seed=args.seed,
+            progress=lambda message: print(f"  generated {message}", file=sys.stderr),
+        )
+
+
+def _dataset(app):
+    from benchmarks import datagen
+
+    with app.app_context():
+        return datagen.existing_dataset()
+
+
+def _finish(recorder, args, **meta):
+    recorder.stop()
+    result = report.build_result(recorder.summary(), **meta)
+    print(report.format_table(result))
+    if args.save:
+        report.save(result, args.save)
+        print(f"Saved results to {args.save}")
+    if args.baseline:
+        regressions = report.compare(report.load(args.baseline), result, args.tolerance)
+        if regressions:
+            print(report.format_regressions(regressions))
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+def cmd_generate(args):
+    if not args.database:
+        print("generate needs --database (it adds rows to that database)", file=sys.stderr)
+        return 2
+    _generate(_make_app(args), args)
+    return 0
+
+
+def cmd_run(args):
+    from benchmarks import scenarios
+
+    tmpdir = None
+    if not args.database:
+        tmpdir = tempfile.mkdtemp(prefix='libranet-bench-')
+        args.database = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+        args.no_generate = False
+    app = _make_app(args, testing=True)
+    data = _dataset(app) if args.no_generate else _generate(app, args)
+
+    rng = random.Random(args.seed)
+    recorder = report.Recorder()
+    for name in args.scenario or list(scenarios.SCENARIOS):
+        print(f"Running {name}...", file=sys.stderr)
+        scenarios.run_scenario(app, scenarios.SCENARIOS[name], data, recorder, rng,
+                               iterations=args.iterations, warmup=args.warmup)
+    if tmpdir:
+        print(f"Benchmark database: {args.database}", file=sys.stderr)
+    return _finish(recorder, args, mode='in-process', database=args.database.split('://')[0],
+                   publications=args.publications, students=args.students, iterations=args.iterations)
+
+
+def cmd_load(args):
+    from benchmarks import http_load, scenarios
+
+    from benchmarks import datagen
+
+    app = _make_app(args)
+    data = _dataset(app)
+    rng = random.Random(args.seed)
+    recorder = report.Recorder()
+    for name in args.scenario or ['browse', 'search', 'account']:
+        print(f"Loading {args.url} with {name} ({args.workers} users, {args.duration}s)...", file=sys.stderr)
+        http_load.run_load(args.url, scenarios.SCENARIOS[name], data, recorder, rng,
+                           workers=args.workers, duration=args.duration)
+        if name == 'borrow':
+            # Once a user hits MAX_ACTIVE_LOANS the rest of the run measures the refusal path
+            with app.app_context():
+                datagen.reset_bench_students()
+    return _finish(recorder, args, mode='http', url=args.url, workers=args.workers, duration=args.duration)
+
+
+def cmd_startup(args):
+    from benchmarks import startup
+
+    recorder = report.Recorder()
+    print(f"Starting the app {args.runs} times...", file=sys.stderr)
+    startup.run_startup(recorder, runs=args.runs, cli=not args.no_cli)
+    print("Heaviest imports (cumulative ms):")
+    for ms, module in startup.heaviest_imports():
+        print(f"  {ms:8.1f}  {module}")
+    status = _finish(recorder, args, mode='startup', runs=args.runs)
+    p50 = recorder.summary()['steps']['startup.create_app']['p50_ms']
+    if args.budget_ms and p50 > args.budget_ms:
+        print(f"OVER BUDGET: create_app p50 {p50:.0f} ms > {args.budget_ms} ms")
+        return 1
+    return status
+
+
+def main(argv=None):
+    from benchmarks.scenarios import SCENARIOS
+
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="LibraNet load tests and microbenchmarks.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def common(p):
+        p.add_argument('--database', help="SQLAlchemy URI (default for run: a temporary SQLite file)")
+        p.add_argument('-c', '--config', action='append', default=[], metavar='KEY=VALUE',
+                       help="override an app setting, e.g. -c HTTP_CACHE_BACKEND=null")
+        p.add_argument('--seed', type=int, default=42)
+
+    def data_options(p):
+        p.add_argument('--publications', type=int, default=3000)
+        p.add_argument('--students', type=int, default=500)
+        p.add_argument('--loans-per-student', type=int, default=8)
+
+    def result_options(p, scenarios=True):
+        if scenarios:
+            p.add_argument('--scenario', action='append', choices=sorted(SCENARIOS))
+        p.add_argument('--save', metavar='FILE', help="write the results as JSON (a new baseline)")
+        p.add_argument('--baseline', metavar='FILE', help="compare against saved results; exit 1 on regression")
+        p.add_argument('--tolerance', type=float, default=0.2, help="allowed p95 growth (default 0.2 = 20%%)")
+
+    p = sub.add_parser('generate', help="add synthetic data to a database")
+    common(p)
+    data_options(p)
+    p.set_defaults(func=cmd_generate)
+
+    p = sub.add_parser('run', help="run scenarios in-process through the Flask test client")
+    common(p)
+    data_options(p)
+    result_options(p)
+    p.add_argument('--iterations', type=int, default=50)
+    p.add_argument('--warmup', type=int, default=5)
+    p.add_argument('--no-generate', action='store_true', help="use data already in --database")
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser('load', help="concurrent HTTP load against a running server")
+    common(p)
+    result_options(p)
+    p.add_argument('url')
+    p.add_argument('--workers', type=int, default=8)
+    p.add_argument('--duration', type=float, default=30, help="seconds per scenario")
+    p.set_defaults(func=cmd_load)
+
+    p = sub.add_parser('startup', help="time interpreter + create_app() and CLI start-up")
+    result_options(p, scenarios=False)
+    p.add_argument('--runs', type=int, default=7)
+    p.add_argument('--budget-ms', type=float, default=600,
+                   help="fail when create_app's median start-up is slower (0: no budget)")
+    p.add_argument('--no-cli', action='store_true', help="skip timing `flask sessions --help`")
+    p.set_defaults(func=cmd_startup)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,249 @@
+# In benchmarks/datagen.py
+#
+# Synthetic LibraNet data at any scale. Rows go in with Core executemany
+# INSERTs in chunks (PyMySQL folds them into multi-row INSERTs), with ids
+# assigned here so joined-table subtypes need no RETURNING round trip.
+# On SQLite the load runs with synchronous=OFF for speed.
+#
+# Every generated student has the password BENCH_PASSWORD; the first
+# BENCH_STUDENTS of them are on the MAX plan with no open loans, so the
+# scenarios can borrow with them.
+
+import random
+from collections import namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import delete, func, insert, select, text
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import FineStatusEnum, LoanStatusEnum, SubscriptionTierEnum
+from app.models.audiobook import Audiobook
+from app.models.bag_item import BagItem
+from app.models.ebook import Ebook
+from app.models.fine import Fine
+from app.models.loan import Loan
+from app.models.physical_book import PhysicalBook
+from app.models.publication import Publication
+from app.models.student import Student
+from app.models.subscription import Subscription
+
+BENCH_PASSWORD = 'benchmark-pass'
+BENCH_STUDENTS = 20
+EMAIL_DOMAIN = 'bench.example.com'  # email_validator rejects .test
+
+DatasetInfo = namedtuple('DatasetInfo', 'book_ids ebook_ids audiobook_ids student_ids student_emails search_terms')
+
+_WORDS = (
+    "algorithms data structures operating systems networks database design compiler "
+    "theory machine learning statistics calculus linear algebra physics chemistry "
+    "biology economics history philosophy literature poetry software engineering "
+    "distributed systems security cryptography graphics robotics signals circuits"
+).split()
+_NAMES = "Asha Ravi Meera Arjun Kavya Rohan Isha Vikram Neha Aditya Priya Karan Sneha Dev".split()
+_SURNAMES = "Sharma Verma Iyer Nair Gupta Rao Singh Das Menon Joshi Kapoor Bose".split()
+
+
+def _title(rng):
+    return ' '.join(w.capitalize() for w in rng.sample(_WORDS, rng.randint(2, 4)))
+
+
+def _person(rng):
+    return f"{rng.choice(_NAMES)} {rng.choice(_SURNAMES)}"
+
+
+def _next_id(model):
+    return (db.session.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def _insert(table, rows, chunk_size):
+    for start in range(0, len(rows), chunk_size):
+        db.session.execute(insert(table), rows[start:start + chunk_size])
+
+
+def generate(publications=3000, students=500, loans_per_student=8, seed=42, chunk_size=2000, progress=None):
+    """
+    Add `publications` items (about 60% physical books, 25% ebooks, 15%
+    audiobooks) and `students` students with loan, fine and subscription
+    history. Returns DatasetInfo describing what the scenarios can use.
+    """
+    rng = random.Random(seed)
+    progress = progress or (lambda message: None)
+    now = datetime.utcnow()
+
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(text('PRAGMA synchronous=OFF'))
+
+    # --- Publications ---
+    pub_rows, book_rows, ebook_rows, audio_rows = [], [], [], []
+    next_pub = _next_id(Publication)
+    for i in range(publications):
+        pub_id = next_pub + i
+        roll = rng.random()
+        kind = 'physical_book' if roll < 0.6 else 'ebook' if roll < 0.85 else 'audiobook'
+        title = _title(rng)
+        pub_rows.append({
+            'id': pub_id, 'type': kind, 'title': title, 'author': _person(rng),
+            'summary': f"An introduction to {title.lower()} for {rng.choice(_WORDS)} students.",
+            'image_url': None,
+        })
+        if kind == 'physical_book':
+            copies = rng.randint(1, 8)
+            book_rows.append({
+                'id': pub_id, 'isbn': f"BENCH{pub_id:010d}", 'total_copies': copies,
+                'available_copies': copies, 'related_courses': rng.choice(_WORDS).upper(),
+            })
+        elif kind == 'ebook':
+            ebook_rows.append({
+                'id': pub_id, 'file_path': f"bench/ebook-{pub_id}.pdf", 'file_format': 'PDF',
+                'file_size_mb': round(rng.uniform(0.5, 80), 1),
+            })
+        else:
+            audio_rows.append({
+                'id': pub_id, 'file_path': f"bench/audio-{pub_id}.mp3", 'file_format': 'MP3',
+                'file_size_mb': round(rng.uniform(20, 600), 1),
+                'duration_minutes': rng.randint(60, 1200), 'narrator': _person(rng),
+            })
+    _insert(Publication.__table__, pub_rows, chunk_size)
+    _insert(PhysicalBook.__table__, book_rows, chunk_size)
+    _insert(Ebook.__table__, ebook_rows, chunk_size)
+    _insert(Audiobook.__table__, audio_rows, chunk_size)
+    progress(f"{len(book_rows)} books, {len(ebook_rows)} ebooks, {len(audio_rows)} audiobooks")
+
+    # --- Students and subscriptions ---
+    password_hash = generate_password_hash(BENCH_PASSWORD)  # hashing is slow: once for all
+    next_student = _next_id(Student)
+    student_rows, sub_rows, emails = [], [], []
+    tiers = list(SubscriptionTierEnum)
+    for i in range(students):
+        student_id = next_student + i
+        email = f"student{student_id}@{EMAIL_DOMAIN}"
+        emails.append(email)
+        tier = SubscriptionTierEnum.MAX if i < BENCH_STUDENTS else rng.choice(tiers)
+        expires = now + timedelta(days=rng.randint(5, 180)) if tier != SubscriptionTierEnum.FREE else None
+        student_rows.append({
+            'id': student_id, 'roll_no': f"BENCH{student_id:08d}", 'name': _person(rng),
+            'email': email, 'phone': None, 'password_hash': password_hash,
+            'joined_at': now - timedelta(days=rng.randint(30, 900)), 'is_active': True,
+            'active_tier': tier, 'active_tier_expires_at': expires,
+        })
+        # A couple of lapsed plans, then the current one
+        for back in range(rng.randint(0, 2), 0, -1):
+            start = now - timedelta(days=180 * back)
+            sub_rows.append({
+                'student_id': student_id, 'tier': rng.choice(tiers[1:]), 'start_date': start,
+                'end_date': start + timedelta(days=90), 'is_active': False, 'price_paid': Decimal('199.00'),
+            })
+        if tier != SubscriptionTierEnum.FREE:
+            sub_rows.append({
+                'student_id': student_id, 'tier': tier, 'start_date': now - timedelta(days=10),
+                'end_date': expires, 'is_active': True, 'price_paid': Decimal('499.00'),
+            })
+    _insert(Student.__table__, student_rows, chunk_size)
+    _insert(Subscription.__table__, sub_rows, chunk_size)
+    progress(f"{len(student_rows)} students, {len(sub_rows)} subscriptions")
+
+    # --- Loans and fines (history only: bench students keep no open loans) ---
+    all_book_ids = [row['id'] for row in book_rows] or list(
+        db.session.scalars(select(PhysicalBook.id).limit(10000))
+    )
+    next_loan = _next_id(Loan)
+    loan_rows, fine_rows = [], []
+    open_per_book = {}
+    for i, student in enumerate(student_rows):
+        if not all_book_ids:
+            break
+        for _ in range(rng.randint(0, loans_per_student * 2)):
+            book_id = rng.choice(all_book_ids)
+            borrowed = now - timedelta(days=rng.randint(1, 400))
+            due = borrowed + timedelta(days=14)
+            returned = None
+            if i < BENCH_STUDENTS or rng.random() < 0.8:
+                returned = borrowed + timedelta(days=rng.randint(1, 30))
+                returned = min(returned, now)
+            elif open_per_book.get(book_id, 0) >= 1:
+                continue  # keep stock simple: at most one open loan per book
+            loan_id = next_loan + len(loan_rows)
+            status = LoanStatusEnum.RETURNED if returned else (
+                LoanStatusEnum.OVERDUE if due < now else LoanStatusEnum.BORROWED)
+            loan_rows.append({
+                'id': loan_id, 'student_id': student['id'], 'book_id': book_id,
+                'borrowed_date': borrowed, 'due_date': due, 'returned_date': returned, 'status': status,
+            })
+            if returned is None:
+                open_per_book[book_id] = open_per_book.get(book_id, 0) + 1
+            late_days = ((returned or now) - due).days
+            if late_days > 0:
+                paid = rng.random() < 0.5
+                amount = Decimal(min(late_days, 100) * 5)
+                fine_rows.append({
+                    'loan_id': loan_id, 'amount': amount, 'paid_amount': amount if paid else Decimal('0'),
+                    'status': FineStatusEnum.PAID if paid else FineStatusEnum.PENDING,
+                    'issued_date': due + timedelta(days=1),
+                })
+    _insert(Loan.__table__, loan_rows, chunk_size)
+    _insert(Fine.__table__, fine_rows, chunk_size)
+    # Open loans take a copy each
+    book_table = PhysicalBook.__table__
+    for book_id, taken in open_per_book.items():
+        db.session.execute(
+            book_table.update().where(book_table.c.id == book_id)
+            .values(available_copies=func.max(book_table.c.available_copies - taken, 0)
+                    if db.engine.dialect.name == 'sqlite'
+                    else func.greatest(book_table.c.available_copies - taken, 0))
+        )
+    db.session.commit()
+    progress(f"{len(loan_rows)} loans, {len(fine_rows)} fines")
+
+    # Bulk inserts bypass the session hooks that keep search and the page cache current.
+    from app.services import http_cache, search
+    search.rebuild()
+    http_cache.bump_catalog_version()
+
+    return DatasetInfo(
+        book_ids=[row['id'] for row in book_rows],
+        ebook_ids=[row['id'] for row in ebook_rows],
+        audiobook_ids=[row['id'] for row in audio_rows],
+        student_ids=[row['id'] for row in student_rows],
+        student_emails=emails[:BENCH_STUDENTS],
+        search_terms=rng.sample(_WORDS, 8),
+    )
+
+
+def existing_dataset(limit=1000):
+    """DatasetInfo for data generated earlier (e.g. before an HTTP run)."""
+    rng = random.Random(7)
+
+    def ids(model):
+        return list(db.session.scalars(select(model.id).order_by(model.id).limit(limit)))
+
+    emails = list(db.session.scalars(
+        select(Student.email).where(Student.email.like(f"%@{EMAIL_DOMAIN}")).order_by(Student.id).limit(BENCH_STUDENTS)
+    ))
+    return DatasetInfo(ids(PhysicalBook), ids(Ebook), ids(Audiobook), ids(Student), emails, rng.sample(_WORDS, 8))
+
+
+def reset_bench_students():
+    """
+    Undo what the borrowing scenario did: empty the benchmark students' bags,
+    delete their open loans and put the copies back on the shelf.
+    """
+    bench_ids = select(Student.id).where(Student.email.like(f"%@{EMAIL_DOMAIN}")).order_by(Student.id).limit(BENCH_STUDENTS)
+    bench_ids = list(db.session.scalars(bench_ids))
+    if not bench_ids:
+        return 0
+    open_loans = db.session.execute(
+        select(Loan.id, Loan.book_id).where(Loan.student_id.in_(bench_ids), Loan.returned_date.is_(None))
+    ).all()
+    book_table = PhysicalBook.__table__
+    for loan in open_loans:
+        db.session.execute(
+            book_table.update().where(book_table.c.id == loan.book_id)
+            .values(available_copies=book_table.c.available_copies + 1)
+        )
+    if open_loans:
+        db.session.execute(delete(Loan).where(Loan.id.in_([loan.id for loan in open_loans])))
+    db.session.execute(delete(BagItem).where(BagItem.student_id.in_(bench_ids)))
+    db.session.commit()
+    return len(open_loans)
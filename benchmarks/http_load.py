@@ -0,0 +1,119 @@
+# In benchmarks/http_load.py
+#
+# Concurrent HTTP load against a running LibraNet (gunicorn, the dev server,
+# a staging box...). Each worker thread is one virtual user with its own
+# cookie jar: it logs in first when the scenario needs it (taking the
+# csrf_token from the login form), then repeats the scenario's steps until
+# the time is up. Redirects are not followed, so every sample is a single
+# request, as in the in-process runner.
+#
+# Queries per request come from the Server-Timing header, so start the
+# server with SQL_STATS_SERVER_TIMING=1 (or in debug mode) to get them.
+#
+# Standard library only (urllib + threads): the client is rarely the
+# bottleneck for a Flask app, but keep an eye on its CPU at high worker
+# counts all the same.
+
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+
+from benchmarks import datagen
+
+_CSRF_RE = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+_QUERIES_RE = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class VirtualUser:
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect()
+        )
+        self.csrf_token = None
+
+    def request(self, method, path, data=None):
+        """Send one request; returns (status, body, headers)."""
+        body = None
+        if method == 'POST':
+            form = dict(data or {})
+            if self.csrf_token:
+                form.setdefault('csrf_token', self.csrf_token)
+            body = urllib.parse.urlencode(form).encode()
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                return response.status, response.read(), response.headers
+        except urllib.error.HTTPError as e:  # 3xx (not followed) and 4xx/5xx
+            return e.code, e.read(), e.headers
+
+    def fetch_csrf_token(self):
+        status, body, _ = self.request('GET', '/login')
+        match = _CSRF_RE.search(body.decode('utf-8', 'replace'))
+        self.csrf_token = match.group(1) if match else None
+
+    def log_in(self, email):
+        self.fetch_csrf_token()
+        status, _, headers = self.request('POST', '/login', {'email': email, 'password': datagen.BENCH_PASSWORD})
+        if status != 302 or '/login' in (headers.get('Location') or ''):
+            raise RuntimeError(f"Could not log in as {email} (HTTP {status})")
+
+
+def _queries(headers):
+    match = _QUERIES_RE.search(headers.get('Server-Timing') or '')
+    return int(match.group(1)) if match else None
+
+
+def _worker(base_url, scenario, data, recorder, rng, email, deadline, stop):
+    user = VirtualUser(base_url)
+    if scenario.login:
+        user.log_in(email)
+    elif scenario.name == 'login':
+        user.fetch_csrf_token()
+    while time.monotonic() < deadline and not stop.is_set():
+        for step in scenario.build(data, rng, email):
+            if step.label == 'login_form':
+                start = time.perf_counter()
+                user.fetch_csrf_token()  # the form GET, keeping its token for the POST
+                recorder.add(f"{scenario.name}.{step.label}", time.perf_counter() - start)
+                continue
+            start = time.perf_counter()
+            try:
+                status, _, headers = user.request(step.method, step.path, step.data)
+            except OSError:
+                recorder.add(f"{scenario.name}.{step.label}", time.perf_counter() - start, ok=False)
+                continue
+            recorder.add(f"{scenario.name}.{step.label}", time.perf_counter() - start,
+                         _queries(headers), status < 400)
+
+
+def run_load(base_url, scenario, data, recorder, rng, workers=8, duration=30):
+    """Drive `scenario` with `workers` concurrent users for `duration` seconds."""
+    if not data.student_emails:
+        raise RuntimeError("No benchmark students found; run `python -m benchmarks generate` first")
+    deadline = time.monotonic() + duration
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bench') as pool:
+        futures = [
+            pool.submit(_worker, base_url, scenario, data, recorder,
+                        type(rng)(rng.random()), data.student_emails[i % len(data.student_emails)],
+                        deadline, stop)
+            for i in range(workers)
+        ]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            stop.set()
+            raise
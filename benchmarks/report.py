@@ -0,0 +1,147 @@
+# In benchmarks/report.py
+#
+# Collects per-request samples (latency, SQL statement count, success),
+# summarises them per step label (p50/p95/p99 latency, throughput, queries
+# per request) and compares a run against a saved JSON baseline.
+#
+# A step regresses when its p95 grows by more than the tolerance (20% by
+# default) or it runs more queries per request than in the baseline. Query
+# counts are deterministic, so any increase there is a real change;
+# latency needs the slack because it is noisy.
+
+import json
+import math
+import platform
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime
+
+Regression = namedtuple('Regression', 'label metric baseline current')
+
+# Steps whose p95 is below this are too fast to compare reliably.
+_MIN_COMPARABLE_MS = 2.0
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+class Recorder:
+    """Thread-safe collector of request samples, grouped by step label."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(list)  # seconds
+        self._queries = defaultdict(list)
+        self._errors = defaultdict(int)
+        self._windows = {}  # label -> [first start, last finish], for per-step throughput
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def add(self, label, seconds, queries=None, ok=True):
+        now = time.perf_counter()
+        with self._lock:
+            window = self._windows.setdefault(label, [now - seconds, now])
+            window[1] = now
+            self._latencies[label].append(seconds)
+            if queries is not None:
+                self._queries[label].append(queries)
+            if not ok:
+                self._errors[label] += 1
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def wall_seconds(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def summary(self):
+        wall = self.wall_seconds
+        steps = {}
+        with self._lock:
+            for label, latencies in sorted(self._latencies.items()):
+                ordered = sorted(latencies)
+                queries = self._queries.get(label)
+                first, last = self._windows[label]
+                steps[label] = {
+                    'requests': len(ordered),
+                    'errors': self._errors.get(label, 0),
+                    'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+                    'p50_ms': round(percentile(ordered, 50) * 1000, 3),
+                    'p95_ms': round(percentile(ordered, 95) * 1000, 3),
+                    'p99_ms': round(percentile(ordered, 99) * 1000, 3),
+                    'rps': round(len(ordered) / (last - first), 2) if last > first else None,
+                    'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+                }
+            total = sum(len(v) for v in self._latencies.values())
+        return {
+            'steps': steps,
+            'total_requests': total,
+            'total_errors': sum(s['errors'] for s in steps.values()),
+            'wall_seconds': round(wall, 3),
+            'throughput_rps': round(total / wall, 2) if wall else None,
+        }
+
+
+def build_result(summary, **meta):
+    return dict(summary, meta=dict(
+        meta,
+        recorded_at=datetime.utcnow().isoformat(timespec='seconds'),
+        python=platform.python_version(),
+        machine=platform.machine(),
+    ))
+
+
+def save(result, path):
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, current, tolerance=0.2):
+    """Regressions of `current` against `baseline` (both results as saved)."""
+    regressions = []
+    for label, now in current['steps'].items():
+        before = baseline['steps'].get(label)
+        if before is None:
+            continue
+        if (before.get('queries_per_request') is not None and now.get('queries_per_request') is not None
+                and now['queries_per_request'] > before['queries_per_request']):
+            regressions.append(Regression(label, 'queries_per_request',
+                                          before['queries_per_request'], now['queries_per_request']))
+        if (max(before['p95_ms'], now['p95_ms']) >= _MIN_COMPARABLE_MS
+                and now['p95_ms'] > before['p95_ms'] * (1 + tolerance)):
+            regressions.append(Regression(label, 'p95_ms', before['p95_ms'], now['p95_ms']))
+    return regressions
+
+
+def format_table(result):
+    header = f"{'step':<34} {'reqs':>6} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'rps':>8} {'q/req':>6}"
+    lines = [header, '-' * len(header)]
+    for label, s in result['steps'].items():
+        queries = '-' if s['queries_per_request'] is None else f"{s['queries_per_request']:g}"
+        lines.append(
+            f"{label[:34]:<34} {s['requests']:>6} {s['errors']:>4} {s['p50_ms']:>8.2f} "
+            f"{s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f} {s['rps'] or 0:>8.1f} {queries:>6}"
+        )
+    lines.append('-' * len(header))
+    lines.append(f"{result['total_requests']} requests, {result['total_errors']} errors in "
+                 f"{result['wall_seconds']}s ({result['throughput_rps']} req/s)")
+    return '\n'.join(lines)
+
+
+def format_regressions(regressions):
+    return '\n'.join(
+        f"REGRESSION {r.label}: {r.metric} {r.baseline} -> {r.current}" for r in regressions
+    )
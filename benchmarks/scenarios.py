@@ -0,0 +1,127 @@
+# In benchmarks/scenarios.py
+#
+# What a benchmark run does. A scenario is a list of steps (method, path,
+# form data, label) built fresh for every iteration from the generated
+# dataset, so the same definitions drive both the in-process runner below
+# (Flask test client, SQL statements counted with query_stats.capture())
+# and the HTTP load driver in http_load.py.
+#
+#   browse   anonymous catalog pages, list and detail, all three formats
+#   search   anonymous full-text searches
+#   login    login form and POST, then logout
+#   borrow   add two books to the bag, view it, borrow, view loans
+#   account  my loans, dues, profile and subscription pages
+#   admin    admin listings and a student's detail page
+#
+# Scenarios marked `login` run as one of the benchmark students (see
+# datagen.BENCH_PASSWORD); logging in is not measured there.
+
+import time
+from collections import namedtuple
+
+from app.services import query_stats
+
+from benchmarks import datagen
+
+Step = namedtuple('Step', 'method path data label')
+Scenario = namedtuple('Scenario', 'name login build')
+
+
+def _get(path, label):
+    return Step('GET', path, None, label)
+
+
+def _post(path, label, data=None):
+    return Step('POST', path, data or {}, label)
+
+
+def _browse(data, rng, email):
+    steps = [_get('/', 'landing'), _get('/books', 'books'), _get('/ebooks', 'ebooks'),
+             _get('/audiobooks', 'audiobooks'), _get('/catalog', 'catalog')]
+    if data.book_ids:
+        steps.append(_get(f"/book/{rng.choice(data.book_ids)}", 'book_detail'))
+    if data.ebook_ids:
+        steps.append(_get(f"/ebook/{rng.choice(data.ebook_ids)}", 'ebook_detail'))
+    if data.audiobook_ids:
+        steps.append(_get(f"/audiobook/{rng.choice(data.audiobook_ids)}", 'audiobook_detail'))
+    return steps
+
+
+def _search(data, rng, email):
+    term = rng.choice(data.search_terms)
+    return [_get(f"/catalog?q={term}", 'catalog_search'), _get(f"/books?q={term}", 'books_search'),
+            _get(f"/ebooks?q={term}", 'ebooks_search')]
+
+
+def _login(data, rng, email):
+    return [_get('/login', 'login_form'),
+            _post('/login', 'login', {'email': email, 'password': datagen.BENCH_PASSWORD}),
+            _get('/logout', 'logout')]
+
+
+def _borrow(data, rng, email):
+    books = rng.sample(data.book_ids, min(2, len(data.book_ids)))
+    return ([_post(f"/add_to_bag/{book_id}", 'add_to_bag') for book_id in books]
+            + [_get('/my_bag', 'my_bag'), _post('/borrow', 'borrow'), _get('/my-loans', 'my_loans')])
+
+
+def _account(data, rng, email):
+    return [_get('/my-loans', 'my_loans'), _get('/dues', 'dues'), _get('/profile', 'profile'),
+            _get('/my-subscription', 'my_subscription')]
+
+
+def _admin(data, rng, email):
+    # (the ebook and audiobook admin lists have no templates yet)
+    return [_get('/admin/books', 'admin_books'), _get('/admin/students', 'admin_students'),
+            _get(f"/admin/student/{rng.choice(data.student_ids)}", 'admin_student_detail')]
+
+
+SCENARIOS = {s.name: s for s in (
+    Scenario('browse', False, _browse),
+    Scenario('search', False, _search),
+    Scenario('login', False, _login),
+    Scenario('borrow', True, _borrow),
+    Scenario('account', True, _account),
+    Scenario('admin', True, _admin),
+)}
+
+
+# --- In-process runner ----------------------------------------------------
+
+def _send(client, step):
+    if step.method == 'GET':
+        return client.get(step.path)
+    return client.post(step.path, data=step.data)
+
+
+def log_in(client, email):
+    response = client.post('/login', data={'email': email, 'password': datagen.BENCH_PASSWORD})
+    if response.status_code != 302 or '/login' in response.headers.get('Location', ''):
+        raise RuntimeError(f"Could not log in as {email}; was the data made by benchmarks.datagen?")
+
+
+def run_scenario(app, scenario, data, recorder, rng, iterations=50, warmup=5):
+    """
+    Run `scenario` `warmup + iterations` times through the test client,
+    recording every step of the measured iterations as '<scenario>.<label>'.
+    """
+    if not data.student_emails:
+        raise RuntimeError("No benchmark students found; run `python -m benchmarks generate` first")
+    client = app.test_client()
+    email = rng.choice(data.student_emails)
+    if scenario.login:
+        log_in(client, email)
+
+    for i in range(warmup + iterations):
+        measured = i >= warmup
+        for step in scenario.build(data, rng, email):
+            with query_stats.capture() as seen:
+                start = time.perf_counter()
+                response = _send(client, step)
+                elapsed = time.perf_counter() - start
+            if measured:
+                recorder.add(f"{scenario.name}.{step.label}", elapsed,
+                             seen[-1].count if seen else None, response.status_code < 400)
+        if scenario.name == 'borrow':
+            with app.app_context():
+                datagen.reset_bench_students()
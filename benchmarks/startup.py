@@ -0,0 +1,66 @@
+# In benchmarks/startup.py
+#
+# Startup cost: how long a fresh interpreter takes to import the app and run
+# create_app() (what every gunicorn worker pays), and how long a flask CLI
+# command takes to start. Each sample is a new process. One extra
+# `python -X importtime` run lists the heaviest imports, which is where to
+# look when the budget is blown.
+
+import os
+import re
+import subprocess
+import sys
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+
+_CREATE_APP = (
+    "import time; start = time.perf_counter()\n"
+    "from app import create_app\n"
+    "create_app()\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+
+def _env(cli=False):
+    env = dict(os.environ)
+    env.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite://')
+    env.pop('FLASK_RUN_FROM_CLI', None)
+    if cli:
+        env['FLASK_APP'] = 'main.py'
+    return env
+
+
+def time_create_app():
+    """Seconds from the first import to a ready app, in a new interpreter."""
+    out = subprocess.run([sys.executable, '-c', _CREATE_APP], cwd=_ROOT, env=_env(),
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def time_cli():
+    """Wall-clock seconds for `flask sessions --help`: interpreter, app and CLI start-up."""
+    import time
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-m', 'flask', 'sessions', '--help'], cwd=_ROOT, env=_env(cli=True),
+                   capture_output=True, check=True)
+    return time.perf_counter() - start
+
+
+def heaviest_imports(limit=15):
+    """(cumulative ms, module) for the top-level imports that cost the most."""
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', _CREATE_APP], cwd=_ROOT, env=_env(),
+                         capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match and len(match.group(3)) <= 3:  # the app and what it imports itself
+            rows.append((int(match.group(2)) / 1000, match.group(4)))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def run_startup(recorder, runs=7, cli=True):
+    for _ in range(runs):
+        recorder.add('startup.create_app', time_create_app())
+        if cli:
+            recorder.add('startup.cli', time_cli())
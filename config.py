@@ -1,6 +1,8 @@
 # config.py
 
 import os
+from datetime import timedelta
+from decimal import Decimal
 from dotenv import load_dotenv
 
 # Find the .env file in the root directory and load its variables
@@ -24,7 +26,7 @@ class Config:
     # This is a Flask-SQLAlchemy configuration setting that we can disable
     # to save resources, as we are not using the event system.
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    RAZORPAY_KEY_ID = os.environ.get('RAZORPAY_KEY_ID')
+    RAZORPAY_KEY_ID = os.environ.get('RAZORPAY_KEY_ID', 'rzp_test_YOUR_KEY_ID')
     RAZORPAY_KEY_SECRET = os.environ.get('RAZORPAY_KEY_SECRET') or 'YOUR_KEY_SECRET'
 
     MAIL_SERVER = 'smtp.gmail.com'
@@ -34,4 +36,141 @@ class Config:
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')  
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_USERNAME')
 
-    OTP_EXPIRY_MINUTES = 10
\ No newline at end of file
+    OTP_EXPIRY_MINUTES = 10
+    OTP_MAX_ATTEMPTS = 3
+    # Where OTPs are kept: 'sql' (otp table), 'memory' (single process) or 'redis'
+    OTP_BACKEND = os.environ.get('OTP_BACKEND', 'sql')
+    OTP_REDIS_URL = os.environ.get('OTP_REDIS_URL', 'redis://localhost:6379/0')
+    # Rows deleted per transaction by `flask otp purge`
+    OTP_PURGE_BATCH_SIZE = 1000
+
+    # Catalog full-text search: 'auto', 'memory', 'sqlite' (FTS5) or 'mysql'
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')
+    SEARCH_MAX_RESULTS = 200
+    # The in-process ('memory') index is rebuilt this often (seconds) so
+    # that each worker picks up catalog changes made by other workers.
+    SEARCH_INDEX_REFRESH_SECONDS = 300
+
+    # Listing page sizes (overridable per request with ?per_page=, up to MAX_PAGE_SIZE)
+    CATALOG_PAGE_SIZE = int(os.environ.get('CATALOG_PAGE_SIZE', 24))
+    ADMIN_PAGE_SIZE = int(os.environ.get('ADMIN_PAGE_SIZE', 50))
+    MAX_PAGE_SIZE = 100
+
+    # Overdue fines, applied by the `flask fines accrue` job
+    FINE_RATE_PER_WEEK = Decimal(os.environ.get('FINE_RATE_PER_WEEK', '500.00'))
+    FINE_ACCRUAL_BATCH_SIZE = 5000
+
+    # Most physical books a student may have on loan at once
+    MAX_ACTIVE_LOANS = 5
+
+    # Outbound email outbox, drained by `flask mail worker`
+    MAIL_OUTBOX_BATCH_SIZE = 50
+    MAIL_OUTBOX_POLL_SECONDS = 2
+    MAIL_OUTBOX_MAX_ATTEMPTS = 5
+    MAIL_OUTBOX_RETRY_BASE_SECONDS = 30
+    MAIL_OUTBOX_RETRY_MAX_SECONDS = 3600
+    # How long a worker may hold claimed emails before others retry them
+    MAIL_OUTBOX_LEASE_SECONDS = 300
+    # Also deliver from a background thread right after enqueueing (development)
+    MAIL_OUTBOX_DELIVER_INLINE = os.environ.get('MAIL_OUTBOX_DELIVER_INLINE', '').lower() in ('1', 'true', 'yes')
+    # Sent and failed emails are deleted this long after creation by `flask mail purge`
+    MAIL_OUTBOX_RETENTION_DAYS = int(os.environ.get('MAIL_OUTBOX_RETENTION_DAYS', 30))
+    MAIL_OUTBOX_PURGE_BATCH_SIZE = 1000
+
+    # CSV rows per transaction for `flask catalog import`
+    IMPORT_CHUNK_SIZE = 1000
+
+    # Rows fetched per round trip by the streaming admin exports
+    EXPORT_YIELD_PER = 1000
+
+    # Ebook/audiobook files; Ebook.file_path and Audiobook.file_path are relative to this
+    MEDIA_ROOT = os.environ.get('MEDIA_ROOT', os.path.join(basedir, 'media'))
+    # Hand file transfer to the front proxy: '' (Flask sends), 'nginx' or 'sendfile'
+    MEDIA_ACCEL = os.environ.get('MEDIA_ACCEL', '')
+    # nginx `internal` location that aliases MEDIA_ROOT (used with MEDIA_ACCEL='nginx')
+    MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+    MEDIA_MAX_AGE = 3600
+
+    # Spacing of seek points in the audiobook segment index
+    AUDIO_INDEX_INTERVAL_SECONDS = 10
+
+    # Page-at-a-time ebook reader: extracted pages cache and read-ahead
+    EBOOK_PAGE_CACHE_DIR = os.environ.get('EBOOK_PAGE_CACHE_DIR')  # default: <instance>/page_cache
+    EBOOK_PAGE_CACHE_MAX_MB = 512
+    EBOOK_PREFETCH_PAGES = 3
+
+    # Page cache for anonymous catalog browsing: filesystem, redis, memory or null.
+    # 'memory' is per process: only use it with a single-process server.
+    HTTP_CACHE_BACKEND = os.environ.get('HTTP_CACHE_BACKEND', 'filesystem')
+    HTTP_CACHE_DIR = os.environ.get('HTTP_CACHE_DIR')  # default: <instance>/http_cache
+    HTTP_CACHE_REDIS_URL = os.environ.get('HTTP_CACHE_REDIS_URL', 'redis://localhost:6379/1')
+    HTTP_CACHE_MAX_ENTRIES = 1000
+    # Longest the server keeps a page even if the catalog does not change
+    HTTP_CACHE_TTL = 600
+
+    # Server-side sessions (the cookie holds only an id): sql, filesystem or redis
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'sql')
+    SESSION_DIR = os.environ.get('SESSION_DIR')  # default: <instance>/sessions
+    SESSION_REDIS_URL = os.environ.get('SESSION_REDIS_URL', 'redis://localhost:6379/2')
+    # Sessions expire this long after their last use
+    PERMANENT_SESSION_LIFETIME = timedelta(days=14)
+    # Rewrite an unchanged session's expiry at most this often
+    SESSION_TOUCH_SECONDS = 300
+    SESSION_PURGE_BATCH_SIZE = 1000
+
+    # Per-request SQL statistics (app.services.query_stats)
+    SQL_STATS_ENABLED = True
+    # Same SELECT shape more than this many times in one request -> N+1 warning
+    SQL_N_PLUS_ONE_THRESHOLD = 5
+    # Server-Timing header with DB time and query count; None follows DEBUG
+    SQL_STATS_SERVER_TIMING = None
+    # Log a JSON summary line for every request, not just suspected N+1s
+    SQL_STATS_LOG = os.environ.get('SQL_STATS_LOG', '').lower() in ('1', 'true', 'yes')
+
+    # Prometheus metrics at /metrics (needs prometheus_client). With several
+    # worker processes also set PROMETHEUS_MULTIPROC_DIR in the environment.
+    METRICS_ENABLED = True
+    # If set, scrapers must send "Authorization: Bearer <token>"
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # Connection pool settings, used for the primary and every read replica.
+    # pool_size/max_overflow only apply to pooled engines (MySQL, SQLite files).
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1').lower() in ('1', 'true', 'yes'),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 280)),  # below MySQL's wait_timeout
+        **({'pool_size': int(os.environ['DB_POOL_SIZE'])} if os.environ.get('DB_POOL_SIZE') else {}),
+        **({'max_overflow': int(os.environ['DB_MAX_OVERFLOW'])} if os.environ.get('DB_MAX_OVERFLOW') else {}),
+    }
+
+    # Read replicas for @replica_reads views (app.services.db_routing): comma-separated URIs
+    SQLALCHEMY_REPLICA_URIS = os.environ.get('SQLALCHEMY_REPLICA_URIS', '')
+    REPLICA_HEALTH_CHECK_SECONDS = 10
+    # After a request writes, that session reads from the primary for this long
+    REPLICA_STICKY_SECONDS = 5
+
+    # Compiled Jinja templates cached on disk and shared by all workers
+    JINJA_BYTECODE_CACHE = True
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')  # default: <instance>/jinja_cache
+
+    # Razorpay gateway calls (app.services.payments). RAZORPAY_API_URL
+    # overrides https://api.razorpay.com, e.g. for a local stand-in.
+    RAZORPAY_API_URL = os.environ.get('RAZORPAY_API_URL')
+    PAYMENT_CONNECT_TIMEOUT = 3
+    PAYMENT_READ_TIMEOUT = 5
+    # Tries per call on timeouts and 5xx, with jittered exponential backoff
+    PAYMENT_MAX_ATTEMPTS = 3
+    PAYMENT_RETRY_BASE_SECONDS = 0.25
+    PAYMENT_RETRY_MAX_SECONDS = 2
+    # Fail fast for PAYMENT_BREAKER_RESET_SECONDS after this many failures in a row
+    PAYMENT_BREAKER_FAILURES = 5
+    PAYMENT_BREAKER_RESET_SECONDS = 30
+    # Gateway calls in flight per worker process, and how long a request waits
+    PAYMENT_WORKERS = 8
+    PAYMENT_VERIFY_WAIT_SECONDS = 8
+    # `flask payments reconcile`: first retry after the delay, doubling up to
+    # the max; after PAYMENT_RECONCILE_MAX_ATTEMPTS the payment is marked failed
+    PAYMENT_RECONCILE_DELAY_SECONDS = 60
+    PAYMENT_RECONCILE_MAX_DELAY_SECONDS = 3600
+    PAYMENT_RECONCILE_MAX_ATTEMPTS = 12
+    PAYMENT_RECONCILE_BATCH_SIZE = 50
+    PAYMENT_RECONCILE_LEASE_SECONDS = 120
@@ -2,6 +2,7 @@
 from app import create_app, db
 from sqlalchemy import text
 from seeds_book import seed_books_from_csv
+from app.services import search
 
 app = create_app()
 
@@ -20,4 +21,8 @@ with app.app_context():
     db.create_all()
     print("✅ Database reset complete.")
 
-    seed_books_from_csv("books.csv")
\ No newline at end of file
+    seed_books_from_csv("books.csv")
+
+    # drop_all() does not know about the search index tables; rebuild them
+    search.rebuild()
+    print("✅ Search index rebuilt.")
\ No newline at end of file
@@ -0,0 +1,46 @@
+"""Add composite (email, is_used, created_at) index to otp
+
+Revision ID: 3f8a62c7d915
+Revises: 7b3e9d41a0c5
+Create Date: 2026-10-18 12:31:09.845120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f8a62c7d915'
+down_revision = '7b3e9d41a0c5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table('otp'):
+        # Databases built only from migrations never got the otp table.
+        op.create_table('otp',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(length=150), nullable=False),
+        sa.Column('otp_code', sa.String(length=6), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('is_used', sa.Boolean(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('otp', schema=None) as batch_op:
+            batch_op.create_index('ix_otp_email_is_used_created_at', ['email', 'is_used', 'created_at'], unique=False)
+        return
+
+    # The composite index leads with email, so it replaces the single-column one.
+    with op.batch_alter_table('otp', schema=None) as batch_op:
+        batch_op.create_index('ix_otp_email_is_used_created_at', ['email', 'is_used', 'created_at'], unique=False)
+        batch_op.drop_index('ix_otp_email')
+
+
+def downgrade():
+    with op.batch_alter_table('otp', schema=None) as batch_op:
+        batch_op.create_index('ix_otp_email', ['email'], unique=False)
+        batch_op.drop_index('ix_otp_email_is_used_created_at')
@@ -0,0 +1,37 @@
+"""Add audiobook_segment_index table
+
+Revision ID: 5d07b2e8c461
+Revises: a4c19e5b7d28
+Create Date: 2026-10-18 15:22:10.604387
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d07b2e8c461'
+down_revision = 'a4c19e5b7d28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('audiobook_segment_index',
+    sa.Column('audiobook_id', sa.Integer(), nullable=False),
+    sa.Column('container', sa.String(length=10), nullable=False),
+    sa.Column('file_size', sa.BigInteger(), nullable=False),
+    sa.Column('file_mtime', sa.Float(), nullable=False),
+    sa.Column('duration_ms', sa.BigInteger(), nullable=False),
+    sa.Column('data_start', sa.BigInteger(), nullable=False),
+    sa.Column('data_end', sa.BigInteger(), nullable=False),
+    sa.Column('points_json', sa.Text(), nullable=False),
+    sa.Column('chapters_json', sa.Text(), nullable=False),
+    sa.Column('indexed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['audiobook_id'], ['audiobook.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('audiobook_id')
+    )
+
+
+def downgrade():
+    op.drop_table('audiobook_segment_index')
@@ -0,0 +1,36 @@
+"""Add hot-path loan and subscription indexes
+
+Revision ID: a4c19e5b7d28
+Revises: 3f8a62c7d915
+Create Date: 2026-10-18 13:47:52.301664
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c19e5b7d28'
+down_revision = '3f8a62c7d915'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('loan', schema=None) as batch_op:
+        batch_op.create_index('ix_loan_student_id_returned_date_book_id', ['student_id', 'returned_date', 'book_id'], unique=False)
+
+    if sa.inspect(op.get_bind()).has_table('subscription'):
+        with op.batch_alter_table('subscription', schema=None) as batch_op:
+            batch_op.create_index('ix_subscription_student_id_is_active_start_date', ['student_id', 'is_active', 'start_date'], unique=False)
+            batch_op.create_index('ix_subscription_student_id_start_date', ['student_id', 'start_date'], unique=False)
+
+
+def downgrade():
+    if sa.inspect(op.get_bind()).has_table('subscription'):
+        with op.batch_alter_table('subscription', schema=None) as batch_op:
+            batch_op.drop_index('ix_subscription_student_id_start_date')
+            batch_op.drop_index('ix_subscription_student_id_is_active_start_date')
+
+    with op.batch_alter_table('loan', schema=None) as batch_op:
+        batch_op.drop_index('ix_loan_student_id_returned_date_book_id')
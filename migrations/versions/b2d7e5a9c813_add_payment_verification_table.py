@@ -0,0 +1,49 @@
+"""Add payment_verification table
+
+Revision ID: b2d7e5a9c813
+Revises: 8c2f4a6d1e37
+Create Date: 2026-10-18 16:42:09.217340
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d7e5a9c813'
+down_revision = '8c2f4a6d1e37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('payment_verification',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('payment_id', sa.String(length=64), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=False),
+    sa.Column('tier', sa.Enum('FREE', 'BASIC', 'PRO', 'MAX', name='subscriptiontierenum'), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('duration_days', sa.Integer(), nullable=False),
+    sa.Column('status', sa.Enum('PENDING', 'COMPLETED', 'FAILED', name='paymentstatusenum'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('resolved_at', sa.DateTime(), nullable=True),
+    sa.Column('subscription_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['student_id'], ['student.id'], ),
+    sa.ForeignKeyConstraint(['subscription_id'], ['subscription.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('payment_id')
+    )
+    with op.batch_alter_table('payment_verification', schema=None) as batch_op:
+        batch_op.create_index('ix_payment_verification_status_next_attempt_at', ['status', 'next_attempt_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_payment_verification_student_id'), ['student_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('payment_verification', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_payment_verification_student_id'))
+        batch_op.drop_index('ix_payment_verification_status_next_attempt_at')
+
+    op.drop_table('payment_verification')
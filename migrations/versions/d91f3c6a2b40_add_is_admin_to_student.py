@@ -0,0 +1,27 @@
+"""Add is_admin to student
+
+Revision ID: d91f3c6a2b40
+Revises: b2d7e5a9c813
+Create Date: 2026-10-18 18:05:31.402716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd91f3c6a2b40'
+down_revision = 'b2d7e5a9c813'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Nobody is an admin until granted with `flask admin grant <email>`.
+    with op.batch_alter_table('student', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('is_admin', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('student', schema=None) as batch_op:
+        batch_op.drop_column('is_admin')
@@ -0,0 +1,56 @@
+"""Add denormalised active_tier to student
+
+Revision ID: e6dbcf08f2c1
+Revises: c565fb87c0c8
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6dbcf08f2c1'
+down_revision = 'c565fb87c0c8'
+branch_labels = None
+depends_on = None
+
+
+tier_enum = sa.Enum('FREE', 'BASIC', 'PRO', 'MAX', name='subscriptiontierenum')
+
+
+def upgrade():
+    with op.batch_alter_table('student', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('active_tier', tier_enum, server_default='FREE', nullable=False))
+        batch_op.add_column(sa.Column('active_tier_expires_at', sa.DateTime(), nullable=True))
+
+    # Backfill from the latest active, unexpired subscription of each student.
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table('subscription'):
+        return
+
+    current = """
+        FROM subscription s
+        WHERE s.student_id = student.id
+          AND s.is_active = :active
+          AND (s.end_date IS NULL OR s.end_date > :now)
+        ORDER BY s.start_date DESC
+        LIMIT 1
+    """
+    bind.execute(
+        sa.text(f"""
+            UPDATE student
+            SET active_tier = (SELECT s.tier {current}),
+                active_tier_expires_at = (SELECT s.end_date {current})
+            WHERE EXISTS (SELECT 1 {current})
+        """),
+        {'active': True, 'now': datetime.utcnow()}
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('student', schema=None) as batch_op:
+        batch_op.drop_column('active_tier_expires_at')
+        batch_op.drop_column('active_tier')
@@ -0,0 +1,110 @@
+# In tests/conftest.py
+#
+# Shared fixtures. Every test gets a fresh app on its own SQLite file, so
+# several connections (threads) can use the same database the way
+# gunicorn workers share MySQL. Run with `python -m pytest` from the
+# project root (see requirements-dev.txt); stand-in servers and query
+# budgets are in tests/helpers.py.
+
+import pytest
+
+from app import create_app, db
+from app.models.student import Student
+from config import Config
+from tests.helpers import check_query_budget
+
+STUDENT_EMAIL = 'student@example.com'
+STUDENT_PASSWORD = 'password1'
+ADMIN_EMAIL = 'librarian@example.com'
+
+
+class TestConfig(Config):
+    TESTING = True
+    SECRET_KEY = 'test'
+    WTF_CSRF_ENABLED = False
+    # Threads wait for SQLite's write lock instead of failing at once
+    SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 30}}
+    SQLALCHEMY_REPLICA_URIS = ''
+    JINJA_BYTECODE_CACHE = False
+    HTTP_CACHE_BACKEND = 'null'
+    SESSION_BACKEND = 'sql'
+    OTP_BACKEND = 'sql'
+    SEARCH_BACKEND = 'memory'
+    # Metrics are process-wide, so samples would pile up across tests;
+    # test_metrics.py turns them on
+    METRICS_ENABLED = False
+    MAIL_OUTBOX_DELIVER_INLINE = False
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build the test app with extra settings, e.g. make_app(METRICS_ENABLED=True)."""
+    apps = []
+
+    def make(**settings):
+        attrs = {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+            'MEDIA_ROOT': str(tmp_path / 'media'),
+            'EBOOK_PAGE_CACHE_DIR': str(tmp_path / 'page_cache'),
+            **settings,
+        }
+        app = create_app(type('Settings', (TestConfig,), attrs))
+        with app.app_context():
+            db.create_all()
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+        for replica in app.extensions['db_routing']['replicas']:
+            replica.engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def student(app):
+    """Id of a registered student on the free plan."""
+    with app.app_context():
+        student = Student(name='Test Student', email=STUDENT_EMAIL, roll_no='T0001')
+        student.set_password(STUDENT_PASSWORD)
+        db.session.add(student)
+        db.session.commit()
+        return student.id
+
+
+def _login(app, email, password):
+    client = app.test_client()
+    response = client.post('/login', data={'email': email, 'password': password})
+    assert response.status_code == 302, "login failed"
+    return client
+
+
+@pytest.fixture
+def client(app, student):
+    """Test client logged in as `student`."""
+    return _login(app, STUDENT_EMAIL, STUDENT_PASSWORD)
+
+
+@pytest.fixture
+def admin_client(app):
+    """Test client logged in as a library staff account (is_admin)."""
+    with app.app_context():
+        admin = Student(name='Librarian', email=ADMIN_EMAIL, roll_no='A0001', is_admin=True)
+        admin.set_password(STUDENT_PASSWORD)
+        db.session.add(admin)
+        db.session.commit()
+    return _login(app, ADMIN_EMAIL, STUDENT_PASSWORD)
+
+
+@pytest.fixture
+def query_budget():
+    """check_query_budget (tests/helpers.py) as a fixture."""
+    return check_query_budget
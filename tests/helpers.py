@@ -0,0 +1,221 @@
+# In tests/helpers.py
+#
+# Test helpers. Query budgets cap how many SQL statements a page may run,
+# so an N+1 regression fails a test instead of slowing production:
+#
+#   def test_my_loans_budget(client, query_budget):
+#       query_budget(client, '/my-loans')            # uses QUERY_BUDGETS
+#       query_budget(client, '/dues', max_queries=4)
+#
+# `client` and `query_budget` are fixtures from tests/conftest.py, and
+# tests/test_query_budgets.py checks every endpoint below.
+#
+# RazorpayStandIn is a local HTTP server that answers the Razorpay API
+# calls app.services.payments makes, so gateway timeouts, 5xx and the
+# circuit breaker can be exercised without the network:
+#
+#   with RazorpayStandIn() as gateway:
+#       app.config['RAZORPAY_API_URL'] = gateway.url   # before the first payment
+#       gateway.payments['pay_ok'] = {'status': 'captured', 'amount': 4900}
+#       gateway.delay = 10        # slower than PAYMENT_VERIFY_WAIT_SECONDS
+#       gateway.fail_with = 503   # every call fails until reset to None
+#
+# SMTPStandIn is a minimal SMTP server for the mail outbox tests. It
+# accepts plain (no TLS, no AUTH) sessions and records what it receives:
+#
+#   with SMTPStandIn() as smtp:
+#       app.config.update(MAIL_SERVER=smtp.host, MAIL_PORT=smtp.port, MAIL_USE_TLS=False)
+#       smtp.reject_with = '550 Mailbox unavailable'   # refuse every RCPT TO
+#       smtp.messages, smtp.connections                  # what was delivered
+
+import json
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.services import query_stats
+
+# Most statements each endpoint may run per request for a logged-in student,
+# counting the user loader and the navbar's bag count (the session store's
+# own reads and writes are outside the request hooks).
+QUERY_BUDGETS = {
+    'main.landing_page': 2,
+    'main.list_books': 3,
+    'main.book_detail': 4,
+    'main.my_bag': 4,
+    'main.my_loans': 3,
+    'main.dues': 3,
+    'main.profile': 2,
+    'main.my_subscription': 4,
+    'main.student_detail': 4,
+}
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def check_query_budget(client, path, max_queries=None, method='get', **request_kwargs):
+    """Request `path` and fail if it ran more statements than allowed; returns the RequestStats."""
+    with query_stats.capture() as seen:
+        response = getattr(client, method)(path, **request_kwargs)
+    if not seen:
+        raise AssertionError(f"{path} was not instrumented (is SQL_STATS_ENABLED off?)")
+    if response.status_code >= 400:
+        raise AssertionError(f"{method.upper()} {path} answered {response.status_code}; nothing to measure")
+    stats = seen[-1]
+    budget = max_queries if max_queries is not None else QUERY_BUDGETS.get(stats.endpoint)
+    if budget is None:
+        raise AssertionError(f"No query budget for endpoint {stats.endpoint!r}; pass max_queries")
+    if stats.count > budget:
+        shapes = '\n'.join(f"  {n} x {fp[:160]}" for fp, n in stats.fingerprints.most_common())
+        raise QueryBudgetExceeded(
+            f"{method.upper()} {path} ({stats.endpoint}) ran {stats.count} statements, "
+            f"budget is {budget} (status {response.status_code}):\n{shapes}"
+        )
+    return stats
+
+
+class RazorpayStandIn:
+    """Threaded stand-in for api.razorpay.com serving GET /v1/payments/<id>."""
+
+    def __init__(self):
+        self.payments = {}    # payment id -> payment JSON (id is filled in)
+        self.delay = 0        # seconds to sleep before every answer
+        self.fail_with = None  # HTTP status to answer every call with
+        self.calls = []       # paths requested, in order
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in.calls.append(self.path)
+                time.sleep(stand_in.delay)
+                prefix = '/v1/payments/'
+                payment_id = self.path.split('?')[0][len(prefix):] if self.path.startswith(prefix) else None
+                if stand_in.fail_with:
+                    status, body = stand_in.fail_with, {'error': {'code': 'SERVER_ERROR', 'description': 'Stand-in failure'}}
+                elif payment_id in stand_in.payments:
+                    status, body = 200, {'id': payment_id, 'entity': 'payment', **stand_in.payments[payment_id]}
+                else:
+                    status, body = 400, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'The id provided does not exist'}}
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                try:
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client timed out first
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class SMTPStandIn:
+    """Threaded SMTP sink on 127.0.0.1 that records connections and messages."""
+
+    def __init__(self):
+        self.messages = []        # (sender, recipients, raw data) per accepted message
+        self.connections = 0      # SMTP sessions opened so far
+        self.reject_with = None   # reply to every RCPT TO instead of 250, e.g. '550 No'
+        self._server = None
+        self._thread = None
+
+    @property
+    def host(self):
+        return self._server.server_address[0]
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        stand_in = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(f"{line}\r\n".encode())
+
+            def handle(self):
+                stand_in.connections += 1
+                sender, recipients = None, []
+                self.reply('220 stand-in ESMTP')
+                for raw in self.rfile:
+                    command = raw.decode('utf-8', 'replace').strip()
+                    verb = command.split(' ', 1)[0].upper()
+                    if verb == 'EHLO':
+                        self.reply('250-stand-in')
+                        self.reply('250 8BITMIME')
+                    elif verb == 'HELO':
+                        self.reply('250 stand-in')
+                    elif verb == 'MAIL':
+                        sender, recipients = command[10:].strip(), []
+                        self.reply('250 OK')
+                    elif verb == 'RCPT':
+                        if stand_in.reject_with:
+                            self.reply(stand_in.reject_with)
+                        else:
+                            recipients.append(command[8:].strip())
+                            self.reply('250 OK')
+                    elif verb == 'DATA':
+                        self.reply('354 End data with <CR><LF>.<CR><LF>')
+                        lines = []
+                        for data in self.rfile:
+                            if data in (b'.\r\n', b'.\n'):
+                                break
+                            lines.append(data)
+                        stand_in.messages.append((sender, recipients, b''.join(lines)))
+                        self.reply('250 OK: queued')
+                    elif verb == 'RSET':
+                        sender, recipients = None, []
+                        self.reply('250 OK')
+                    elif verb == 'NOOP':
+                        self.reply('250 OK')
+                    elif verb == 'QUIT':
+                        self.reply('221 Bye')
+                        return
+                    else:
+                        self.reply('502 Command not implemented')
+
+        self._server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
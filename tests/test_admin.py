@@ -0,0 +1,57 @@
+# In tests/test_admin.py
+#
+# The /admin pages, bulk exports included, are for staff accounts only.
+
+import pytest
+
+from app import db
+from app.models.student import Student
+from app.services import exports
+
+STUDENT_EMAIL = 'student@example.com'  # the `student` fixture's account
+
+ADMIN_PAGES = ['/admin', '/admin/books', '/admin/students', '/admin/student/{student}']
+EXPORTS = [f'/admin/export/{entity}' for entity in exports.ENTITIES]
+
+
+@pytest.mark.parametrize('path', ADMIN_PAGES + EXPORTS)
+def test_student_cannot_open_admin_pages(client, student, path):
+    assert client.get(path.format(student=student)).status_code == 403
+
+
+@pytest.mark.parametrize('path', ['/admin', '/admin/export/students'])
+def test_anonymous_visitor_cannot_open_admin_pages(app, path):
+    response = app.test_client().get(path)
+    assert response.status_code in (302, 403)
+    assert STUDENT_EMAIL.encode() not in response.data
+
+
+@pytest.mark.parametrize('path', EXPORTS)
+def test_admin_can_export(admin_client, student, path):
+    response = admin_client.get(path)
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'].startswith('attachment;')
+
+
+def test_student_export_leaves_out_password_hashes(admin_client, student):
+    body = admin_client.get('/admin/export/students').get_data(as_text=True)
+    assert STUDENT_EMAIL in body
+    assert 'password_hash' not in body
+
+
+def test_admin_grant_and_revoke_commands(app, student):
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=['admin', 'grant', STUDENT_EMAIL])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert db.session.get(Student, student).is_admin
+
+    result = runner.invoke(args=['admin', 'revoke', STUDENT_EMAIL])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert not db.session.get(Student, student).is_admin
+
+    result = runner.invoke(args=['admin', 'grant', 'nobody@example.com'])
+    assert result.exit_code != 0
+    assert 'No account' in result.output
@@ -0,0 +1,197 @@
+# In tests/test_audio_index.py
+#
+# The segment index: MP3 frame walking and ID3 chapters, seek lookups, the
+# /segment endpoint, and damaged audio surfacing as UnsupportedAudio rather
+# than as a parser crash.
+
+import os
+import struct
+from decimal import Decimal
+
+import pytest
+
+from app import db
+from app.models import SubscriptionTierEnum
+from app.models.audiobook import Audiobook
+from app.models.student import Student
+from app.services import entitlements
+from app.services.audio_index import Segment, UnsupportedAudio, find_segment, parse_file
+
+STUDENT_EMAIL = 'student@example.com'  # the `student` fixture's account
+STUDENT_PASSWORD = 'password1'
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, no padding: 417-byte frames of
+# 1152 samples (about 26.12 ms each)
+MP3_FRAME = b'\xff\xfb\x90\x64' + b'\0' * 413
+
+
+def synchsafe(n):
+    return bytes((n >> shift) & 0x7F for shift in (21, 14, 7, 0))
+
+
+def id3_frame(frame_id, body):
+    return frame_id + struct.pack('>I', len(body)) + b'\0\0' + body
+
+
+def chap(element_id, title, start_ms, end_ms):
+    body = element_id + b'\0' + struct.pack('>IIII', start_ms, end_ms, 0xFFFFFFFF, 0xFFFFFFFF)
+    return id3_frame(b'CHAP', body + id3_frame(b'TIT2', b'\x03' + title.encode()))
+
+
+def mp3(frames=100, chapters=()):
+    tag = b''
+    if chapters:
+        frames_data = b''.join(chap(f'ch{i}'.encode(), *c) for i, c in enumerate(chapters))
+        tag = b'ID3\x03\0\0' + synchsafe(len(frames_data)) + frames_data
+    return tag + MP3_FRAME * frames
+
+
+def atom(kind, *children, body=b''):
+    payload = body + b''.join(children)
+    return struct.pack('>I4s', 8 + len(payload), kind) + payload
+
+
+def mp4(timescale=1000, stsz=True):
+    hdlr = atom(b'hdlr', body=b'\0' * 8 + b'soun' + b'\0' * 12)
+    mdhd = atom(b'mdhd', body=b'\0' * 12 + struct.pack('>II', timescale, 2000))
+    tables = [
+        atom(b'stts', body=b'\0' * 4 + struct.pack('>I', 1) + struct.pack('>II', 2, 1000)),
+        atom(b'stsc', body=b'\0' * 4 + struct.pack('>I', 1) + struct.pack('>III', 1, 2, 1)),
+        atom(b'stco', body=b'\0' * 4 + struct.pack('>I', 1) + struct.pack('>I', 64)),
+    ]
+    if stsz:
+        tables.append(atom(b'stsz', body=b'\0' * 4 + struct.pack('>II', 100, 2)))
+    stbl = atom(b'stbl', *tables)
+    moov = atom(b'moov', atom(b'trak', atom(b'mdia', hdlr, mdhd, atom(b'minf', stbl))))
+    return atom(b'ftyp', body=b'M4A \0\0\0\0') + moov
+
+
+def _write(tmp_path, data, name='book.m4b'):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_mp3_frames_are_indexed_at_the_interval(app, tmp_path):
+    with app.app_context():
+        parsed = parse_file(_write(tmp_path, mp3(100), 'book.mp3'), interval_ms=1000)
+    assert (parsed.container, parsed.data_start, parsed.data_end) == ('mp3', 0, 100 * 417)
+    assert parsed.duration_ms == 100 * 1152 * 1000 // 44100
+    # The first frame at or past each second, by byte offset of its header
+    assert parsed.points == [[0, 0], [1018, 39 * 417], [2037, 78 * 417]]
+
+
+def test_mp3_chapters_come_from_id3_chap_frames(app, tmp_path):
+    data = mp3(100, chapters=[('Opening', 0, 1500), ('Second', 1500, 0)])
+    with app.app_context():
+        parsed = parse_file(_write(tmp_path, data, 'book.mp3'), interval_ms=1000)
+    assert parsed.data_start == len(data) - 100 * 417
+    assert parsed.points[1] == [1018, parsed.data_start + 39 * 417]
+    assert parsed.chapters == [
+        {'title': 'Opening', 'start_ms': 0, 'end_ms': 1500},
+        {'title': 'Second', 'start_ms': 1500, 'end_ms': parsed.duration_ms},  # open end filled in
+    ]
+
+
+def test_mp3_index_resyncs_after_garbage(app, tmp_path):
+    data = MP3_FRAME * 10 + b'\xff\x00junk' + MP3_FRAME * 10
+    with app.app_context():
+        parsed = parse_file(_write(tmp_path, data, 'book.mp3'), interval_ms=100)
+    assert parsed.duration_ms == 20 * 1152 * 1000 // 44100
+    assert parsed.data_end == len(data)
+    assert all(data[offset:offset + 4] == MP3_FRAME[:4] for _, offset in parsed.points)
+    assert any(offset > 10 * 417 for _, offset in parsed.points)
+
+
+class _Index:
+    points = [[0, 100], [1000, 500], [2000, 900]]
+    duration_ms = 2500
+    data_end = 1200
+
+
+@pytest.mark.parametrize('start_ms, end_ms, expected', [
+    (0, None, Segment(0, 2500, 100, 1200)),
+    (1500, None, Segment(1000, 2500, 500, 1200)),
+    (1000, 2000, Segment(1000, 2000, 500, 900)),
+    (1200, 1800, Segment(1000, 2000, 500, 900)),   # widened to the seek points around it
+    (-50, 10, Segment(0, 1000, 100, 500)),
+    (2100, 9000, Segment(2000, 2500, 900, 1200)),  # past the end: to the end of the audio
+])
+def test_find_segment(start_ms, end_ms, expected):
+    assert find_segment(_Index, start_ms, end_ms) == expected
+
+
+def test_well_formed_mp4_parses(app, tmp_path):
+    with app.app_context():
+        parsed = parse_file(_write(tmp_path, mp4()))
+    assert (parsed.container, parsed.duration_ms, parsed.data_start) == ('mp4', 2000, 64)
+
+
+@pytest.mark.parametrize('data', [
+    pytest.param(mp4(stsz=False), id='missing stsz'),
+    pytest.param(mp4(timescale=0), id='zero timescale'),
+    pytest.param(mp4()[:-20], id='truncated'),
+])
+def test_damaged_mp4_is_unsupported(app, tmp_path, data):
+    with app.app_context(), pytest.raises(UnsupportedAudio):
+        parse_file(_write(tmp_path, data))
+
+
+def test_non_audio_is_unsupported(app, tmp_path):
+    with app.app_context(), pytest.raises(UnsupportedAudio):
+        parse_file(_write(tmp_path, b'not audio at all' * 10, 'book.mp3'))
+
+
+# --- /audiobook/<id>/segment ----------------------------------------------
+
+@pytest.fixture
+def audiobook(app, student):
+    app.config['AUDIO_INDEX_INTERVAL_SECONDS'] = 1
+    os.makedirs(app.config['MEDIA_ROOT'], exist_ok=True)
+    with open(os.path.join(app.config['MEDIA_ROOT'], 'book.mp3'), 'wb') as f:
+        f.write(mp3(100, chapters=[('Opening', 0, 1500), ('Second', 1500, 0)]))
+    with app.app_context():
+        entitlements.activate_subscription(db.session.get(Student, student), SubscriptionTierEnum.MAX,
+                                           Decimal('199.00'), 30)
+        audiobook = Audiobook(title='Indexed Book', author='Author', file_path='book.mp3', file_format='MP3')
+        db.session.add(audiobook)
+        db.session.commit()
+        return audiobook.id
+
+
+@pytest.fixture
+def listener(app, audiobook):
+    client = app.test_client()
+    response = client.post('/login', data={'email': STUDENT_EMAIL, 'password': STUDENT_PASSWORD})
+    assert response.status_code == 302, "login failed"
+    return client
+
+
+def test_segment_serves_the_indexed_byte_range(app, audiobook, listener):
+    data_start = os.path.getsize(os.path.join(app.config['MEDIA_ROOT'], 'book.mp3')) - 100 * 417
+
+    response = listener.get(f'/audiobook/{audiobook}/segment?start=1.2&end=1.9')
+    assert response.status_code == 200
+    assert response.headers['X-Segment-Start-Ms'] == '1018'
+    assert response.headers['X-Segment-End-Ms'] == '2037'
+    first, last = data_start + 39 * 417, data_start + 78 * 417
+    assert response.headers['X-Segment-Bytes'] == f'{first}-{last - 1}'
+    assert len(response.data) == last - first
+    assert response.data.startswith(b'\xff\xfb')
+
+
+def test_segment_by_chapter(audiobook, listener):
+    response = listener.get(f'/audiobook/{audiobook}/segment?chapter=1')
+    assert response.status_code == 200
+    assert response.headers['X-Segment-Start-Ms'] == '1018'
+    assert listener.get(f'/audiobook/{audiobook}/segment?chapter=2').status_code == 404
+
+
+@pytest.mark.parametrize('query', ['start=inf', 'start=nan', 'start=-1', 'start=1&end=inf',
+                                   'start=1&end=nan', 'start=1&end=-5', 'start=2&end=1', 'start=1e400'])
+def test_segment_rejects_bad_bounds(audiobook, listener, query):
+    assert listener.get(f'/audiobook/{audiobook}/segment?{query}').status_code == 400
+
+
+def test_segment_needs_an_audiobook_subscription(client):
+    assert client.get('/audiobook/1/segment?start=inf').status_code == 403
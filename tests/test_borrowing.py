@@ -0,0 +1,129 @@
+# In tests/test_borrowing.py
+#
+# Concurrency stress test for app.services.borrowing: many threads, each in
+# its own app context (so its own session and connection), borrow the same
+# low-stock books at the same moment.
+
+import threading
+
+import pytest
+from sqlalchemy import func
+
+from app import db
+from app.models.loan import Loan
+from app.models.physical_book import PhysicalBook
+from app.models.student import Student
+from app.services.borrowing import BORROWED, borrow_books
+
+THREADS = 16
+
+
+def _make_students(count):
+    students = []
+    for i in range(count):
+        student = Student(name=f'Student {i}', email=f's{i}@example.com', roll_no=f'R{i:04d}')
+        student.set_password('password1')
+        students.append(student)
+    db.session.add_all(students)
+    db.session.commit()
+    return [s.id for s in students]
+
+
+def _make_books(count, copies):
+    books = [
+        PhysicalBook(title=f'Book {i}', author='Author', total_copies=copies, available_copies=copies)
+        for i in range(count)
+    ]
+    db.session.add_all(books)
+    db.session.commit()
+    return [b.id for b in books]
+
+
+def _run_concurrently(app, calls):
+    """Run each (student_id, book_ids) borrow in its own thread, all released together."""
+    barrier = threading.Barrier(len(calls))
+    results, errors = [], []
+
+    def worker(student_id, book_ids):
+        with app.app_context():
+            barrier.wait()
+            try:
+                results.append((student_id, borrow_books(student_id, book_ids)))
+            except Exception as e:  # surfaced by the assertion below
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=worker, args=call) for call in calls]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+    return results
+
+
+def _assert_consistent(book_ids, copies):
+    taken_total = 0
+    for book in PhysicalBook.query.filter(PhysicalBook.id.in_(book_ids)):
+        assert book.available_copies >= 0
+        loans = Loan.query.filter_by(book_id=book.id, returned_date=None).count()
+        assert loans == copies - book.available_copies
+        taken_total += loans
+    return taken_total
+
+
+def test_last_copies_are_never_oversold(app):
+    with app.app_context():
+        student_ids = _make_students(THREADS)
+        book_ids = _make_books(3, copies=2)
+
+    results = _run_concurrently(app, [(sid, book_ids) for sid in student_ids])
+
+    with app.app_context():
+        taken = _assert_consistent(book_ids, copies=2)
+        assert taken == 3 * 2  # every copy went to someone
+        borrowed = sum(len(result.borrowed) for _, result in results)
+        assert borrowed == taken
+
+
+def test_loan_limit_holds_under_parallel_borrows(app):
+    max_loans = app.config['MAX_ACTIVE_LOANS']
+    with app.app_context():
+        (student_id,) = _make_students(1)
+        book_ids = _make_books(THREADS * 2, copies=THREADS)
+
+    # Same student, different books in every thread: only the limit can stop them
+    calls = [(student_id, book_ids[i * 2:i * 2 + 2]) for i in range(THREADS)]
+    results = _run_concurrently(app, calls)
+
+    with app.app_context():
+        active = (
+            db.session.query(func.count(Loan.id))
+            .filter(Loan.student_id == student_id, Loan.returned_date.is_(None))
+            .scalar()
+        )
+        assert active <= max_loans
+        assert active == sum(len(result.borrowed) for _, result in results)
+        _assert_consistent(book_ids, copies=THREADS)
+
+
+@pytest.mark.parametrize('students', [4, THREADS])
+def test_no_student_exceeds_the_limit(app, students):
+    max_loans = app.config['MAX_ACTIVE_LOANS']
+    with app.app_context():
+        student_ids = _make_students(students)
+        book_ids = _make_books(8, copies=3)
+
+    # Each student fires two overlapping requests for four books
+    calls = [(sid, book_ids[j * 4:j * 4 + 4]) for sid in student_ids for j in range(2)]
+    results = _run_concurrently(app, calls)
+
+    with app.app_context():
+        for sid in student_ids:
+            active = Loan.query.filter_by(student_id=sid, returned_date=None).count()
+            assert active <= max_loans
+        taken = _assert_consistent(book_ids, copies=3)
+        assert taken == sum(
+            1 for _, result in results for outcome in result.outcomes if outcome.status == BORROWED
+        )
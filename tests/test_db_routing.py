@@ -0,0 +1,148 @@
+# In tests/test_db_routing.py
+#
+# Read/write splitting with two SQLite files: the primary and a "replica"
+# holding different data, so every read shows which database answered.
+
+import time
+
+import pytest
+from sqlalchemy import text, update
+
+from app import db
+from app.models.physical_book import PhysicalBook
+from app.services import db_routing
+
+
+def _add_book(bind, title):
+    with bind.begin() as conn:
+        conn.execute(text("INSERT INTO publication (id, type, title, author) "
+                          "VALUES (1, 'physical_book', :title, 'Author')"), {'title': title})
+        conn.execute(text("INSERT INTO physical_book (id, total_copies, available_copies) VALUES (1, 1, 1)"))
+
+
+def _title():
+    return PhysicalBook.query.with_entities(PhysicalBook.title).filter_by(id=1).scalar()
+
+
+def _add_routes(app):
+    @db_routing.replica_reads
+    def read():
+        return _title()
+
+    def undecorated_read():
+        return _title()
+
+    @db_routing.replica_reads
+    def write_then_read():
+        db.session.execute(update(PhysicalBook).where(PhysicalBook.id == 1).values(available_copies=1))
+        title = _title()
+        db.session.commit()
+        return title
+
+    @db_routing.replica_reads
+    def flush_then_read():
+        db.session.add(PhysicalBook(title='Unsaved', author='Author', total_copies=1, available_copies=1))
+        db.session.flush()
+        title = _title()
+        db.session.rollback()
+        return title
+
+    @db_routing.replica_reads
+    def lock_then_read():
+        locked = PhysicalBook.query.with_entities(PhysicalBook.title).filter_by(id=1).with_for_update().scalar()
+        title = _title()
+        db.session.rollback()
+        return f'{locked}|{title}'
+
+    @db_routing.replica_reads
+    def raw_read():
+        with db_routing.read_engine().connect() as conn:
+            return conn.execute(text('SELECT title FROM publication WHERE id = 1')).scalar()
+
+    for view in (read, undecorated_read, write_then_read, flush_then_read, lock_then_read, raw_read):
+        app.add_url_rule(f'/_{view.__name__}', view.__name__, view, methods=['GET', 'POST'])
+
+
+def _make(make_app, replica_uri, **settings):
+    app = make_app(SQLALCHEMY_REPLICA_URIS=replica_uri, REPLICA_HEALTH_CHECK_SECONDS=0, **settings)
+    _add_routes(app)
+    with app.app_context():
+        _add_book(db.engine, 'On the primary')
+    return app
+
+
+@pytest.fixture
+def replica_app(make_app, tmp_path):
+    app = _make(make_app, f"sqlite:///{tmp_path / 'replica.db'}")
+    (replica,) = app.extensions['db_routing']['replicas']
+    db.metadata.create_all(replica.engine)
+    _add_book(replica.engine, 'On the replica')
+    return app
+
+
+def _get(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def test_decorated_views_read_from_the_replica(replica_app):
+    client = replica_app.test_client()
+    assert _get(client, '/_read') == 'On the replica'
+    assert _get(client, '/_raw_read') == 'On the replica'
+    assert 'On the replica' in _get(client, '/books')
+
+
+def test_undecorated_views_and_app_code_use_the_primary(replica_app):
+    assert _get(replica_app.test_client(), '/_undecorated_read') == 'On the primary'
+    with replica_app.app_context():
+        assert _title() == 'On the primary'
+
+
+@pytest.mark.parametrize('path', ['/_write_then_read', '/_flush_then_read'])
+def test_reads_after_a_write_use_the_primary(replica_app, path):
+    assert _get(replica_app.test_client(), path) == 'On the primary'
+
+
+def test_for_update_pins_the_request_to_the_primary(replica_app):
+    assert _get(replica_app.test_client(), '/_lock_then_read') == 'On the primary|On the primary'
+
+
+def test_browser_sticks_to_the_primary_after_writing(replica_app):
+    replica_app.config['REPLICA_STICKY_SECONDS'] = 0.5
+    writer, other = replica_app.test_client(), replica_app.test_client()
+
+    _get(writer, '/_write_then_read')
+    assert _get(writer, '/_read') == 'On the primary'
+    assert _get(other, '/_read') == 'On the replica'  # only the browser that wrote
+
+    time.sleep(0.6)
+    assert _get(writer, '/_read') == 'On the replica'
+
+
+def test_locking_read_sets_no_sticky_window(replica_app):
+    client = replica_app.test_client()
+    _get(client, '/_lock_then_read')
+    assert _get(client, '/_read') == 'On the replica'
+
+
+def test_unreachable_replica_falls_back_to_the_primary(make_app, tmp_path):
+    missing = tmp_path / 'not-yet'
+    app = _make(make_app, f"sqlite:///{missing / 'replica.db'}")
+    (replica,) = app.extensions['db_routing']['replicas']
+    client = app.test_client()
+
+    assert _get(client, '/_read') == 'On the primary'
+    assert not replica.healthy
+
+    # Back at the next health check
+    missing.mkdir()
+    db.metadata.create_all(replica.engine)
+    _add_book(replica.engine, 'On the replica')
+    assert _get(client, '/_read') == 'On the replica'
+    assert replica.healthy
+
+
+def test_no_replicas_means_primary(make_app):
+    app = _make(make_app, '')
+    assert _get(app.test_client(), '/_read') == 'On the primary'
@@ -0,0 +1,152 @@
+# In tests/test_ebook_pages.py
+
+import io
+import os
+import zipfile
+from decimal import Decimal
+
+import pytest
+
+from app import db
+from app.models import SubscriptionTierEnum
+from app.models.ebook import Ebook
+from app.models.student import Student
+from app.services import ebook_pages, entitlements
+
+pypdf = pytest.importorskip('pypdf')
+
+CONTAINER = b'''<?xml version="1.0"?>
+<container xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles><rootfile full-path="OEBPS/content.opf"/></rootfiles>
+</container>'''
+OPF = b'''<?xml version="1.0"?>
+<package xmlns="http://www.idpf.org/2007/opf">
+  <manifest><item id="c1" href="c1.xhtml"/><item id="c2" href="c2.xhtml"/></manifest>
+  <spine><itemref idref="c1"/><itemref idref="c2"/></spine>
+</package>'''
+EPUB_FILES = {
+    'META-INF/container.xml': CONTAINER, 'OEBPS/content.opf': OPF,
+    'OEBPS/c1.xhtml': b'<html><head></head><body>One<img src="cover.png"></body></html>',
+    'OEBPS/c2.xhtml': b'<html><head></head><body>Two</body></html>',
+    'OEBPS/cover.png': b'\x89PNG not really',
+}
+
+
+def _epub(app, name, files):
+    path = f"{app.config['MEDIA_ROOT']}/{name}"
+    with zipfile.ZipFile(path, 'w') as zf:
+        for member, data in files.items():
+            zf.writestr(member, data)
+    return name
+
+
+def _pdf(app, name, pages=3):
+    writer = pypdf.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    out = io.BytesIO()
+    writer.write(out)
+    with open(f"{app.config['MEDIA_ROOT']}/{name}", 'wb') as f:
+        f.write(out.getvalue())
+    return name
+
+
+@pytest.fixture
+def media_app(app):
+    os.makedirs(app.config['MEDIA_ROOT'], exist_ok=True)
+    return app
+
+
+def test_epub_chapters_are_pages(media_app):
+    name = _epub(media_app, 'ok.epub', EPUB_FILES)
+    with media_app.test_request_context():
+        assert ebook_pages.book_info(name).page_count == 2
+        page = ebook_pages.get_page(name, 2, base_url='/r/')
+        with open(page.path, 'rb') as f:
+            assert b'Two' in f.read()
+
+
+@pytest.mark.parametrize('files', [
+    pytest.param({'OEBPS/content.opf': OPF}, id='no container.xml'),
+    pytest.param({'META-INF/container.xml': CONTAINER, 'OEBPS/content.opf': b'<package'}, id='bad OPF XML'),
+    pytest.param({'META-INF/container.xml': b'<container/>'}, id='no rootfile'),
+])
+def test_damaged_epub_is_unavailable(media_app, files):
+    name = _epub(media_app, 'bad.epub', files)
+    with media_app.app_context(), pytest.raises(ebook_pages.PagesUnavailable):
+        ebook_pages.book_info(name)
+
+
+def test_missing_chapter_is_unavailable(media_app):
+    name = _epub(media_app, 'holes.epub', {'META-INF/container.xml': CONTAINER, 'OEBPS/content.opf': OPF})
+    with media_app.test_request_context(), pytest.raises(ebook_pages.PagesUnavailable):
+        ebook_pages.get_page(name, 1)
+
+
+def test_corrupt_pdf_is_unavailable(media_app):
+    with open(f"{media_app.config['MEDIA_ROOT']}/bad.pdf", 'wb') as f:
+        f.write(b'%PDF-1.7\nthis is not really a pdf')
+    with media_app.app_context(), pytest.raises(ebook_pages.PagesUnavailable):
+        ebook_pages.book_info('bad.pdf')
+
+
+def test_pdf_is_parsed_once_for_all_pages(media_app, monkeypatch):
+    name = _pdf(media_app, 'book.pdf', pages=4)
+    parsed = []
+    real_reader = pypdf.PdfReader
+    monkeypatch.setattr(pypdf, 'PdfReader', lambda *a, **kw: parsed.append(a) or real_reader(*a, **kw))
+    ebook_pages._pdf_document.cache_clear()
+    media_app.config['EBOOK_PREFETCH_PAGES'] = 0
+    with media_app.test_request_context():
+        assert ebook_pages.book_info(name).page_count == 4
+        paths = [ebook_pages.get_page(name, page).path for page in range(1, 5)]
+    assert len(parsed) == 1
+    for path in paths:
+        assert len(real_reader(path).pages) == 1
+
+
+def test_file_hash_changes_with_an_edit_in_the_middle(tmp_path):
+    path = tmp_path / 'big.pdf'
+    data = bytearray(os.urandom(3 * 1024 * 1024))
+    path.write_bytes(data)
+    before = ebook_pages.file_hash(str(path))
+
+    data[len(data) // 2] ^= 0xFF  # outside the sampled first and last MiB
+    path.write_bytes(data)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert ebook_pages.file_hash(str(path)) != before
+
+
+def test_epub_resources(media_app):
+    name = _epub(media_app, 'ok.epub', EPUB_FILES)
+    with media_app.app_context():
+        assert ebook_pages.get_epub_resource(name, 'OEBPS/cover.png') == (b'\x89PNG not really', 'image/png')
+        for missing in ('OEBPS/none.png', '../ok.epub', 'META-INF/container.xml'):
+            with pytest.raises(ebook_pages.PageNotFound):
+                ebook_pages.get_epub_resource(name, missing)
+
+
+def test_resource_of_a_pdf_or_damaged_epub_is_not_found(media_app):
+    pdf = _pdf(media_app, 'book.pdf')
+    damaged = _epub(media_app, 'damaged.epub', EPUB_FILES)
+    path = f"{media_app.config['MEDIA_ROOT']}/{damaged}"
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path, 'wb') as f:
+        f.write(data[:len(data) // 2])  # central directory lost
+    with media_app.app_context():
+        for name in (pdf, damaged):
+            with pytest.raises(ebook_pages.PageNotFound):
+                ebook_pages.get_epub_resource(name, 'OEBPS/cover.png')
+
+
+def test_resource_route_answers_404_for_a_pdf(media_app, student, client):
+    with media_app.app_context():
+        entitlements.activate_subscription(db.session.get(Student, student), SubscriptionTierEnum.PRO,
+                                           Decimal('99.00'), 30)
+        ebook = Ebook(title='A PDF', author='Author', file_path=_pdf(media_app, 'book.pdf'), file_format='PDF')
+        db.session.add(ebook)
+        db.session.commit()
+        ebook_id = ebook.id
+    assert client.get(f'/ebook/{ebook_id}/epub/OEBPS/cover.png').status_code == 404
@@ -0,0 +1,101 @@
+# In tests/test_http_cache.py
+
+import pytest
+from sqlalchemy import insert
+
+from app import db
+from app.models.physical_book import PhysicalBook
+from app.models.publication import Publication
+from app.services import http_cache, query_stats
+
+
+@pytest.fixture
+def cached_app(app, tmp_path):
+    app.config.update(HTTP_CACHE_BACKEND='filesystem', HTTP_CACHE_DIR=str(tmp_path / 'http_cache'))
+    app.extensions['http_cache']['backend'] = None
+    return app
+
+
+def _add_book_behind_the_orm(title):
+    """A write the session hook cannot see, like the importer's."""
+    db.session.execute(insert(Publication.__table__), [{'id': 1, 'title': title, 'author': 'A', 'type': 'physical_book'}])
+    db.session.execute(insert(PhysicalBook.__table__), [{'id': 1, 'total_copies': 1, 'available_copies': 1}])
+    db.session.commit()
+
+
+def _cached_files(tmp_path):
+    return [path for path in (tmp_path / 'http_cache').rglob('*') if path.is_file() and path.name != 'VERSION']
+
+
+def test_repeat_anonymous_visit_is_served_from_the_cache(cached_app):
+    client = cached_app.test_client()
+    with query_stats.capture() as seen:
+        first = client.get('/books')
+        second = client.get('/books')
+
+    assert first.status_code == second.status_code == 200
+    assert second.get_data() == first.get_data()
+    assert seen[0].count > 0
+    assert seen[1].count == 0  # nothing rendered, no database
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert 'public' in second.headers['Cache-Control']
+
+
+def test_matching_if_none_match_gets_304(cached_app):
+    client = cached_app.test_client()
+    etag = client.get('/books').headers['ETag']
+
+    response = client.get('/books', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert client.get('/books', headers={'If-None-Match': '"stale"'}).status_code == 200
+
+
+def test_publication_write_shows_up_on_the_next_visit(cached_app):
+    client = cached_app.test_client()
+    etag = client.get('/books').headers['ETag']
+    with cached_app.app_context():
+        db.session.add(PhysicalBook(title='Fresh Arrival', author='A', total_copies=1, available_copies=1))
+        db.session.commit()
+
+    response = client.get('/books', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Fresh Arrival' in response.get_data()
+
+
+def test_logged_in_pages_are_private_and_not_stored(cached_app, client, tmp_path):
+    client.get('/')  # shows the login flash
+    response = client.get('/books')
+    assert response.status_code == 200
+    assert 'private' in response.headers['Cache-Control']
+    assert 'public' not in response.headers['Cache-Control']
+    assert 'ETag' not in response.headers
+    assert _cached_files(tmp_path) == []
+
+    anonymous = cached_app.test_client()
+    with query_stats.capture() as seen:
+        anonymous.get('/books')
+    assert seen[0].count > 0  # not answered with the logged-in page
+
+
+def test_bump_from_another_process_reaches_this_one(cached_app, tmp_path):
+    client = cached_app.test_client()
+    first = client.get('/books')
+    assert first.status_code == 200
+    assert client.get('/books').get_data() == first.get_data()  # served from the cache
+
+    with cached_app.app_context():
+        _add_book_behind_the_orm('Zebra Patterns')
+    # A CLI command or another worker has its own backend object on the same directory
+    http_cache.FileSystemBackend(str(tmp_path / 'http_cache')).bump_version()
+
+    assert b'Zebra Patterns' in client.get('/books').get_data()
+
+
+def test_orm_writes_bump_the_version(cached_app):
+    with cached_app.app_context():
+        backend = http_cache.get_backend()
+        before = backend.get_version()
+        db.session.add(PhysicalBook(title='New', author='A', total_copies=1, available_copies=1))
+        db.session.commit()
+        assert backend.get_version() != before
@@ -0,0 +1,84 @@
+# In tests/test_importer.py
+
+import io
+
+from app.models.audiobook import Audiobook
+from app.models.ebook import Ebook
+from app.models.physical_book import PhysicalBook
+from app.models.publication import Publication
+from app.services.importer import import_catalog
+
+HEADER = 'Book Name,Author,Available Copies,ISBN Code,Format,File Path,File Format,Duration Minutes\n'
+ROWS = [
+    'Clean Code,Robert Martin,3,9780132350884,,,,\n',
+    'Untitled Notes,Anon,1,,,,,\n',
+    'Dune,Frank Herbert,,,ebook,ebooks/dune.epub,epub,\n',
+    'Dune (audio),Frank Herbert,,,audiobook,audio/dune.m4b,m4b,1260\n',
+]
+
+
+def _import(rows, **kwargs):
+    return import_catalog(io.StringIO(HEADER + ''.join(rows)), **kwargs)
+
+
+def test_new_rows_are_inserted_into_both_tables(app):
+    with app.app_context():
+        report = _import(ROWS, chunk_size=2)
+        assert (report.inserted, report.updated, report.errors) == (4, 0, [])
+
+        book = PhysicalBook.query.filter_by(isbn='9780132350884').one()
+        assert (book.title, book.total_copies, book.available_copies) == ('Clean Code', 3, 3)
+        assert Ebook.query.filter_by(file_path='ebooks/dune.epub').one().file_format == 'EPUB'
+        assert Audiobook.query.one().duration_minutes == 1260
+        types = sorted(p.type for p in Publication.query)
+        assert types == ['audiobook', 'ebook', 'physical_book', 'physical_book']
+
+
+def test_reimport_updates_in_place(app):
+    with app.app_context():
+        _import(ROWS)
+        ids = sorted(p.id for p in Publication.query)
+        changed = ['Clean Code,Robert C. Martin,5,9780132350884,,,,\n'] + ROWS[1:]
+        report = _import(changed)
+        assert (report.inserted, report.updated, report.unchanged) == (0, 1, 3)
+        assert sorted(p.id for p in Publication.query) == ids
+        book = PhysicalBook.query.filter_by(isbn='9780132350884').one()
+        assert (book.author, book.total_copies, book.available_copies) == ('Robert C. Martin', 5, 5)
+
+
+def test_new_ids_continue_after_existing_publications(app):
+    with app.app_context():
+        _import(ROWS[:2])
+        top = max(p.id for p in Publication.query)
+        _import(ROWS[2:])
+        assert sorted(p.id for p in Publication.query if p.type != 'physical_book') == [top + 1, top + 2]
+
+
+def test_rows_sharing_title_and_author_keep_their_own_ids(app):
+    editions = [f'Collected Works,Same Author,{n},97800000000{n:02d},,,,\n' for n in range(1, 6)]
+    with app.app_context():
+        report = _import(editions)
+        assert (report.inserted, report.errors) == (5, [])
+        books = PhysicalBook.query.order_by(PhysicalBook.id).all()
+        assert [(b.isbn, b.total_copies) for b in books] == [(f'97800000000{n:02d}', n) for n in range(1, 6)]
+        assert Publication.query.count() == 5
+
+
+def test_rows_of_a_failed_chunk_can_come_again(app, monkeypatch):
+    from app.services import importer
+
+    real_write = importer._write_chunk
+    calls = []
+
+    def write_once_failing(inserts, updates):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("connection lost")
+        return real_write(inserts, updates)
+
+    monkeypatch.setattr(importer, '_write_chunk', write_once_failing)
+    with app.app_context():
+        report = _import(ROWS[:2] + ROWS[:1], chunk_size=2)
+        assert [e.message for e in report.errors] == ["chunk failed, nothing written: connection lost"]
+        assert report.inserted == 1
+        assert PhysicalBook.query.one().isbn == '9780132350884'
@@ -0,0 +1,45 @@
+# In tests/test_loader_profiles.py
+#
+# The loader profiles keep list pages at a fixed number of SQL statements:
+# showing 50 loans or fines must cost the same as showing one.
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app import db
+from app.models.fine import Fine
+from app.models.loan import Loan
+from app.models.physical_book import PhysicalBook
+from tests.helpers import check_query_budget
+
+
+def _seed(app, student_id, count):
+    """Give the student `count` more overdue loans, each with its own book and fine."""
+    with app.app_context():
+        start = PhysicalBook.query.count()
+        for i in range(start, start + count):
+            book = PhysicalBook(title=f'Profiled Book {i:03d}', author='Author', total_copies=1, available_copies=0)
+            loan = Loan(student_id=student_id, book=book, due_date=datetime.utcnow() - timedelta(days=30))
+            db.session.add_all([book, loan, Fine(loan=loan, amount=Decimal('10.00'))])
+        db.session.commit()
+
+
+@pytest.mark.parametrize('path, viewer', [
+    ('/my-loans', 'client'),
+    ('/dues', 'client'),
+    ('/admin/student/{student}', 'admin_client'),
+])
+def test_statement_count_does_not_grow_with_rows(request, app, student, path, viewer):
+    client = request.getfixturevalue(viewer)
+    path = path.format(student=student)
+    _seed(app, student, 1)
+    one = check_query_budget(client, path)
+
+    _seed(app, student, 49)
+    stats = check_query_budget(client, path)
+    body = client.get(path).get_data(as_text=True)
+
+    assert body.count('Profiled Book') >= 50  # every row is on the page
+    assert stats.count == one.count, stats.fingerprints
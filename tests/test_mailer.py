@@ -0,0 +1,183 @@
+# In tests/test_mailer.py
+#
+# The mail outbox against tests.helpers.SMTPStandIn, a local SMTP server.
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import EmailStatusEnum
+from app.models.outbox_email import OutboxEmail
+from app.services import mailer
+from tests.helpers import SMTPStandIn
+
+
+@pytest.fixture
+def smtp(app):
+    with SMTPStandIn() as server:
+        app.config.update(
+            MAIL_SERVER=server.host, MAIL_PORT=server.port, MAIL_USE_TLS=False, MAIL_USE_SSL=False,
+            MAIL_USERNAME=None, MAIL_PASSWORD=None, MAIL_DEFAULT_SENDER='library@example.com',
+            MAIL_SUPPRESS_SEND=False,  # Flask-Mail sends nothing under TESTING otherwise
+        )
+        yield server
+
+
+def _enqueue(app, count):
+    with app.app_context():
+        for i in range(count):
+            mailer.enqueue_email(f'student{i}@example.com', 'Your OTP', 'email/otp.html',
+                                 otp_code=f'{i:06d}', expiry_minutes=10)
+        db.session.commit()
+
+
+def _emails(app):
+    with app.app_context():
+        emails = OutboxEmail.query.order_by(OutboxEmail.id).all()
+        db.session.expunge_all()
+        return emails
+
+
+def _wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_enqueued_emails_are_delivered_and_marked_sent(app, smtp):
+    _enqueue(app, 3)
+    with app.app_context():
+        assert mailer.deliver_pending() == (3, 0)
+
+    assert len(smtp.messages) == 3
+    assert [recipients for _, recipients, _ in smtp.messages] == [
+        ['<student0@example.com>'], ['<student1@example.com>'], ['<student2@example.com>']
+    ]
+    assert b'000001' in smtp.messages[1][2]
+    for email in _emails(app):
+        assert email.status == EmailStatusEnum.SENT
+        assert email.sent_at is not None
+        assert email.attempts == 1
+        assert email.context == {}  # the OTP is not kept once sent
+
+
+def test_one_connection_is_reused_across_a_batch(app, smtp):
+    _enqueue(app, 5)
+    with app.app_context():
+        assert mailer.deliver_pending(batch_size=10) == (5, 0)
+    assert smtp.connections == 1
+    assert len(smtp.messages) == 5
+
+
+def test_worker_keeps_one_connection_while_there_is_work(app, smtp):
+    _enqueue(app, 5)
+    stop = threading.Event()
+
+    def worker():
+        with app.app_context():
+            mailer.run_worker(poll_interval=0.05, batch_size=2, stop_event=stop)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    try:
+        assert _wait_for(lambda: all(e.status == EmailStatusEnum.SENT for e in _emails(app)))
+    finally:
+        stop.set()
+        thread.join()
+    assert len(smtp.messages) == 5
+    assert smtp.connections == 1  # three batches, one SMTP session
+
+
+def test_refused_email_is_retried_with_backoff(app, smtp):
+    smtp.reject_with = '550 Mailbox unavailable'
+    _enqueue(app, 1)
+    with app.app_context():
+        before = datetime.utcnow()
+        assert mailer.deliver_pending() == (0, 1)
+        after = datetime.utcnow()
+        base = app.config['MAIL_OUTBOX_RETRY_BASE_SECONDS']
+
+    (email,) = _emails(app)
+    assert email.status == EmailStatusEnum.PENDING
+    assert email.attempts == 1
+    assert '550' in email.last_error
+    # backoff_seconds(1) lies between base/2 and base
+    assert before + timedelta(seconds=base / 2) <= email.next_attempt_at <= after + timedelta(seconds=base)
+    assert smtp.messages == []
+
+
+def test_email_fails_after_max_attempts(app, smtp):
+    app.config['MAIL_OUTBOX_MAX_ATTEMPTS'] = 1
+    smtp.reject_with = '550 Mailbox unavailable'
+    _enqueue(app, 1)
+    with app.app_context():
+        assert mailer.deliver_pending() == (0, 1)
+    (email,) = _emails(app)
+    assert email.status == EmailStatusEnum.FAILED
+    assert email.context == {}
+
+
+def test_worker_releases_the_batch_when_smtp_is_down(app, smtp):
+    smtp.stop()  # nothing listens on MAIL_PORT any more
+    _enqueue(app, 2)
+    stop = threading.Event()
+
+    def worker():
+        with app.app_context():
+            mailer.run_worker(poll_interval=0.05, stop_event=stop)
+
+    before = datetime.utcnow()
+    thread = threading.Thread(target=worker)
+    thread.start()
+    try:
+        assert _wait_for(lambda: all(e.last_error for e in _emails(app)))
+    finally:
+        stop.set()
+        thread.join()
+
+    base = app.config['MAIL_OUTBOX_RETRY_BASE_SECONDS']
+    for email in _emails(app):
+        assert email.status == EmailStatusEnum.PENDING
+        assert email.attempts == 0  # never reached the server
+        assert email.next_attempt_at >= before + timedelta(seconds=base / 2)
+
+
+def test_purge_deletes_old_sent_and_failed_emails_in_batches(app):
+    _enqueue(app, 6)
+    with app.app_context():
+        emails = OutboxEmail.query.order_by(OutboxEmail.id).all()
+        old = datetime.utcnow() - timedelta(days=40)
+        for email, status in zip(emails, [EmailStatusEnum.SENT] * 3 + [EmailStatusEnum.FAILED,
+                                                                       EmailStatusEnum.PENDING,
+                                                                       EmailStatusEnum.SENT]):
+            email.status = status
+        for email in emails[:5]:
+            email.created_at = old  # the last one was sent recently
+        db.session.commit()
+
+        assert mailer.purge(batch_size=2, older_than_days=30) == 4
+        assert mailer.purge(batch_size=2, older_than_days=30) == 0
+    assert [e.status for e in _emails(app)] == [EmailStatusEnum.PENDING, EmailStatusEnum.SENT]
+
+
+def test_purge_command(app):
+    _enqueue(app, 1)
+    with app.app_context():
+        email = OutboxEmail.query.one()
+        email.status = EmailStatusEnum.SENT
+        db.session.commit()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['mail', 'purge'])
+    assert result.exit_code == 0, result.output
+    assert 'Purged 0 sent or failed email(s)' in result.output
+
+    result = runner.invoke(args=['mail', 'purge', '--older-than-days', '0', '--batch-size', '10'])
+    assert 'Purged 1 sent or failed email(s)' in result.output
+    assert _emails(app) == []
@@ -0,0 +1,45 @@
+# In tests/test_metrics.py
+#
+# /metrics and the connection pool gauges, on an app with one read replica
+# (the primary's SQLite file opened through a second engine). The
+# prometheus registry is process-wide, so gauge checks compare deltas.
+
+import pytest
+
+prometheus_client = pytest.importorskip('prometheus_client')
+
+from app import db
+
+
+@pytest.fixture
+def metrics_app(make_app, tmp_path):
+    return make_app(METRICS_ENABLED=True, SQLALCHEMY_REPLICA_URIS=f"sqlite:///{tmp_path / 'test.db'}")
+
+
+def _checked_out(pool):
+    return prometheus_client.REGISTRY.get_sample_value('libranet_db_pool_checked_out', {'pool': pool}) or 0
+
+
+@pytest.mark.parametrize('pool', ['primary', 'replica0'])
+def test_pool_gauge_follows_checkouts(metrics_app, pool):
+    if pool == 'primary':
+        with metrics_app.app_context():
+            engine = db.engine
+    else:
+        (replica,) = metrics_app.extensions['db_routing']['replicas']
+        engine = replica.engine
+
+    before = _checked_out(pool)
+    with engine.connect():
+        assert _checked_out(pool) == before + 1
+    assert _checked_out(pool) == before
+
+
+def test_metrics_endpoint_reports_requests_and_every_pool(metrics_app):
+    client = metrics_app.test_client()
+    assert client.get('/books').status_code == 200
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'libranet_http_requests_total{endpoint="main.list_books",method="GET",status="200"}' in body
+    assert 'libranet_db_pool_checked_out{pool="primary"}' in body
+    assert 'libranet_db_pool_checked_out{pool="replica0"}' in body
@@ -0,0 +1,115 @@
+# In tests/test_otp_store.py
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app import db
+from app.models.otp import OTP
+from app.services.otp_store import EXPIRED, INVALID, LOCKED_OUT, VERIFIED, MemoryOTPStore, SQLOTPStore
+
+
+def test_memory_store_verifies_and_counts_attempts():
+    store = MemoryOTPStore()
+    code = store.issue('a@example.com', ttl_minutes=10)
+    wrong = '000000' if code != '000000' else '111111'
+    assert store.verify('a@example.com', wrong, max_attempts=3).status == INVALID
+    assert store.verify('a@example.com', code, max_attempts=3) == (VERIFIED, 2)
+    assert store.verify('a@example.com', code, max_attempts=3).status == EXPIRED
+
+
+def test_memory_store_sweeps_expired_codes_on_issue():
+    store = MemoryOTPStore()
+    for i in range(100):
+        store.issue(f'abandoned{i}@example.com', ttl_minutes=0)
+    store._next_sweep = 0.0  # the sweep interval has passed
+    store.issue('new@example.com', ttl_minutes=10)
+    assert list(store._codes) == ['new@example.com']
+
+
+def test_memory_store_purge_reports_removed_codes():
+    store = MemoryOTPStore()
+    store.issue('gone@example.com', ttl_minutes=0)
+    store.issue('live@example.com', ttl_minutes=10)
+    assert store.purge(batch_size=100) == 1
+    assert list(store._codes) == ['live@example.com']
+
+
+def test_memory_store_purge_takes_a_wall_clock_now():
+    store = MemoryOTPStore()
+    store.issue('soon@example.com', ttl_minutes=5)
+    assert store.purge(batch_size=100, now=datetime.utcnow() + timedelta(minutes=1)) == 0
+    assert store.purge(batch_size=100, now=datetime.utcnow() + timedelta(minutes=6)) == 1
+
+
+# --- SQL store ------------------------------------------------------------
+
+EMAIL = 'new@example.com'
+
+
+@pytest.fixture
+def sql_store(app):
+    with app.app_context():
+        yield SQLOTPStore()
+
+
+def _issue(store, email=EMAIL, ttl_minutes=10):
+    code = store.issue(email, ttl_minutes)
+    db.session.commit()
+    return code
+
+
+def _wrong(code):
+    return '000000' if code != '000000' else '111111'
+
+
+def _attempts(email=EMAIL):
+    return db.session.query(OTP.attempts).filter_by(email=email).scalar()
+
+
+def test_sql_store_counts_wrong_codes_then_locks_out(sql_store):
+    code = _issue(sql_store)
+    assert sql_store.verify(EMAIL, _wrong(code), max_attempts=3) == (INVALID, 2)
+    assert sql_store.verify(EMAIL, _wrong(code), max_attempts=3) == (INVALID, 1)
+    assert sql_store.verify(EMAIL, _wrong(code), max_attempts=3) == (LOCKED_OUT, 0)
+    assert _attempts() == 3
+    # The right code no longer helps
+    assert sql_store.verify(EMAIL, code, max_attempts=3) == (LOCKED_OUT, 0)
+
+
+def test_sql_store_attempt_update_is_guarded(sql_store):
+    code = _issue(sql_store)
+    # Parallel requests used up the attempts after this one read the row:
+    # the guarded update changes nothing and the code stays locked.
+    db.session.execute(update(OTP).where(OTP.email == EMAIL).values(attempts=3))
+    db.session.commit()
+    assert sql_store.verify(EMAIL, _wrong(code), max_attempts=3) == (LOCKED_OUT, 0)
+    assert _attempts() == 3
+
+
+def test_sql_store_used_code_cannot_be_reused(sql_store):
+    code = _issue(sql_store)
+    assert sql_store.verify(EMAIL, _wrong(code), max_attempts=3).status == INVALID
+    assert sql_store.verify(EMAIL, code, max_attempts=3) == (VERIFIED, 2)
+    db.session.commit()
+    assert sql_store.verify(EMAIL, code, max_attempts=3) == (EXPIRED, 0)
+
+
+def test_sql_store_expired_code_is_rejected(sql_store):
+    code = _issue(sql_store, ttl_minutes=0)
+    assert sql_store.verify(EMAIL, code, max_attempts=3) == (EXPIRED, 0)
+
+
+def test_sql_store_purges_in_batches(sql_store):
+    for i in range(3):
+        _issue(sql_store, f'expired{i}@example.com', ttl_minutes=1)
+    code = _issue(sql_store, 'used@example.com')
+    sql_store.verify('used@example.com', code, max_attempts=3)
+    _issue(sql_store, 'live@example.com')
+    db.session.commit()
+
+    # The one-minute codes are still live now, so only the used one goes
+    assert sql_store.purge(batch_size=2) == 1
+    assert sql_store.purge(batch_size=2, now=datetime.utcnow() + timedelta(minutes=2)) == 3
+    assert [email for (email,) in db.session.query(OTP.email)] == ['live@example.com']
@@ -0,0 +1,73 @@
+# In tests/test_pagination.py
+
+import base64
+import json
+
+import pytest
+
+from app import db
+from app.models.physical_book import PhysicalBook
+from app.services import pagination
+
+
+def _token(values):
+    """A cursor as a visitor could craft it, bypassing encode_cursor."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+TAMPERED = [[{}, 1], [[1], [2]], [None, None], ['Title', '7'], ['Title', 7, 8], [True, 1],
+            ['Title', 1.5], 'Title', {'after': 1}]
+
+
+@pytest.fixture
+def books(app):
+    with app.app_context():
+        db.session.add_all(PhysicalBook(title=f'Book {i}', author='Author', total_copies=1, available_copies=1)
+                           for i in range(5))
+        db.session.commit()
+
+
+def test_cursor_round_trip():
+    assert pagination.decode_cursor(pagination.encode_cursor(['Dune', 12])) == ['Dune', 12]
+    assert pagination.decode_cursor(pagination.encode_cursor([0.75, 3])) == [0.75, 3]
+
+
+@pytest.mark.parametrize('values', TAMPERED)
+def test_malformed_cursor_is_ignored(values):
+    assert pagination.decode_cursor(_token(values)) is None
+
+
+@pytest.mark.parametrize('token', ['', 'not base64!', _token('NaN'), 'W05hTiwxXQ'])  # last: [NaN,1]
+def test_undecodable_cursor_is_ignored(token):
+    assert pagination.decode_cursor(token) is None
+
+
+def test_pages_follow_each_other(app, books):
+    with app.app_context():
+        titles, after = [], None
+        while True:
+            page = pagination.keyset_paginate(PhysicalBook.query, (PhysicalBook.title, PhysicalBook.id), 2,
+                                              after=pagination.decode_cursor(after))
+            titles += [book.title for book in page.items]
+            after = page.next_cursor
+            if after is None:
+                break
+        assert titles == [f'Book {i}' for i in range(5)]
+
+        back = pagination.keyset_paginate(PhysicalBook.query, (PhysicalBook.title, PhysicalBook.id), 2,
+                                          before=pagination.decode_cursor(page.prev_cursor))
+        assert [book.title for book in back.items] == ['Book 2', 'Book 3']
+
+
+@pytest.mark.parametrize('values', TAMPERED)
+@pytest.mark.parametrize('arg', ['after', 'before'])
+def test_tampered_cursor_shows_the_first_page(app, books, values, arg):
+    response = app.test_client().get(f'/books?{arg}={_token(values)}')
+    assert response.status_code == 200
+    assert b'Book 0' in response.data
+
+
+@pytest.mark.parametrize('path', ['/admin/books', '/admin/students'])
+def test_tampered_cursor_on_admin_lists(admin_client, books, path):
+    assert admin_client.get(f'{path}?after={_token([{}, 1])}').status_code == 200
+    assert admin_client.get(f'{path}?before={_token([None, None])}').status_code == 200
@@ -0,0 +1,252 @@
+# In tests/test_payments.py
+#
+# Payment verification against tests.helpers.RazorpayStandIn, a local
+# stand-in for the Razorpay API that can be made slow or failing.
+
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from app import db
+from app.models import PaymentStatusEnum, SubscriptionTierEnum
+from app.models.payment_verification import PaymentVerification
+from app.models.subscription import Subscription
+from app.services import payments
+from tests.helpers import RazorpayStandIn
+
+BASIC_PAISE = 4900  # SUBSCRIPTION_PRICES[BASIC] is 49 rupees
+
+
+@pytest.fixture
+def gateway(app):
+    with RazorpayStandIn() as stand_in:
+        app.config.update(
+            RAZORPAY_API_URL=stand_in.url,
+            PAYMENT_READ_TIMEOUT=5,
+            PAYMENT_MAX_ATTEMPTS=1,
+            PAYMENT_BREAKER_FAILURES=3,
+            PAYMENT_BREAKER_RESET_SECONDS=0.2,
+            PAYMENT_VERIFY_WAIT_SECONDS=2,
+        )
+        yield stand_in
+        state = app.extensions.pop('payments', None)
+        if state is not None:
+            state['pool'].shutdown(wait=True)  # let slow fetches finish before the server goes
+
+
+def _captured(student, amount=BASIC_PAISE):
+    return {'status': 'captured', 'amount': amount, 'notes': {'student_id': str(student)}}
+
+
+def _verify(client, payment_id, tier='basic'):
+    return client.post('/verify_payment', json={'razorpay_payment_id': payment_id, 'tier': tier})
+
+
+def _verification(app, payment_id):
+    with app.app_context():
+        verification = PaymentVerification.query.filter_by(payment_id=payment_id).one()
+        db.session.expunge(verification)
+        return verification
+
+
+def _due_now(app, *payment_ids):
+    with app.app_context():
+        PaymentVerification.query.filter(PaymentVerification.payment_id.in_(payment_ids)).update(
+            {'next_attempt_at': datetime.utcnow()}, synchronize_session=False
+        )
+        db.session.commit()
+
+
+def test_captured_payment_activates_the_plan(app, client, student, gateway):
+    gateway.payments['pay_ok'] = _captured(student)
+
+    response = _verify(client, 'pay_ok')
+
+    assert response.status_code == 200
+    assert response.json['success'] is True
+    verification = _verification(app, 'pay_ok')
+    assert verification.status == PaymentStatusEnum.COMPLETED
+    with app.app_context():
+        subscription = db.session.get(Subscription, response.json['subscription_id'])
+        assert subscription.student_id == student
+        assert subscription.tier == SubscriptionTierEnum.BASIC
+
+
+def test_posting_the_same_payment_twice_gives_the_same_result(app, client, student, gateway):
+    gateway.payments['pay_ok'] = _captured(student)
+
+    first = _verify(client, 'pay_ok')
+    second = _verify(client, 'pay_ok')
+
+    assert (second.status_code, second.json) == (first.status_code, first.json)
+    assert len(gateway.calls) == 1  # the second post reads the stored result
+    with app.app_context():
+        assert Subscription.query.filter_by(student_id=student).count() == 1
+
+
+def test_wrong_amount_fails_the_payment(app, client, student, gateway):
+    gateway.payments['pay_cheap'] = _captured(student, amount=100)
+
+    response = _verify(client, 'pay_cheap')
+
+    assert response.status_code == 400
+    verification = _verification(app, 'pay_cheap')
+    assert verification.status == PaymentStatusEnum.FAILED
+    assert f"expected {BASIC_PAISE}" in verification.last_error
+    assert verification.subscription_id is None
+
+
+def test_slow_gateway_leaves_the_payment_pending(app, client, student, gateway):
+    gateway.payments['pay_slow'] = _captured(student)
+    gateway.delay = 1
+    app.config['PAYMENT_VERIFY_WAIT_SECONDS'] = 0.2
+
+    start = time.monotonic()
+    response = _verify(client, 'pay_slow')
+
+    assert time.monotonic() - start < gateway.delay
+    assert response.status_code == 202
+    assert response.json['pending'] is True
+    verification = _verification(app, 'pay_slow')
+    assert verification.status == PaymentStatusEnum.PENDING
+    assert verification.attempts == 1
+    assert 'in time' in verification.last_error
+
+
+def test_full_pool_leaves_the_payment_pending(app, client, student, gateway):
+    gateway.payments['pay_first'] = _captured(student)
+    gateway.payments['pay_second'] = _captured(student)
+    gateway.delay = 1
+    app.config.update(PAYMENT_WORKERS=1, PAYMENT_VERIFY_WAIT_SECONDS=0.2)
+
+    assert _verify(client, 'pay_first').status_code == 202  # its fetch still holds the only slot
+    response = _verify(client, 'pay_second')
+
+    assert response.status_code == 202
+    assert 'in flight' in _verification(app, 'pay_second').last_error
+    assert gateway.calls == ['/v1/payments/pay_first']
+
+
+def test_failing_gateway_opens_the_circuit(app, gateway):
+    gateway.fail_with = 503
+
+    with app.app_context():
+        for _ in range(3):
+            with pytest.raises(payments.GatewayUnavailable):
+                payments.fetch_payment('pay_x')
+        assert payments.breaker().state == 'open'
+
+        with pytest.raises(payments.GatewayUnavailable, match='circuit is open'):
+            payments.fetch_payment('pay_x')
+        assert len(gateway.calls) == 3  # refused without a call
+
+
+def test_half_open_circuit_lets_one_trial_call_through(app, student, gateway):
+    gateway.fail_with = 503
+    with app.app_context():
+        for _ in range(3):
+            with pytest.raises(payments.GatewayUnavailable):
+                payments.fetch_payment('pay_x')
+
+        # A failed trial opens the circuit again at once
+        time.sleep(0.25)
+        assert payments.breaker().state == 'half-open'
+        with pytest.raises(payments.GatewayUnavailable):
+            payments.fetch_payment('pay_x')
+        assert len(gateway.calls) == 4
+        assert payments.breaker().state == 'open'
+
+        # A good trial closes it
+        gateway.fail_with = None
+        gateway.payments['pay_x'] = _captured(student)
+        time.sleep(0.25)
+        assert payments.fetch_payment('pay_x')['status'] == 'captured'
+        assert payments.breaker().state == 'closed'
+
+
+def test_half_open_circuit_allows_a_single_trial(app, gateway):
+    gateway.fail_with = 503
+    with app.app_context():
+        for _ in range(3):
+            with pytest.raises(payments.GatewayUnavailable):
+                payments.fetch_payment('pay_x')
+    time.sleep(0.25)
+    gateway.calls.clear()
+    gateway.delay = 0.5  # the trial is still running while the others ask
+
+    errors = []
+
+    def fetch():
+        with app.app_context():
+            try:
+                payments.fetch_payment('pay_x')
+            except payments.GatewayUnavailable as e:
+                errors.append(str(e))
+
+    threads = [threading.Thread(target=fetch) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(gateway.calls) == 1
+    assert sum('circuit is open' in error for error in errors) == 4
+
+
+def test_open_circuit_answers_pending_without_calling(app, client, student, gateway):
+    gateway.fail_with = 503
+    with app.app_context():
+        for _ in range(3):
+            with pytest.raises(payments.GatewayUnavailable):
+                payments.fetch_payment('pay_x')
+    gateway.calls.clear()
+    gateway.payments['pay_ok'] = _captured(student)
+
+    response = _verify(client, 'pay_ok')
+
+    assert response.status_code == 202
+    assert gateway.calls == []
+    assert 'circuit is open' in _verification(app, 'pay_ok').last_error
+
+
+def test_reconcile_settles_due_payments(app, student, gateway):
+    gateway.payments.update({
+        'pay_ok': _captured(student),
+        'pay_declined': {'status': 'failed', 'amount': BASIC_PAISE},
+        'pay_waiting': {'status': 'created', 'amount': BASIC_PAISE},
+        'pay_later': _captured(student),
+    })
+    with app.app_context():
+        for payment_id in gateway.payments:
+            payments.record_payment(student, payment_id, SubscriptionTierEnum.BASIC, Decimal('49'), 30)
+    _due_now(app, 'pay_ok', 'pay_declined', 'pay_waiting')  # pay_later is not due yet
+
+    with app.app_context():
+        result = payments.reconcile(batch_size=2)
+
+    assert result == payments.ReconcileResult(completed=1, failed=1, pending=1)
+    assert sorted(gateway.calls) == ['/v1/payments/pay_declined', '/v1/payments/pay_ok', '/v1/payments/pay_waiting']
+    assert _verification(app, 'pay_ok').status == PaymentStatusEnum.COMPLETED
+    assert _verification(app, 'pay_ok').subscription_id is not None
+    assert _verification(app, 'pay_declined').status == PaymentStatusEnum.FAILED
+    waiting = _verification(app, 'pay_waiting')
+    assert (waiting.status, waiting.attempts) == (PaymentStatusEnum.PENDING, 1)
+    assert waiting.next_attempt_at > datetime.utcnow()
+    assert _verification(app, 'pay_later').status == PaymentStatusEnum.PENDING
+
+
+def test_reconcile_stops_while_the_circuit_is_open(app, student, gateway):
+    gateway.fail_with = 503
+    with app.app_context():
+        for i in range(5):
+            payments.record_payment(student, f'pay_{i}', SubscriptionTierEnum.BASIC, Decimal('49'), 30)
+    _due_now(app, *(f'pay_{i}' for i in range(5)))
+
+    with app.app_context():
+        result = payments.reconcile()
+
+    assert result == payments.ReconcileResult(completed=0, failed=0, pending=5)
+    assert len(gateway.calls) == 3  # PAYMENT_BREAKER_FAILURES, then no more calls
@@ -0,0 +1,66 @@
+# In tests/test_query_budgets.py
+#
+# Every endpoint in tests.helpers.QUERY_BUDGETS, requested as a logged-in
+# student with some loans, fines and a bag (admin pages as a staff
+# account), must stay within its budget.
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app import db
+from app.models import SubscriptionTierEnum
+from app.models.fine import Fine
+from app.models.loan import Loan
+from app.models.physical_book import PhysicalBook
+from app.models.student import Student
+from app.services import entitlements
+from tests.helpers import QUERY_BUDGETS
+
+PATHS = {
+    'main.landing_page': '/',
+    'main.list_books': '/books',
+    'main.book_detail': '/book/{book}',
+    'main.my_bag': '/my_bag',
+    'main.my_loans': '/my-loans',
+    'main.dues': '/dues',
+    'main.profile': '/profile',
+    'main.my_subscription': '/my-subscription',
+    'main.student_detail': '/admin/student/{student}',
+}
+
+
+@pytest.fixture
+def library(app, student):
+    """Ten books; the student is on Basic with three on loan and one overdue with a fine."""
+    with app.app_context():
+        entitlements.activate_subscription(db.session.get(Student, student), SubscriptionTierEnum.BASIC,
+                                           Decimal('49.00'), 182)
+        books = [PhysicalBook(title=f'Budget Book {i}', author='Author', total_copies=2, available_copies=2)
+                 for i in range(10)]
+        db.session.add_all(books)
+        for book in books[:3]:
+            book.available_copies -= 1
+            db.session.add(Loan(student_id=student, book=book))
+        overdue = Loan(student_id=student, book=books[3], due_date=datetime.utcnow() - timedelta(days=30))
+        db.session.add_all([overdue, Fine(loan=overdue, amount=Decimal('25.00'))])
+        db.session.commit()
+        return {'book': books[5].id, 'student': student}
+
+
+def test_every_budget_has_a_test():
+    assert set(PATHS) == set(QUERY_BUDGETS)
+
+
+# Pages only staff may open; the rest are requested as the student
+ADMIN_ENDPOINTS = {'main.student_detail'}
+
+
+@pytest.mark.parametrize('endpoint', sorted(QUERY_BUDGETS))
+def test_endpoint_within_budget(request, client, library, query_budget, endpoint):
+    client.post(f"/add_to_bag/{library['book']}")  # my_bag and the navbar show the bag
+    if endpoint in ADMIN_ENDPOINTS:
+        client = request.getfixturevalue('admin_client')
+    stats = query_budget(client, PATHS[endpoint].format(**library))
+    assert stats.endpoint == endpoint
@@ -0,0 +1,28 @@
+# In tests/test_query_plans.py
+#
+# Fails when a hot per-student query stops using an index (see
+# app.services.query_plans; `flask query-plans check` is the same check).
+
+from sqlalchemy import select
+
+from app.models.loan import Loan
+from app.services.query_plans import HotQuery, check_plans
+
+
+def test_hot_queries_use_indexes(app):
+    with app.app_context():
+        reports = check_plans()
+    assert reports
+    regressions = [
+        f"{r.query.name} ({r.query.used_by}):\n    " + '\n    '.join(r.plan)
+        for r in reports if r.full_scans
+    ]
+    assert not regressions, "Full scans in hot queries:\n" + '\n'.join(regressions)
+
+
+def test_full_scan_is_detected(app):
+    # due_date has no index, so this has to be reported
+    unindexed = HotQuery('loans by due date', 'test', select(Loan).where(Loan.due_date.is_(None)))
+    with app.app_context():
+        (report,) = check_plans([unindexed])
+    assert report.full_scans
@@ -0,0 +1,92 @@
+# In tests/test_query_stats.py
+#
+# Per-request SQL instrumentation: statement counts, N+1 detection, the
+# Server-Timing header and the JSON log line.
+
+import json
+import logging
+
+import pytest
+from sqlalchemy import text
+
+from app import db
+from app.services import query_stats
+
+
+@pytest.fixture
+def stats_app(make_app):
+    app = make_app(SQL_STATS_SERVER_TIMING=True, SQL_N_PLUS_ONE_THRESHOLD=5)
+
+    def n_plus_one():
+        # One SELECT per "row", the shape an N+1 has
+        for i in range(6):
+            db.session.execute(text('SELECT :i'), {'i': i}).scalar()
+        return 'ok'
+
+    def two_queries():
+        db.session.execute(text('SELECT 1')).scalar()
+        db.session.execute(text('SELECT 2')).scalar()
+        return 'ok'
+
+    app.add_url_rule('/_n_plus_one', 'n_plus_one', n_plus_one)
+    app.add_url_rule('/_two_queries', 'two_queries', two_queries)
+    return app
+
+
+def test_fingerprint_folds_in_lists_and_whitespace():
+    assert query_stats.fingerprint('SELECT *\n  FROM book WHERE id IN (?, ?, ?)') == \
+        query_stats.fingerprint('SELECT * FROM book WHERE id IN (?, ?)')
+
+
+def test_repeated_only_reports_selects_over_the_threshold():
+    stats = query_stats.RequestStats('main.x')
+    for _ in range(6):
+        stats.record('SELECT * FROM loan WHERE book_id = ?', 0.001)
+        stats.record('UPDATE book SET available_copies = ?', 0.001)
+    for _ in range(5):
+        stats.record('SELECT * FROM fine WHERE loan_id = ?', 0.001)
+
+    assert stats.repeated(5) == [query_stats.RepeatedStatement('SELECT * FROM loan WHERE book_id = ?', 6)]
+
+
+def test_repeated_select_logs_a_warning_and_sets_server_timing(stats_app, caplog):
+    with caplog.at_level(logging.INFO, logger=stats_app.logger.name):
+        with query_stats.capture() as seen:
+            response = stats_app.test_client().get('/_n_plus_one')
+
+    assert response.status_code == 200
+    (stats,) = seen
+    assert stats.endpoint == 'n_plus_one'
+    assert stats.count == 6
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+    assert response.headers['Server-Timing'].endswith('desc="6 queries"')
+
+    (record,) = [r for r in caplog.records if r.name == stats_app.logger.name]
+    assert record.levelno == logging.WARNING
+    prefix = 'Likely N+1 queries: '
+    assert record.getMessage().startswith(prefix)
+    line = json.loads(record.getMessage()[len(prefix):])
+    assert line['path'] == '/_n_plus_one'
+    assert line['queries'] == 6
+    assert line['n_plus_one'] == [{'count': 6, 'statement': 'SELECT ?'}]
+
+
+def test_sql_stats_log_writes_one_json_line_per_request(stats_app, caplog):
+    stats_app.config['SQL_STATS_LOG'] = True
+    with caplog.at_level(logging.INFO, logger=stats_app.logger.name):
+        stats_app.test_client().get('/_two_queries')
+
+    (record,) = [r for r in caplog.records if r.name == stats_app.logger.name]
+    assert record.levelno == logging.INFO
+    line = json.loads(record.getMessage())
+    assert (line['endpoint'], line['queries'], line['distinct'], line['status']) == ('two_queries', 2, 2, 200)
+    assert line['n_plus_one'] == []
+
+
+def test_quiet_request_logs_nothing_and_header_follows_config(stats_app, caplog):
+    stats_app.config['SQL_STATS_SERVER_TIMING'] = False
+    with caplog.at_level(logging.INFO, logger=stats_app.logger.name):
+        response = stats_app.test_client().get('/_two_queries')
+
+    assert 'Server-Timing' not in response.headers
+    assert [r for r in caplog.records if r.name == stats_app.logger.name] == []
@@ -0,0 +1,167 @@
+# In tests/test_sessions.py
+#
+# Server-side sessions (app.services.sessions) on the sql and filesystem
+# stores, and the per-student borrowing bag (app.services.bag).
+
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from app import db
+from app.models import SubscriptionTierEnum
+from app.models.physical_book import PhysicalBook
+from app.models.student import Student
+from app.services import entitlements, sessions
+
+STUDENT_EMAIL = 'student@example.com'  # the `student` fixture's account
+STUDENT_PASSWORD = 'password1'
+
+
+@pytest.fixture(params=['sql', 'filesystem'])
+def app(request, make_app, tmp_path):
+    """The app on each session store (overrides the conftest app)."""
+    return make_app(SESSION_BACKEND=request.param, SESSION_DIR=str(tmp_path / 'sessions'))
+
+
+@pytest.fixture
+def store(app):
+    with app.app_context():
+        yield sessions.get_store()
+
+
+def _login(app):
+    client = app.test_client()
+    response = client.post('/login', data={'email': STUDENT_EMAIL, 'password': STUDENT_PASSWORD})
+    assert response.status_code == 302, "login failed"
+    return client
+
+
+def _sid(client, app):
+    cookie = client.get_cookie(app.config['SESSION_COOKIE_NAME'])
+    return cookie.value if cookie else None
+
+
+# --- Stores ---------------------------------------------------------------
+
+def test_store_round_trip(app, store):
+    data = {'_user_id': '7', 'seen_at': datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc), 'notes': 'x' * 1000}
+    expires_at = time.time() + 60
+    store.save('a' * 43, sessions.dumps(data), expires_at)
+
+    blob, stored_expiry = store.load('a' * 43)
+    assert blob[:1] == b'z'  # large enough to be compressed
+    assert sessions.loads(blob) == data
+    assert stored_expiry == pytest.approx(expires_at, abs=1)
+    assert store.load('b' * 43) is None
+
+
+def test_expired_sessions_are_not_loaded_and_are_purged(app, store):
+    for i in range(5):
+        store.save(f'{i}' * 43, sessions.dumps({'n': i}), time.time() - 10)
+    store.save('live' + 'x' * 39, sessions.dumps({'n': 'live'}), time.time() + 60)
+
+    assert store.load('0' * 43) is None
+    assert store.purge(batch_size=2) == 5
+    assert store.purge(batch_size=2) == 0
+    assert sessions.loads(store.load('live' + 'x' * 39)[0]) == {'n': 'live'}
+
+
+def test_purge_command(app, store):
+    store.save('0' * 43, sessions.dumps({'n': 0}), time.time() - 10)
+    result = app.test_cli_runner().invoke(args=['sessions', 'purge', '--batch-size', '10'])
+    assert result.exit_code == 0, result.output
+    assert 'Purged 1 expired session(s)' in result.output
+
+
+# --- Session interface ----------------------------------------------------
+
+def test_anonymous_requests_set_no_cookie(app):
+    client = app.test_client()
+    for path in ('/', '/books', '/login'):
+        response = client.get(path)
+        assert 'Set-Cookie' not in response.headers, path
+
+
+def test_login_rotates_the_session_id(app, store, student):
+    client = app.test_client()
+    with client.session_transaction() as anonymous:
+        anonymous['before_login'] = True
+    old_sid = _sid(client, app)
+    assert store.load(old_sid) is not None
+
+    response = client.post('/login', data={'email': STUDENT_EMAIL, 'password': STUDENT_PASSWORD})
+    assert response.status_code == 302
+
+    new_sid = _sid(client, app)
+    assert new_sid != old_sid
+    assert store.load(old_sid) is None  # the pre-login id is useless to anyone holding it
+    data = sessions.loads(store.load(new_sid)[0])
+    assert data['_user_id'] == str(student)
+    assert data['before_login'] is True
+
+
+def test_unchanged_session_is_touched_only_when_expiry_lags(app, store, student):
+    client = _login(app)
+    client.get('/')  # shows the login flash, which changes the session
+    sid = _sid(client, app)
+    lifetime = app.permanent_session_lifetime.total_seconds()
+
+    # Just saved: a read-only request writes nothing
+    _, fresh = store.load(sid)
+    response = client.get('/profile')
+    assert response.status_code == 200
+    assert 'Set-Cookie' not in response.headers
+    assert store.load(sid)[1] == pytest.approx(fresh, abs=1)
+
+    # Stored expiry more than SESSION_TOUCH_SECONDS behind: pushed forward
+    store.touch(sid, time.time() + lifetime - app.config['SESSION_TOUCH_SECONDS'] - 60)
+    response = client.get('/profile')
+    assert response.status_code == 200
+    assert _sid(client, app) == sid
+    assert store.load(sid)[1] == pytest.approx(time.time() + lifetime, abs=5)
+
+
+def test_emptied_session_is_deleted(app, store, student):
+    client = _login(app)
+    sid = _sid(client, app)
+
+    client.get('/logout')   # leaves only the "logged out" flash
+    client.get('/')         # shows it, emptying the session
+
+    assert store.load(sid) is None
+    assert _sid(client, app) is None
+
+
+def test_unknown_or_malformed_cookie_starts_a_new_session(app, student):
+    client = app.test_client()
+    client.set_cookie(app.config['SESSION_COOKIE_NAME'], '../../etc/passwd')
+    assert client.get('/profile').status_code == 302  # not logged in
+
+
+# --- Bag ------------------------------------------------------------------
+
+@pytest.fixture
+def book(app, student):
+    with app.app_context():
+        entitlements.activate_subscription(db.session.get(Student, student), SubscriptionTierEnum.BASIC,
+                                           Decimal('49.00'), 182)
+        book = PhysicalBook(title='Bagged Book', author='Author', total_copies=2, available_copies=2)
+        db.session.add(book)
+        db.session.commit()
+        return book.id
+
+
+def test_bag_is_shared_between_devices(app, book):
+    laptop, phone = _login(app), _login(app)
+
+    response = laptop.post(f'/add_to_bag/{book}', follow_redirects=True)
+    assert b'Book added to your bag.' in response.data
+    response = phone.post(f'/add_to_bag/{book}', follow_redirects=True)
+    assert b'Book is already in your bag.' in response.data
+    assert b'Bagged Book' in phone.get('/my_bag').data
+
+    response = phone.post(f'/remove_from_bag/{book}', follow_redirects=True)
+    assert b'Book removed from your bag.' in response.data
+    assert b'Bagged Book' not in laptop.get('/my_bag').data